@@ -0,0 +1,133 @@
+# benchmarks/bench_perp_decode.py
+"""
+Bandingkan jalur decode fill perp:
+- legacy : json.loads → dict → scan substring `dir` → dict event
+- fast   : json_loads (orjson kalau ada) → filter coin/dir di dict mentah →
+           PerpFill (__slots__) hanya untuk fill yang dipakai → PerpEvent
+
+Pakai:
+  python -m benchmarks.bench_perp_decode --fills 50000 --repeat 5
+Output: waktu terbaik per run, peak alokasi selama decode, dan memori yang
+masih ditahan setelah decode (record fill + event), via tracemalloc.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from smartmoney.connectors.perp_hyperliquid import HyperliquidConnector, parse_fills
+from smartmoney.connectors.records import json_loads, orjson
+
+DIRS = ["Open Long", "Open Short", "Close Long", "Close Short", "Long > Short"]
+COINS = ["BTC", "ETH", "SOL", "HYPE", "@107", "PURR/USDC"]
+
+
+def make_payload(n: int) -> bytes:
+    rnd = random.Random(42)
+    fills = []
+    for i in range(n):
+        fills.append({
+            "coin": rnd.choice(COINS),
+            "px": f"{rnd.uniform(1, 70000):.4f}",
+            "sz": f"{rnd.uniform(0.001, 50):.4f}",
+            "side": rnd.choice("BA"),
+            "time": 1_700_000_000_000 + i * 37,
+            "startPosition": f"{rnd.uniform(-10, 10):.4f}",
+            "dir": rnd.choice(DIRS),
+            "closedPnl": "0.0",
+            "hash": "0x" + "%064x" % rnd.getrandbits(256),
+            "oid": rnd.getrandbits(40),
+            "crossed": True,
+            "fee": "0.01",
+            "tid": rnd.getrandbits(50),
+            "feeToken": "USDC",
+        })
+    return json.dumps(fills).encode()
+
+
+def legacy_path(raw: bytes, wal: str):
+    # jalur lama menahan dict JSON mentah sampai event selesai diproses
+    fills = json.loads(raw)
+    events = []
+    now = int(time.time())
+    for f in fills:
+        coin = f.get("coin")
+        if not coin or coin.startswith("@") or "/" in coin:
+            continue
+        dir_str = str(f.get("dir", "") or "")
+        if "Open Long" in dir_str:
+            direction, event_type = "LONG", "OPEN"
+        elif "Open Short" in dir_str:
+            direction, event_type = "SHORT", "OPEN"
+        elif "Increase Long" in dir_str:
+            direction, event_type = "LONG", "INCREASE"
+        elif "Increase Short" in dir_str:
+            direction, event_type = "SHORT", "INCREASE"
+        else:
+            continue
+        px = float(f.get("px", "0") or 0.0)
+        sz = float(f.get("sz", "0") or 0.0)
+        size_usd = px * sz
+        try:
+            ts = int(f.get("time", now)) // 1000
+        except Exception:
+            ts = now
+        if size_usd <= 0:
+            continue
+        events.append({
+            "wallet_address": wal.lower(),
+            "platform": "hyperliquid",
+            "pair": f"{coin}-PERP",
+            "direction": direction,
+            "event_type": event_type,
+            "entry_price": px,
+            "size_usd": size_usd,
+            "leverage": 1.0,
+            "timestamp": ts,
+        })
+    return fills, events
+
+
+def fast_path(raw: bytes, wal: str, conn: HyperliquidConnector):
+    fills, _ = parse_fills(json_loads(raw))
+    events = conn.fills_to_events(wal, fills, int(time.time()))
+    return fills, events
+
+
+def measure(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    kept = fn()  # noqa: F841 (ditahan supaya `retained` mengukur record yang disimpan)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, retained
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fills", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    raw = make_payload(args.fills)
+    wal = "0x" + "ab" * 20
+    conn = HyperliquidConnector(max_concurrency=1)
+
+    print(f"fills={args.fills} payload={len(raw) / 1e6:.1f} MB orjson={'yes' if orjson else 'no'}")
+    for name, fn in (
+        ("legacy", lambda: legacy_path(raw, wal)),
+        ("fast", lambda: fast_path(raw, wal, conn)),
+    ):
+        best, peak, retained = measure(fn, args.repeat)
+        print(
+            f"{name:<7} best={best * 1000:8.1f} ms  peak={peak / 1e6:7.1f} MB  retained={retained / 1e6:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# benchmarks/bench_scoring.py
+"""
+Bandingkan scoring wallet:
+- legacy      : compute_smart_score_from_wallet per objek untuk SEMUA wallet
+                (perilaku lama tiap cycle)
+- engine full : ScoreEngine.compute() dengan semua baris dirty (setelah load)
+- engine incr : ScoreEngine.compute() setelah --dirty fraksi wallet di-update
+                (pola refresh discovery)
+- tiers       : assign_tiers_by_rank (sort penuh) vs RankTiers.take_changes()
+                setelah skor wallet dirty berubah
+
+Pakai:
+  python -m benchmarks.bench_scoring --wallets 100000 --dirty 0.01 --repeat 5
+Juga mengecek skor engine SAMA PERSIS (==) dengan legacy, termasuk nilai di
+batas tiap step / segmen dan None, dan tier RankTiers sama dengan
+assign_tiers_by_rank.
+"""
+import argparse
+import random
+import time
+
+from smartmoney import scoring
+from smartmoney.scoring import RankTiers, ScoreEngine, assign_tiers_by_rank, compute_smart_score_from_wallet
+
+# nilai tepat di batas cabang _score_roi_all / _score_equity / _score_pnl_all
+_ROI_EDGES = [None, -0.5, -0.50000001, -0.4999999, 0.0, -0.0, 1e-12, 0.5, 0.4999999, 3.0, 2.9999999, 3.0000001]
+_EQ_EDGES = [None, 0.0, -5.0, 999.99, 1_000.0, 9_999.99, 10_000.0, 50_000.0, 199_999.99, 200_000.0, 1e12]
+_PNL_EDGES = [None, -1e-9, 0.0, 9_999.99, 10_000.0, 100_000.0, 999_999.99, 1_000_000.0, 1e12]
+
+
+TIER_PARAMS = dict(min_score=60.0, frac_s=0.10, frac_a=0.30, frac_b=0.60)
+
+
+class W:
+    __slots__ = ("address", "roi_all", "account_value_usd", "pnl_all_usd", "smart_score", "tier")
+
+    def __init__(self, address, roi_all, account_value_usd, pnl_all_usd):
+        self.address = address
+        self.roi_all = roi_all
+        self.account_value_usd = account_value_usd
+        self.pnl_all_usd = pnl_all_usd
+        self.smart_score = 0.0
+        self.tier = "ignore"
+
+
+def make_wallets(n: int):
+    rnd = random.Random(3)
+    out = []
+    for i in range(n):
+        if i < 2000:
+            roi = _ROI_EDGES[i % len(_ROI_EDGES)]
+            eq = _EQ_EDGES[(i // 7) % len(_EQ_EDGES)]
+            pnl = _PNL_EDGES[(i // 3) % len(_PNL_EDGES)]
+        else:
+            roi = rnd.uniform(-1.0, 5.0)
+            eq = 10 ** rnd.uniform(1, 7)
+            pnl = rnd.uniform(-1e5, 1e5) * 10 ** rnd.randint(0, 2)
+        out.append(W("0x%040x" % i, roi, eq, pnl))
+    return out
+
+
+def load(engine: ScoreEngine, wallets):
+    engine.clear()
+    for w in wallets:
+        engine.set_stats(w.address, w.account_value_usd, w.pnl_all_usd, w.roi_all)
+
+
+def best_of(repeat: int, setup, fn):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        setup()
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def run(wallets, dirty_frac: float, repeat: int, label: str):
+    rnd = random.Random(9)
+    expected = {w.address: compute_smart_score_from_wallet(w) for w in wallets}
+    t_legacy, _ = best_of(
+        repeat, lambda: None,
+        lambda: {w.address: compute_smart_score_from_wallet(w) for w in wallets},
+    )
+
+    engine = ScoreEngine()
+    t_full, full = best_of(repeat, lambda: load(engine, wallets), engine.compute)
+    bad_full = sum(1 for a, s in full.items() if s != expected[a]) + len(expected) - len(full)
+
+    n_dirty = max(1, int(len(wallets) * dirty_frac))
+    updates = []
+    for w in rnd.sample(wallets, n_dirty):
+        w.roi_all = rnd.uniform(-1.0, 5.0)
+        w.account_value_usd = 10 ** rnd.uniform(1, 7)
+        updates.append(w)
+
+    def setup_incr():
+        # nilai lain dulu supaya set_stats berikutnya benar-benar menandai dirty
+        for w in updates:
+            engine.set_stats(w.address, -1.0, 0.0, 0.0)
+        engine.compute()
+
+    t_incr, _ = best_of(
+        repeat, setup_incr,
+        lambda: [engine.set_stats(w.address, w.account_value_usd, w.pnl_all_usd, w.roi_all) for w in updates]
+        and engine.compute(),
+    )
+    expected = {w.address: compute_smart_score_from_wallet(w) for w in wallets}
+    got = engine.scores()
+    bad_incr = sum(1 for a, s in expected.items() if got[a] != s)
+
+    print(f"[{label}]")
+    print(f"  legacy       best={t_legacy * 1000:8.2f} ms")
+    print(f"  engine full  best={t_full * 1000:8.2f} ms  mismatch={bad_full}")
+    print(f"  engine incr  best={t_incr * 1000:8.2f} ms  ({n_dirty} dirty, set_stats + compute)  mismatch={bad_incr}")
+    run_tiers(wallets, updates, rnd, repeat)
+
+
+def legacy_tiers(wallets):
+    for w in wallets:
+        w.smart_score = compute_smart_score_from_wallet(w)
+    assign_tiers_by_rank(wallets, **TIER_PARAMS)
+    return {w.address: w.tier for w in wallets}
+
+
+def run_tiers(wallets, updates, rnd, repeat: int):
+    legacy_tiers(wallets)
+    t_sort, _ = best_of(repeat, lambda: None, lambda: assign_tiers_by_rank(wallets, **TIER_PARAMS))
+
+    ranker = RankTiers(**TIER_PARAMS)
+    t0 = time.perf_counter()
+    ranker.load((w.address, w.smart_score, "ignore", i) for i, w in enumerate(wallets))
+    ranker.take_changes()
+    t_build = time.perf_counter() - t0
+
+    # skor baru untuk wallet dirty; tiap putaran bergantian 2 set skor supaya selalu berubah
+    order = {w.address: i for i, w in enumerate(wallets)}
+    alt = [(w, rnd.uniform(0, 100)) for w in updates]
+    flip = [False]
+
+    def incr():
+        for w, s in alt:
+            ranker.update(w.address, s if flip[0] else w.smart_score, "ignore", order[w.address])
+        flip[0] = not flip[0]
+        return ranker.take_changes()
+
+    t_incr, changed = best_of(repeat, lambda: None, incr)
+    if not flip[0]:
+        incr()
+    for w, s in alt:
+        w.smart_score = s
+    assign_tiers_by_rank(wallets, **TIER_PARAMS)
+    for w, s in alt:
+        ranker.update(w.address, s, "ignore", order[w.address])
+    ranker.take_changes()
+    bad = sum(1 for w in wallets if ranker.tier(w.address) != w.tier)
+    print(f"  tiers sort   best={t_sort * 1000:8.2f} ms  (assign_tiers_by_rank, all {len(wallets)} tiers rewritten)")
+    print(f"  tiers build  once={t_build * 1000:8.2f} ms  (RankTiers, startup)")
+    print(f"  tiers incr   best={t_incr * 1000:8.2f} ms  ({len(alt)} scores changed → {len(changed)} tier changes)  mismatch={bad}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wallets", type=int, default=100_000)
+    ap.add_argument("--dirty", type=float, default=0.01, help="fraksi wallet berubah per refresh")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-python", action="store_true", help="lewati fallback tanpa NumPy")
+    args = ap.parse_args()
+
+    np_mod = scoring.np
+    print(f"wallets={args.wallets} numpy={'yes' if np_mod is not None else 'no'}")
+    if np_mod is not None:
+        run(make_wallets(args.wallets), args.dirty, args.repeat, "numpy")
+    if not args.no_python:
+        scoring.np = None
+        try:
+            run(make_wallets(args.wallets), args.dirty, args.repeat, "python fallback")
+        finally:
+            scoring.np = np_mod
+
+
+if __name__ == "__main__":
+    main()
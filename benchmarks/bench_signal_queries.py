@@ -0,0 +1,223 @@
+# benchmarks/bench_signal_queries.py
+"""
+Latency query signals / alerts terhadap ukuran history:
+- isi DB (default SQLite file sementara) dengan signal + alert sintetis secara
+  bertahap sampai tiap ukuran di --rows
+- di tiap ukuran jalankan query pola akses nyata (lookback per wallet+token,
+  per pair perp, antrian belum diproses, alert terbaru) --repeat kali dengan
+  parameter acak, laporkan p50 / p95 dan plan SQLite (index yang dipakai)
+- --compare: ulangi dengan index komposit di-drop (hanya PK + source_id unik)
+  untuk pembanding
+
+Pakai:
+  python -m benchmarks.bench_signal_queries --rows 100000 1000000 --compare
+  python -m benchmarks.bench_signal_queries --rows 100000 1000000 10000000 --db sqlite:////tmp/sig.db
+Alert diisi 1/10 jumlah signal.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, text
+
+from smartmoney.models import Alert, Base, Signal
+
+N_WALLETS = 5_000
+TOKENS = ["BTC", "ETH", "SOL", "HYPE", "ARB", "OP", "DOGE", "PEPE", "WIF", "LINK"] + [f"T{i}" for i in range(40)]
+START = dt.datetime(2024, 1, 1)
+SPAN_S = 365 * 86400
+BATCH = 20_000
+
+QUERIES = {
+    "signals wallet+token 7d": (
+        "SELECT id, signal_type, price, size_usd, created_at FROM signals "
+        "WHERE wallet_address = :wallet AND token_symbol = :token AND created_at >= :since "
+        "ORDER BY created_at DESC LIMIT 50"
+    ),
+    "signals wallet 30d": (
+        "SELECT id, token_symbol, signal_type, created_at FROM signals "
+        "WHERE wallet_address = :wallet AND created_at >= :since30 "
+        "ORDER BY created_at DESC LIMIT 100"
+    ),
+    "signals pair 1d": (
+        "SELECT id, wallet_address, signal_type, size_usd, created_at FROM signals "
+        "WHERE pair_perp = :pair AND created_at >= :since1 ORDER BY created_at DESC LIMIT 100"
+    ),
+    "signals unprocessed": (
+        "SELECT id, wallet_address, token_symbol FROM signals "
+        "WHERE processed = 0 AND created_at >= :since ORDER BY created_at LIMIT 500"
+    ),
+    "alerts wallet+token 30d": (
+        "SELECT id, alert_type, signal_strength, created_at FROM alerts "
+        "WHERE wallet_address = :wallet AND token_symbol = :token AND created_at >= :since30 "
+        "ORDER BY created_at DESC LIMIT 50"
+    ),
+    "alerts pair 7d": (
+        "SELECT id, wallet_address, created_at FROM alerts "
+        "WHERE pair_perp = :pair AND created_at >= :since ORDER BY created_at DESC LIMIT 100"
+    ),
+    "alerts recent": (
+        "SELECT id, wallet_address, token_symbol, created_at FROM alerts "
+        "WHERE created_at >= :since1 ORDER BY created_at DESC LIMIT 100"
+    ),
+}
+
+
+def wallet(i: int) -> str:
+    return "0x%040x" % i
+
+
+def make_signals(rnd: random.Random, start_id: int, n: int):
+    rows = []
+    for i in range(n):
+        token = rnd.choice(TOKENS)
+        perp = rnd.random() < 0.8
+        rows.append({
+            "id": start_id + i,
+            "signal_type": rnd.choice(["PERP_OPEN_LONG", "PERP_OPEN_SHORT"]) if perp else rnd.choice(["SPOT_BUY", "SPOT_SELL"]),
+            "wallet_address": wallet(int(rnd.paretovariate(1.2)) % N_WALLETS),
+            "wallet_score": rnd.uniform(0, 100),
+            "wallet_tier": rnd.choice("SAB"),
+            "chain_id_spot": None if perp else "1",
+            "perp_platform": "hyperliquid" if perp else None,
+            "token_symbol": token,
+            "token_address": None,
+            "pair_perp": f"{token}-PERP" if perp else None,
+            "price": rnd.uniform(0.01, 70_000),
+            "size_usd": rnd.uniform(300, 500_000),
+            "liquidity_usd": None,
+            "created_at": START + dt.timedelta(seconds=rnd.randrange(SPAN_S)),
+            # history lama hampir semua sudah diproses
+            "processed": rnd.random() > 0.001,
+            "source_id": f"bench:{start_id + i}",
+        })
+    return rows
+
+
+def make_alerts(rnd: random.Random, start_id: int, n: int):
+    rows = []
+    for i in range(n):
+        token = rnd.choice(TOKENS)
+        rows.append({
+            "id": start_id + i,
+            "alert_type": "PERP_ONLY",
+            "signal_strength": rnd.choice(["NORMAL", "STRONG"]),
+            "wallet_address": wallet(int(rnd.paretovariate(1.2)) % N_WALLETS),
+            "wallet_score": rnd.uniform(0, 100),
+            "token_symbol": token,
+            "pair_perp": f"{token}-PERP",
+            "perp_platform": "hyperliquid",
+            "entry_min": 1.0, "entry_max": 1.0, "stop_loss": 0.9, "tp1": 1.1, "tp2": 1.2, "tp3": 1.3,
+            "raw_payload": {},
+            "created_at": START + dt.timedelta(seconds=rnd.randrange(SPAN_S)),
+        })
+    return rows
+
+
+def fill(engine, rnd, model, maker, have: int, target: int) -> int:
+    while have < target:
+        n = min(BATCH, target - have)
+        with engine.begin() as conn:
+            conn.execute(insert(model), maker(rnd, have + 1, n))
+        have += n
+    return have
+
+
+def composite_indexes():
+    return [
+        idx for table in (Signal.__table__, Alert.__table__) for idx in table.indexes
+    ]
+
+
+def run_queries(engine, rnd, repeat: int):
+    out = {}
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        for name, sql in QUERIES.items():
+            plan = " | ".join(r[-1] for r in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params(rnd)))
+            times = []
+            for _ in range(repeat):
+                p = params(rnd)
+                t0 = time.perf_counter()
+                conn.execute(text(sql), p).fetchall()
+                times.append((time.perf_counter() - t0) * 1000)
+            times.sort()
+            out[name] = (statistics.median(times), times[int(0.95 * (len(times) - 1))], plan)
+    return out
+
+
+def params(rnd: random.Random):
+    end = START + dt.timedelta(seconds=SPAN_S)
+    token = rnd.choice(TOKENS)
+    return {
+        "wallet": wallet(int(rnd.paretovariate(1.2)) % N_WALLETS),
+        "token": token,
+        "pair": f"{token}-PERP",
+        "since": end - dt.timedelta(days=7),
+        "since30": end - dt.timedelta(days=30),
+        "since1": end - dt.timedelta(days=1),
+    }
+
+
+def report(n: int, label: str, res):
+    print(f"\n== signals={n:,} alerts={n // 10:,} [{label}]")
+    for name, (p50, p95, plan) in res.items():
+        print(f"  {name:<26} p50={p50:8.2f} ms  p95={p95:8.2f} ms  {plan}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--db", default=None, help="URL SQLAlchemy (default: SQLite file sementara)")
+    ap.add_argument("--compare", action="store_true", help="ulangi tanpa index komposit")
+    args = ap.parse_args()
+
+    tmp = None
+    url = args.db
+    if url is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        tmp.close()
+        url = f"sqlite:///{tmp.name}"
+    engine = create_engine(url, future=True)
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+            conn.execute(text("PRAGMA synchronous=OFF"))
+
+    Base.metadata.drop_all(engine, tables=[Signal.__table__, Alert.__table__])
+    Base.metadata.create_all(engine, tables=[Signal.__table__, Alert.__table__])
+    rnd = random.Random(11)
+    have_sig = have_alert = 0
+    try:
+        for n in sorted(args.rows):
+            t0 = time.perf_counter()
+            have_sig = fill(engine, rnd, Signal, make_signals, have_sig, n)
+            have_alert = fill(engine, rnd, Alert, make_alerts, have_alert, n // 10)
+            print(f"\nfilled to {n:,} signals in {time.perf_counter() - t0:.1f}s")
+
+            report(n, "indexed", run_queries(engine, random.Random(5), args.repeat))
+            if args.compare:
+                for idx in composite_indexes():
+                    idx.drop(engine)
+                report(n, "no composite index", run_queries(engine, random.Random(5), args.repeat))
+                t0 = time.perf_counter()
+                for idx in composite_indexes():
+                    idx.create(engine)
+                print(f"  (rebuilt composite indexes in {time.perf_counter() - t0:.1f}s)")
+    finally:
+        engine.dispose()
+        if tmp is not None:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.unlink(tmp.name + suffix)
+                except FileNotFoundError:
+                    pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_swap_decode.py
+"""
+Bandingkan decode data Swap V2 (4 x uint256):
+- legacy : per log w3.codec.decode + `int / 10 ** decimals` + klasifikasi if/else
+- bulk   : swap_decoder.decode_swaps (NumPy kalau ada, fallback int.from_bytes)
+
+Pakai:
+  python -m benchmarks.bench_swap_decode --logs 100000 --repeat 3
+Juga mengecek hasil bulk sama dengan legacy (toleransi relatif 1e-12).
+"""
+import argparse
+import random
+import time
+
+from web3 import Web3
+
+from smartmoney.connectors import swap_decoder
+from smartmoney.connectors.swap_decoder import decode_swaps
+
+W3 = Web3()
+
+
+def make_logs(n: int):
+    rnd = random.Random(7)
+    rows = []
+    for _ in range(n):
+        amounts = [rnd.randint(0, 10 ** rnd.randint(0, 27)) for _ in range(4)]
+        rows.append((
+            W3.codec.encode(["uint256"] * 4, amounts),
+            rnd.choice([6, 8, 18]),
+            rnd.choice([6, 18]),
+            rnd.random() < 0.4,
+            rnd.random() < 0.4,
+        ))
+    return rows
+
+
+def legacy_one(data: bytes, d0: int, d1: int, st0: bool, st1: bool):
+    a0_in, a1_in, a0_out, a1_out = W3.codec.decode(["uint256"] * 4, data)
+    a0_in, a0_out = a0_in / (10 ** d0), a0_out / (10 ** d0)
+    a1_in, a1_out = a1_in / (10 ** d1), a1_out / (10 ** d1)
+    if st0 and not st1:
+        main1, buy = True, a1_out > 0
+        amount_token, stable = (a1_out, a0_in) if buy else (a1_in, a0_out)
+    elif st1 and not st0:
+        main1, buy = False, a0_out > 0
+        amount_token, stable = (a0_out, a1_in) if buy else (a0_in, a1_out)
+    else:
+        main1, buy = False, a0_out > 0
+        amount_token, stable = (a0_out if buy else a0_in), 0.0
+    ok = stable > 0 and amount_token > 0
+    return main1, buy, (stable if ok else 0.0), (stable / amount_token if ok else 0.0)
+
+
+def close(a: float, b: float) -> bool:
+    return abs(a - b) <= 1e-12 * max(1.0, abs(a))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logs", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    rows = make_logs(args.logs)
+    cols = list(zip(*rows))
+    np_mod = swap_decoder.np
+
+    def run_bulk_python():
+        swap_decoder.np = None
+        try:
+            return decode_swaps(*cols)
+        finally:
+            swap_decoder.np = np_mod
+
+    paths = [("legacy", lambda: [legacy_one(*r) for r in rows]), ("python", run_bulk_python)]
+    if np_mod is not None:
+        paths.append(("numpy", lambda: decode_swaps(*cols)))
+
+    print(f"logs={args.logs} numpy={'yes' if np_mod is not None else 'no'}")
+    expected = None
+    for name, fn in paths:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - t0)
+        if expected is None:
+            expected = out
+            status = ""
+        else:
+            bad = sum(
+                1
+                for i, (m1, buy, usd, px) in enumerate(expected)
+                if (m1, buy) != (out["main_is_token1"][i], out["is_buy"][i])
+                or not close(usd, out["amount_usd"][i])
+                or not close(px, out["price"][i])
+            )
+            status = f"mismatch={bad}"
+        print(f"{name:<7} best={best * 1000:8.1f} ms  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# smartmoney/archive.py
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import datetime as dt
+import os
+import queue
+import threading
+import time
+
+from loguru import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # opsional: tanpa pyarrow archive nonaktif
+    pa = None
+    pq = None
+
+# kolom per jenis event (urutan = urutan kolom di file)
+PERP_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("wallet_address", "string"),
+    ("platform", "string"),
+    ("pair", "string"),
+    ("direction", "string"),
+    ("event_type", "string"),
+    ("entry_price", "float64"),
+    ("size_usd", "float64"),
+    ("leverage", "float64"),
+    ("timestamp", "int64"),
+    ("source_id", "string"),
+    ("closed_pnl", "float64"),
+)
+
+SPOT_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("wallet_address", "string"),
+    ("chain_id", "string"),
+    ("dex", "string"),
+    ("tx_hash", "string"),
+    ("log_index", "int64"),
+    ("block_number", "int64"),
+    ("block_hash", "string"),
+    ("timestamp", "int64"),
+    ("token_address", "string"),
+    ("token_symbol", "string"),
+    ("side", "string"),
+    ("amount_usd", "float64"),
+    ("price", "float64"),
+    ("liquidity_usd", "float64"),
+    ("source_id", "string"),
+)
+
+COLUMNS = {"perp": PERP_COLUMNS, "spot": SPOT_COLUMNS}
+
+# partisi: (kind, platform, date YYYY-MM-DD)
+PartitionKey = Tuple[str, str, str]
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _schema(kind: str):
+    return pa.schema([(name, getattr(pa, typ)()) for name, typ in COLUMNS[kind]])
+
+
+def _conform(data, kind: str, names: List[str]):
+    """
+    Batch / table dengan tepat kolom `names`; kolom yang belum ada di file
+    lama (skema bertambah) diisi null.
+    """
+    types = dict(COLUMNS[kind])
+    cols = []
+    for n in names:
+        i = data.schema.get_field_index(n)
+        cols.append(data.column(i) if i >= 0 else pa.nulls(data.num_rows, getattr(pa, types[n])()))
+    if isinstance(data, pa.RecordBatch):
+        return pa.RecordBatch.from_arrays(cols, names=names)
+    return pa.Table.from_arrays(cols, names=names)
+
+
+def _platform_of(kind: str, e: Any) -> str:
+    if kind == "perp":
+        return e.get("platform") or "unknown"
+    # spot: 1 partisi per chain + dex, mis. "1-uniswap_v2"
+    return f"{e.get('chain_id') or 'unknown'}-{e.get('dex') or 'unknown'}"
+
+
+def _day_of(ts: Any) -> str:
+    return dt.datetime.utcfromtimestamp(int(ts or 0)).strftime("%Y-%m-%d")
+
+
+def partition_dir(root: str, kind: str, platform: str, day: str) -> str:
+    """Layout hive: <root>/kind=perp/platform=hyperliquid/date=2024-01-31/"""
+    return os.path.join(root, f"kind={kind}", f"platform={platform}", f"date={day}")
+
+
+class _Buffer:
+    """Kolom (list per field) untuk 1 partisi, sampai di-flush ke 1 file."""
+
+    __slots__ = ("cols", "rows", "since")
+
+    def __init__(self, names: Sequence[str]):
+        self.cols: Dict[str, List[Any]] = {n: [] for n in names}
+        self.rows = 0
+        self.since = time.monotonic()
+
+
+class EventArchiver:
+    """
+    Archive append-only semua event perp & spot yang sudah dinormalisasi
+    (setelah dedup, sebelum filter signal) ke file Parquet terpartisi per
+    hari + platform:
+    - submit() tidak pernah memblokir ingestion: event masuk queue bounded;
+      queue penuh → batch di-drop (dihitung di stats) dan ditulis warning
+    - thread archiver mengumpulkan event per partisi dalam bentuk kolom, lalu
+      menulis 1 file baru per partisi setelah flush_rows baris atau
+      flush_interval_s detik (file Parquet tidak bisa di-append; tiap flush
+      = part baru, nama unik & berurutan waktu)
+    - file ditulis ke *.tmp lalu di-rename, jadi reader tidak pernah melihat
+      file setengah jadi
+    pyarrow tidak terpasang → archiver nonaktif (submit no-op).
+    """
+
+    def __init__(
+        self,
+        root: str = "data/archive",
+        compression: str = "zstd",
+        flush_rows: int = 50_000,
+        flush_interval_s: float = 300.0,
+        queue_size: int = 256,
+        row_group_size: int = 100_000,
+    ):
+        self.root = root
+        self.compression = compression
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(0.0, float(flush_interval_s))
+        self.row_group_size = max(1, int(row_group_size))
+        self.enabled = available()
+        self._queue: "queue.Queue[Optional[Tuple[str, List[Any]]]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._buffers: Dict[PartitionKey, _Buffer] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+        self._stats = {"events": 0, "files": 0, "rows_written": 0, "dropped": 0, "errors": 0}
+        if not self.enabled:
+            logger.warning("[Archive] pyarrow not installed, event archive disabled")
+
+    # === API producer ===
+    def submit(self, kind: str, events: List[Any]) -> bool:
+        """Antrekan event (list PerpEvent / dict spot). Return False kalau di-drop."""
+        if not self.enabled or not events:
+            return True
+        if kind not in COLUMNS:
+            raise ValueError(f"unknown archive kind: {kind}")
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((kind, list(events)))
+            return True
+        except queue.Full:
+            self._stats["dropped"] += len(events)
+            logger.warning(f"[Archive] Queue full, dropped {len(events)} {kind} events")
+            return False
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Flush semua buffer ke disk lalu hentikan thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return dict(self._stats, queued=self._queue.qsize(), buffered=sum(b.rows for b in self._buffers.values()))
+
+    # === thread archiver ===
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="event-archiver", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        logger.info(f"[Archive] Started → {self.root} ({self.compression})")
+        # cek umur buffer minimal tiap 1 detik walau tidak ada event masuk
+        tick = min(1.0, self.flush_interval) if self.flush_interval > 0 else 1.0
+        while True:
+            try:
+                item = self._queue.get(timeout=tick)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._add(*item)
+            self._flush(force=False)
+        self._flush(force=True)
+        logger.info(f"[Archive] Stopped, stats={self._stats}")
+
+    def _add(self, kind: str, events: List[Any]) -> None:
+        names = [n for n, _ in COLUMNS[kind]]
+        for e in events:
+            key = (kind, _platform_of(kind, e), _day_of(e.get("timestamp")))
+            buf = self._buffers.get(key)
+            if buf is None:
+                buf = self._buffers[key] = _Buffer(names)
+            for n in names:
+                buf.cols[n].append(e.get(n))
+            buf.rows += 1
+        self._stats["events"] += len(events)
+
+    def _flush(self, force: bool) -> None:
+        now = time.monotonic()
+        for key in list(self._buffers):
+            buf = self._buffers[key]
+            if not force and buf.rows < self.flush_rows and now - buf.since < self.flush_interval:
+                continue
+            del self._buffers[key]
+            try:
+                self._write(key, buf)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"[Archive] Failed to write {buf.rows} rows to {key}: {e}")
+
+    def _write(self, key: PartitionKey, buf: _Buffer) -> None:
+        kind, platform, day = key
+        table = pa.Table.from_pydict(buf.cols, schema=_schema(kind))
+        out_dir = partition_dir(self.root, kind, platform, day)
+        os.makedirs(out_dir, exist_ok=True)
+        self._seq += 1
+        name = f"part-{time.time_ns()}-{os.getpid()}-{self._seq:06d}.parquet"
+        path = os.path.join(out_dir, name)
+        pq.write_table(
+            table, path + ".tmp",
+            compression=self.compression,
+            row_group_size=self.row_group_size,
+        )
+        os.replace(path + ".tmp", path)
+        self._stats["files"] += 1
+        self._stats["rows_written"] += buf.rows
+
+
+# === reader ===
+def list_files(
+    root: str,
+    kind: str,
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    platforms: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    File Parquet untuk 1 kind, disaring lewat nama direktori partisi (tanpa
+    membuka file). start / end inklusif (tanggal UTC).
+    """
+    base = os.path.join(root, f"kind={kind}")
+    if not os.path.isdir(base):
+        return []
+    want = set(platforms) if platforms is not None else None
+    lo = start.isoformat() if start else None
+    hi = end.isoformat() if end else None
+    files = []
+    for pdir in sorted(os.listdir(base)):
+        if not pdir.startswith("platform="):
+            continue
+        if want is not None and pdir[len("platform="):] not in want:
+            continue
+        for ddir in sorted(os.listdir(os.path.join(base, pdir))):
+            if not ddir.startswith("date="):
+                continue
+            day = ddir[len("date="):]
+            if (lo and day < lo) or (hi and day > hi):
+                continue
+            d = os.path.join(base, pdir, ddir)
+            files.extend(os.path.join(d, f) for f in sorted(os.listdir(d)) if f.endswith(".parquet"))
+    return files
+
+
+def iter_batches(
+    root: str,
+    kind: str,
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    platforms: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+    batch_size: int = 65_536,
+) -> Iterator["pa.RecordBatch"]:
+    """
+    Stream RecordBatch dari archive. File dibuka memory-mapped (tanpa read()
+    ke buffer), hanya kolom yang diminta yang di-decode → scan jutaan event
+    dengan memori sebesar 1 batch.
+    """
+    if not available():
+        raise RuntimeError("pyarrow is required to read the event archive")
+    names = columns or [n for n, _ in COLUMNS[kind]]
+    for path in list_files(root, kind, start, end, platforms):
+        pf = pq.ParquetFile(path, memory_map=True)
+        have = [n for n in names if n in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=batch_size, columns=have):
+            yield batch if len(have) == len(names) else _conform(batch, kind, names)
+
+
+def read_events(
+    root: str,
+    kind: str,
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    platforms: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> "pa.Table":
+    """Semua event (kolom terpilih) dalam 1 pa.Table, file dibaca memory-mapped."""
+    if not available():
+        raise RuntimeError("pyarrow is required to read the event archive")
+    files = list_files(root, kind, start, end, platforms)
+    names = columns or [n for n, _ in COLUMNS[kind]]
+    if not files:
+        return _schema(kind).empty_table().select(names)
+    tables = []
+    for path in files:
+        have = [n for n in names if n in pq.read_schema(path, memory_map=True).names]
+        t = pq.read_table(path, columns=have, memory_map=True)
+        tables.append(t if len(have) == len(names) else _conform(t, kind, names))
+    return pa.concat_tables(tables)
@@ -1,14 +1,16 @@
 # smartmoney/connectors/base_perp.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+
+from .records import PerpEvent
 
 class BasePerpConnector(ABC):
     platform_name: str
 
     @abstractmethod
-    def fetch_new_events(self, since_ts: int) -> List[Dict[str, Any]]:
+    def fetch_new_events(self, since_ts: int) -> List[Union[PerpEvent, Dict[str, Any]]]:
         """
-        Normalized perp event:
+        Normalized perp event (PerpEvent atau dict dengan key yang sama):
         {
           "wallet_address": str,
           "platform": str,
@@ -18,7 +20,8 @@ class BasePerpConnector(ABC):
           "entry_price": float,
           "size_usd": float,
           "leverage": float,
-          "timestamp": int
+          "timestamp": int,
+          "source_id": str   # identitas unik fill sumber (dedup)
         }
         """
         ...
@@ -1,6 +1,6 @@
 # smartmoney/connectors/base_spot.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 
 class BaseSpotConnector(ABC):
     chain_id: str
@@ -18,13 +18,27 @@ class BaseSpotConnector(ABC):
           "chain_id": str,
           "dex": str,
           "tx_hash": str,
+          "log_index": int,
+          "block_number": int,
+          "block_hash": str,
           "timestamp": int,
           "token_address": str,
           "token_symbol": str,
           "side": "BUY"/"SELL",
           "amount_usd": float,
           "price": float,
-          "liquidity_usd": float
+          "liquidity_usd": float,
+          "source_id": str   # "<chain_id>:<tx_hash>:<log_index>" (dedup)
         }
         """
         ...
+
+    def get_block_hashes(self, block_numbers: List[int]) -> Dict[int, str]:
+        """
+        Hash block canonical saat ini (untuk deteksi reorg oleh SpotIngestor).
+        Block yang belum ada → tidak masuk hasil.
+        """
+        raise NotImplementedError
+
+    def forget_blocks(self, block_numbers: Iterable[int]) -> None:
+        """Buang cache per block (dipanggil setelah reorg). Default: tidak ada cache."""
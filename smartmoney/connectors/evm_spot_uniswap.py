@@ -1,188 +1,679 @@
 # smartmoney/connectors/evm_spot_uniswap.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import itertools
+import sys
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
 from web3 import Web3
 from loguru import logger
 
 from .base_spot import BaseSpotConnector
-from ..tracked import is_tracked_wallet
+from .records import json_loads
+from .swap_decoder import SWAP_DATA_SIZE, decode_swaps, log_data_bytes
+from .reserves import DEFAULT_ROUTING, UNISWAP_V2_SYNC_TOPIC, ReserveIndex
+from ..cache import LRUCache
+from ..token_meta import TokenMetaStore, PairTokens, TokenInfo
+from ..tracked import tracked_addresses
 
-UNISWAP_V2_SWAP_TOPIC = Web3.keccak(
+# to_hex → selalu dengan prefix 0x (HexBytes.hex() versi baru tanpa prefix)
+UNISWAP_V2_SWAP_TOPIC = Web3.to_hex(Web3.keccak(
     text="Swap(address,uint256,uint256,uint256,uint256,address)"
-).hex()
+))
 
-PAIR_ABI = [
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "token0",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "payable": False,
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "token1",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "payable": False,
-        "stateMutability": "view",
-        "type": "function",
-    },
-]
+# Multicall3 (alamat sama di hampir semua chain EVM)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
 
-ERC20_ABI = [
+MULTICALL3_ABI = [
     {
-        "constant": True,
-        "inputs": [],
-        "name": "symbol",
-        "outputs": [{"name": "", "type": "string"}],
-        "payable": False,
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "decimals",
-        "outputs": [{"name": "", "type": "uint8"}],
-        "payable": False,
-        "stateMutability": "view",
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
         "type": "function",
     },
 ]
 
+# selector fungsi view pair / ERC20
+SEL_TOKEN0 = bytes(Web3.keccak(text="token0()")[:4])
+SEL_TOKEN1 = bytes(Web3.keccak(text="token1()")[:4])
+SEL_SYMBOL = bytes(Web3.keccak(text="symbol()")[:4])
+SEL_DECIMALS = bytes(Web3.keccak(text="decimals()")[:4])
+SEL_GET_RESERVES = bytes(Web3.keccak(text="getReserves()")[:4])
+
 KNOWN_STABLES = {
     "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48".lower(),  # USDC
     "0xdac17f958d2ee523a2206206994597c13d831ec7".lower(),  # USDT
     "0x6b175474e89094c44da98b954eedeac495271d0f".lower(),  # DAI
 }
 
+
+# potongan pesan error provider kalau range / hasil get_logs terlalu besar
+RANGE_TOO_LARGE_MARKERS = (
+    "query returned more than",
+    "too many results",
+    "too many logs",
+    "block range",
+    "range too large",
+    "range is too large",
+    "exceed maximum block range",
+    "response size",
+    "limit exceeded",
+    "log response size exceeded",
+    "-32005",
+)
+
+
+class RPCBatchError(Exception):
+    """Batch JSON-RPC gagal (HTTP error / response tidak valid)."""
+
+
+def is_range_too_large(err: Exception) -> bool:
+    msg = str(err).lower()
+    return any(m in msg for m in RANGE_TOO_LARGE_MARKERS)
+
+
 class UniswapV2SpotConnector(BaseSpotConnector):
-    def __init__(self, chain_id: str, rpc_url: str, dex_name: str = "uniswap_v2"):
+    """
+    Connector spot Uniswap V2 (Swap log) untuk 1 chain EVM:
+    - get_logs per block range, lalu tx sender & block timestamp di-resolve
+      dengan batch JSON-RPC (1 HTTP request per `rpc_batch_size` call),
+      bukan get_transaction + get_block per log
+    - timestamp block disimpan di LRU cache (dipakai ulang antar swap & range)
+    - jumlah RPC per range di-log (lihat rpc_stats())
+    - wallet_filter="tx_sender" (default): semua Swap di range, wallet = tx.from
+      (termasuk swap lewat router / multihop).
+      wallet_filter="node" (opt-in): filter wallet di query get_logs lewat topic
+      indexed Swap (`sender` = topics[1], `to` = topics[2]), per chunk
+      `topic_chunk_size` address → kerja per range ikut aktivitas wallet tracked,
+      bukan volume chain. TIDAK menangkap swap di mana wallet bukan sender/to
+      pair: swap lewat router yang output-nya ke router / pair berikutnya
+      (multihop, unwrap ETH, fee-on-transfer) terlewat.
+    - daftar wallet tracked diisi lewat set_tracked_wallets() (dari DB);
+      sebelum diisi pakai wallet manual di config.yaml
+    - get_logs lewat range planner: range dipecah per chunk (ukuran adaptif:
+      dibelah dua kalau provider menolak "too many results"/range terlalu besar,
+      dibesarkan kalau hasil kecil), maks `log_concurrency` chunk paralel,
+      hasil digabung urut block
+    - metadata pair (token0/token1) & token (symbol/decimals) di-resolve per batch
+      lewat Multicall3 aggregate3, disimpan di DB per chain + LRU in-memory
+      (TokenMetaStore), jadi cold start tidak resolve ulang kontrak yang sama
+    - reserve pool di-index dari event Sync (ReserveIndex): pool swap tracked +
+      pool routing (token/WETH, WETH/stable) di-watch; pool baru di-bootstrap
+      sekali lewat getReserves (multicall). liquidity_usd & harga USD pair non-stable
+      jadi lookup O(1) saat normalisasi event
+    """
+
+    def __init__(
+        self,
+        chain_id: str,
+        rpc_url: str,
+        dex_name: str = "uniswap_v2",
+        rpc_batch_size: int = 100,
+        block_cache_size: int = 4096,
+        timeout: float = 30.0,
+        wallet_filter: str = "tx_sender",
+        topic_chunk_size: int = 50,
+        log_concurrency: int = 4,
+        initial_chunk_blocks: int = 500,
+        max_chunk_blocks: int = 10_000,
+        target_logs_per_chunk: int = 2000,
+        meta_store: Optional[TokenMetaStore] = None,
+        metadata_cache_size: int = 50_000,
+        multicall_address: Optional[str] = MULTICALL3_ADDRESS,
+        multicall_batch_size: int = 300,
+        weth_address: Optional[str] = None,
+        v2_factory: Optional[str] = None,
+        v2_init_code_hash: Optional[str] = None,
+        max_watched_pools: int = 5000,
+    ):
         self.chain_id = chain_id
         self.dex = dex_name
+        self.rpc_url = rpc_url
         self.w3 = Web3(Web3.HTTPProvider(rpc_url))
         if not self.w3.is_connected():
             logger.warning(f"[{chain_id}] RPC not connected")
 
-        self._pair_cache = {}
-        self._token_meta = {}
+        # metadata pair/token: LRU → DB → multicall (lihat TokenMetaStore)
+        self.meta = meta_store or TokenMetaStore(chain_id, maxsize=metadata_cache_size)
+        self.multicall_address = multicall_address
+        self.multicall_batch_size = max(1, int(multicall_batch_size))
 
-    def get_latest_block(self) -> int:
-        return self.w3.eth.block_number
+        routing = DEFAULT_ROUTING.get(str(chain_id), {})
+        self.reserves = ReserveIndex(
+            KNOWN_STABLES,
+            weth=weth_address or routing.get("weth"),
+            factory=v2_factory or routing.get("factory"),
+            init_code_hash=v2_init_code_hash or routing.get("init_code_hash"),
+        )
+        # pool yang Sync-nya diikuti tiap range (LRU: pool yang lama tidak dipakai dilepas)
+        self._watched_pools = LRUCache(max_watched_pools)
+
+        self.rpc_batch_size = max(1, int(rpc_batch_size))
+        self.timeout = float(timeout)
+        self._block_ts = LRUCache(block_cache_size)
+        self._rpc_ids = itertools.count(1)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        # counter RPC range terakhir: http = round trip, calls = jumlah method call
+        self._rpc = {"http": 0, "calls": 0}
+
+        if wallet_filter not in ("node", "tx_sender"):
+            raise ValueError(f"Unknown wallet_filter: {wallet_filter}")
+        self.wallet_filter = wallet_filter
+        self.topic_chunk_size = max(1, int(topic_chunk_size))
+        self._tracked: Optional[Set[str]] = None
+        self._tracked_topics: List[str] = []
+
+        self.log_concurrency = max(1, int(log_concurrency))
+        self.max_chunk_blocks = max(1, int(max_chunk_blocks))
+        self.target_logs_per_chunk = max(1, int(target_logs_per_chunk))
+        # ukuran chunk berjalan, dipakai lintas range (catch-up ingat ukuran terakhir)
+        self._chunk_blocks = min(self.max_chunk_blocks, max(1, int(initial_chunk_blocks)))
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def set_tracked_wallets(self, wallets: List[str]):
+        """
+        Set ulang daftar wallet tracked (address 0x...), biasanya semua wallet di DB.
+        Dipakai untuk membership check & topic filter get_logs.
+        """
+        uniq = {w.lower() for w in wallets if w}
+        if uniq == self._tracked:
+            return
+        self._tracked = uniq
+        # topic address = 32 byte, address di 20 byte terakhir (sorted → query deterministik)
+        self._tracked_topics = ["0x" + "0" * 24 + w[2:] for w in sorted(uniq)]
+        logger.info(f"[{self.chain_id}] Tracked wallets updated, count={len(uniq)}")
+
+    def apply_wallet_diff(self, changed: Dict[str, str], removed: Iterable[str]):
+        """Diff dari WalletRegistry (tier tidak dipakai di spot, hanya keanggotaan)."""
+        cur = self._tracked or set()
+        new = (cur | set(changed)) - set(removed)
+        if new != cur:
+            self.set_tracked_wallets(list(new))
+
+    def _tracked_set(self) -> Set[str]:
+        if self._tracked is None:
+            self.set_tracked_wallets(list(tracked_addresses()))
+        return self._tracked
 
-    def _get_pair_tokens(self, pair_addr: str):
-        addr = self.w3.to_checksum_address(pair_addr)
-        if addr in self._pair_cache:
-            return self._pair_cache[addr]
-        pair = self.w3.eth.contract(address=addr, abi=PAIR_ABI)
-        t0 = pair.functions.token0().call()
-        t1 = pair.functions.token1().call()
-        self._pair_cache[addr] = (t0, t1)
-        return t0, t1
-
-    def _get_token_meta(self, token_addr: str):
-        addr = self.w3.to_checksum_address(token_addr)
-        if addr in self._token_meta:
-            return self._token_meta[addr]
-        c = self.w3.eth.contract(address=addr, abi=ERC20_ABI)
+    def rpc_stats(self) -> Dict[str, int]:
+        return dict(self._rpc)
+
+    def _count_rpc(self, http: int, calls: int):
+        with self._lock:
+            self._rpc["http"] += http
+            self._rpc["calls"] += calls
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.log_concurrency,
+                thread_name_prefix=f"spot-logs-{self.chain_id}",
+            )
+        return self._executor
+
+    def _fetch_log_range(self, lo: int, hi: int, topics: list, address: Optional[List[str]] = None) -> List[Any]:
+        """
+        get_logs 1 chunk. Kalau provider menolak karena range / hasil terlalu besar,
+        chunk dibelah dua (rekursif) dan ukuran chunk berjalan ikut diperkecil.
+        Error lain dilempar (range dianggap gagal).
+        """
         try:
-            symbol = c.functions.symbol().call()
+            flt = {"fromBlock": lo, "toBlock": hi, "topics": topics}
+            if address:
+                flt["address"] = address
+            logs = self.w3.eth.get_logs(flt)
+            self._count_rpc(1, 1)
+        except Exception as e:
+            self._count_rpc(1, 1)
+            if lo >= hi or not is_range_too_large(e):
+                raise
+            mid = (lo + hi) // 2
+            with self._lock:
+                self._chunk_blocks = max(1, min(self._chunk_blocks, (hi - lo + 1) // 2))
+            logger.debug(f"[{self.chain_id}] get_logs {lo}–{hi} too large, split → chunk {self._chunk_blocks}")
+            return (
+                self._fetch_log_range(lo, mid, topics, address)
+                + self._fetch_log_range(mid + 1, hi, topics, address)
+            )
+
+        with self._lock:
+            if len(logs) < self.target_logs_per_chunk // 4 and hi - lo + 1 >= self._chunk_blocks:
+                self._chunk_blocks = min(self.max_chunk_blocks, self._chunk_blocks * 2)
+        return logs
+
+    def _get_logs(
+        self, from_block: int, to_block: int, topics: list, address: Optional[List[str]] = None
+    ) -> List[Any]:
+        """
+        get_logs untuk range panjang lewat range planner.
+        Chunk dijadwalkan bertahap (ukuran chunk terbaru dipakai untuk chunk berikutnya),
+        maks log_concurrency in-flight. Return log urut block.
+        """
+        if to_block - from_block + 1 <= self._chunk_blocks:
+            return self._fetch_log_range(from_block, to_block, topics, address)
+
+        executor = self._get_executor()
+        results: Dict[int, List[Any]] = {}
+        in_flight = {}
+        next_start = from_block
+        try:
+            while next_start <= to_block or in_flight:
+                while next_start <= to_block and len(in_flight) < self.log_concurrency:
+                    end = min(to_block, next_start + self._chunk_blocks - 1)
+                    in_flight[executor.submit(self._fetch_log_range, next_start, end, topics, address)] = next_start
+                    next_start = end + 1
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[in_flight.pop(fut)] = fut.result()
         except Exception:
-            symbol = "UNKNOWN"
+            for fut in in_flight:
+                fut.cancel()
+            raise
+
+        # log per chunk sudah urut; chunk digabung urut block awal
+        return [log for start in sorted(results) for log in results[start]]
+
+    def _rpc_batch(self, method: str, params_list: List[list]) -> List[Optional[Any]]:
+        """
+        Kirim banyak call `method` sebagai batch JSON-RPC (dipecah per rpc_batch_size).
+        Return result sesuai urutan params_list; call yang error → None.
+        Error HTTP / format dilempar (range dianggap gagal).
+        """
+        results: List[Optional[Any]] = []
+        for i in range(0, len(params_list), self.rpc_batch_size):
+            chunk = params_list[i:i + self.rpc_batch_size]
+            ids = [next(self._rpc_ids) for _ in chunk]
+            payload = [
+                {"jsonrpc": "2.0", "id": rid, "method": method, "params": params}
+                for rid, params in zip(ids, chunk)
+            ]
+            resp = self.session.post(self.rpc_url, json=payload, timeout=self.timeout)
+            self._count_rpc(1, len(chunk))
+            resp.raise_for_status()
+            data = json_loads(resp.content)
+            if not isinstance(data, list):
+                raise RPCBatchError(f"{method}: unexpected batch response {str(data)[:200]}")
+
+            # node boleh mengembalikan batch dengan urutan berbeda → map lewat id
+            by_id = {}
+            for item in data:
+                if item.get("error"):
+                    logger.warning(f"[{self.chain_id}] {method} error: {item['error']}")
+                    continue
+                by_id[item.get("id")] = item.get("result")
+            results.extend(by_id.get(rid) for rid in ids)
+        return results
+
+    def _get_tx_senders(self, tx_hashes: List[str]) -> Dict[str, str]:
+        """tx hash (0x...) → address pengirim (checksum)."""
+        if not tx_hashes:
+            return {}
+        txs = self._rpc_batch("eth_getTransactionByHash", [[h] for h in tx_hashes])
+        return {
+            h: Web3.to_checksum_address(tx["from"])
+            for h, tx in zip(tx_hashes, txs)
+            if tx and tx.get("from")
+        }
+
+    def _get_block_timestamps(self, block_numbers: List[int]) -> Dict[int, int]:
+        """block number → timestamp (detik), lewat LRU cache lalu batch RPC untuk yang belum ada."""
+        out: Dict[int, int] = {}
+        missing = []
+        for bn in block_numbers:
+            ts = self._block_ts.get(bn)
+            if ts is None:
+                missing.append(bn)
+            else:
+                out[bn] = ts
+        if missing:
+            blocks = self._rpc_batch("eth_getBlockByNumber", [[hex(bn), False] for bn in missing])
+            for bn, block in zip(missing, blocks):
+                if block and block.get("timestamp") is not None:
+                    ts = int(block["timestamp"], 16)
+                    self._block_ts.put(bn, ts)
+                    out[bn] = ts
+        return out
+
+    def get_latest_block(self) -> int:
+        return self.w3.eth.block_number
+
+    def get_block_hashes(self, block_numbers: List[int]) -> Dict[int, str]:
+        """Hash block canonical saat ini (1 batch RPC, tanpa cache: dipakai deteksi reorg)."""
+        if not block_numbers:
+            return {}
+        blocks = self._rpc_batch("eth_getBlockByNumber", [[hex(bn), False] for bn in block_numbers])
+        return {bn: b["hash"] for bn, b in zip(block_numbers, blocks) if b and b.get("hash")}
+
+    def forget_blocks(self, block_numbers) -> None:
+        # timestamp block orphan tidak boleh dipakai lagi untuk block pengganti
+        for bn in block_numbers:
+            self._block_ts.pop(bn)
+        # reserve bisa berasal dari Sync di block orphan → bootstrap ulang semua pool
+        self._watched_pools = LRUCache(self._watched_pools.maxsize)
+
+    def _multicall(
+        self, calls: List[Tuple[str, bytes]], block_identifier: Any = "latest"
+    ) -> List[Optional[bytes]]:
+        """
+        Jalankan banyak eth_call (target, calldata) lewat Multicall3 aggregate3,
+        per chunk multicall_batch_size. Return returnData per call (None kalau gagal).
+        Tanpa multicall (atau kontraknya tidak ada di chain) → eth_call satu per satu.
+        block_identifier: state block yang dibaca (default head).
+        """
+        if self.multicall_address:
+            try:
+                mc = self.w3.eth.contract(
+                    address=self.w3.to_checksum_address(self.multicall_address), abi=MULTICALL3_ABI
+                )
+                out: List[Optional[bytes]] = []
+                for i in range(0, len(calls), self.multicall_batch_size):
+                    chunk = calls[i:i + self.multicall_batch_size]
+                    res = mc.functions.aggregate3([(t, True, data) for t, data in chunk]).call(
+                        block_identifier=block_identifier
+                    )
+                    self._count_rpc(1, 1)
+                    out.extend(bytes(ret) if ok and ret else None for ok, ret in res)
+                return out
+            except Exception as e:
+                logger.warning(f"[{self.chain_id}] Multicall failed, falling back to single eth_call: {e}")
+
+        out = []
+        for target, data in calls:
+            try:
+                out.append(bytes(self.w3.eth.call({"to": target, "data": data}, block_identifier)) or None)
+            except Exception:
+                out.append(None)
+            self._count_rpc(1, 1)
+        return out
+
+    def _resolve_pairs(self, pair_addrs: List[str]) -> Dict[str, PairTokens]:
+        calls = [(a, sel) for a in pair_addrs for sel in (SEL_TOKEN0, SEL_TOKEN1)]
+        res = self._multicall(calls)
+        out: Dict[str, PairTokens] = {}
+        for i, addr in enumerate(pair_addrs):
+            t0, t1 = res[2 * i], res[2 * i + 1]
+            if not t0 or not t1 or len(t0) < 32 or len(t1) < 32:
+                # bukan pair V2 / call gagal → jangan di-cache, log-nya di-skip
+                logger.warning(f"[{self.chain_id}] Could not resolve pair tokens for {addr}")
+                continue
+            out[addr] = (
+                Web3.to_checksum_address(t0[12:32]),
+                Web3.to_checksum_address(t1[12:32]),
+            )
+        return out
+
+    def _decode_symbol(self, raw: Optional[bytes]) -> str:
+        if not raw:
+            return "UNKNOWN"
         try:
-            decimals = c.functions.decimals().call()
+            return self.w3.codec.decode(["string"], raw)[0]
         except Exception:
-            decimals = 18
-        self._token_meta[addr] = (symbol, decimals)
-        return symbol, decimals
+            pass
+        # token lama (mis. MKR) mengembalikan bytes32
+        sym = raw[:32].rstrip(b"\x00").decode("utf-8", errors="ignore")
+        return sym or "UNKNOWN"
+
+    def _resolve_tokens(self, token_addrs: List[str]) -> Dict[str, TokenInfo]:
+        calls = [(a, sel) for a in token_addrs for sel in (SEL_SYMBOL, SEL_DECIMALS)]
+        res = self._multicall(calls)
+        out: Dict[str, TokenInfo] = {}
+        for i, addr in enumerate(token_addrs):
+            sym_raw, dec_raw = res[2 * i], res[2 * i + 1]
+            # default sama dengan jalur lama: symbol UNKNOWN, decimals 18
+            decimals = int.from_bytes(dec_raw[:32], "big") if dec_raw and len(dec_raw) >= 32 else 18
+            out[addr] = (self._decode_symbol(sym_raw), decimals if decimals <= 255 else 18)
+        return out
+
+    def _get_logs_by_sender(
+        self, from_block: int, to_block: int, tracked: Set[str]
+    ) -> Tuple[List[Tuple[Any, str]], int, List[Any]]:
+        """
+        Mode tx_sender: semua Swap di range, wallet = tx.from (1 batch RPC untuk
+        semua tx unik). Sync ikut di get_logs yang sama (topic0 = Swap OR Sync),
+        dipisah lokal → tanpa query Sync terpisah per pool yang di-watch.
+        Return ([(log, wallet)], jumlah log Swap mentah, log Sync).
+        """
+        logs, syncs = [], []
+        for log in self._get_logs(from_block, to_block, [[UNISWAP_V2_SWAP_TOPIC, UNISWAP_V2_SYNC_TOPIC]]):
+            (logs if Web3.to_hex(log["topics"][0]) == UNISWAP_V2_SWAP_TOPIC else syncs).append(log)
+        tx_hashes = sorted({Web3.to_hex(log["transactionHash"]) for log in logs})
+        senders = self._get_tx_senders(tx_hashes)
+        matched = []
+        for log in logs:
+            wallet = senders.get(Web3.to_hex(log["transactionHash"]))
+            if wallet and wallet.lower() in tracked:
+                matched.append((log, wallet))
+        return matched, len(logs), syncs
+
+    def _get_logs_for_wallets(self, from_block: int, to_block: int) -> List[Tuple[Any, str]]:
+        """
+        Mode node: get_logs dengan topic filter per chunk wallet tracked,
+        1 query untuk `sender` dan 1 untuk `to`. Wallet = address di topic yang cocok
+        (`to` menang kalau dua-duanya tracked, karena lewat router `sender` = router).
+        Return [(log, wallet)] urut (block, logIndex).
+        """
+        topics = self._tracked_topics
+        found: Dict[Tuple[str, int], Tuple[Any, str]] = {}
+        for i in range(0, len(topics), self.topic_chunk_size):
+            chunk = topics[i:i + self.topic_chunk_size]
+            for pos in (1, 2):
+                topic_filter = [UNISWAP_V2_SWAP_TOPIC, None, None][:pos] + [chunk]
+                for log in self._get_logs(from_block, to_block, topic_filter):
+                    key = (Web3.to_hex(log["transactionHash"]), int(log["logIndex"]))
+                    if pos == 1 and key in found:
+                        continue
+                    wallet = Web3.to_checksum_address("0x" + Web3.to_hex(log["topics"][pos])[-40:])
+                    found[key] = (log, wallet)
+        return sorted(found.values(), key=lambda x: (int(x[0]["blockNumber"]), int(x[0]["logIndex"])))
+
+    def _update_reserves(
+        self,
+        from_block: int,
+        to_block: int,
+        swap_pairs: Dict[str, PairTokens],
+        sync_logs: Optional[List[Any]] = None,
+    ) -> List[Tuple[Tuple[int, int], str, int, int]]:
+        """
+        Siapkan ReserveIndex untuk range ini:
+        - daftarkan pair swap + pair routing token-nya, decimals semua token terkait
+        - pool baru → bootstrap getReserves (multicall) di block from_block - 1,
+          lalu ikut di-watch; Sync di range ini diterapkan di atasnya
+        - Sync pool yang di-watch di range ini: dari sync_logs (sudah diambil
+          bersama Swap, mode tx_sender), atau query Sync per chunk pool kalau
+          None (mode node: filter topic wallet tidak pernah cocok dengan Sync)
+        Return Sync urut (block, logIndex) untuk diterapkan sambil jalan di atas swap.
+        """
+        idx = self.reserves
+        needed = set(swap_pairs)
+        for pair, (t0, t1) in swap_pairs.items():
+            idx.register_pair(pair, t0, t1)
+            needed.update(idx.route_pairs_for(t0))
+            needed.update(idx.route_pairs_for(t1))
+        needed.update(idx.weth_usd_pairs())
+
+        new = sorted(p for p in needed if p not in self._watched_pools)
+        if new:
+            tokens = {t for p in new for t in (idx.pair_tokens(p) or ())}
+            for t, (_, dec) in self.meta.get_tokens(tokens, self._resolve_tokens).items():
+                idx.register_decimals(t, dec)
+            # reserve di akhir block sebelum range (bukan head), posisi = akhir block itu
+            base = from_block - 1
+            res = self._multicall([(p, SEL_GET_RESERVES) for p in new], block_identifier=base)
+            for p, raw in zip(new, res):
+                if raw and len(raw) >= 64:
+                    idx.apply_sync(
+                        p, int.from_bytes(raw[:32], "big"), int.from_bytes(raw[32:64], "big"),
+                        (base, sys.maxsize), snapshot=True,
+                    )
+                else:
+                    # pair routing tidak ada di DEX ini
+                    idx.mark_missing(p)
+                self._watched_pools.put(p)
+        for p in needed:
+            self._watched_pools.get(p)  # refresh posisi LRU
+
+        watched = sorted(self._watched_pools.keys())
+        if sync_logs is None:
+            sync_logs = []
+            for i in range(0, len(watched), self.topic_chunk_size):
+                sync_logs.extend(self._get_logs(
+                    from_block, to_block, [UNISWAP_V2_SYNC_TOPIC], watched[i:i + self.topic_chunk_size]
+                ))
+        watched_set = set(watched)
+        syncs = []
+        for log in sync_logs:
+            pair = Web3.to_checksum_address(log["address"])
+            if pair not in watched_set:
+                continue
+            data = log_data_bytes(log["data"])
+            if len(data) < 64:
+                continue
+            syncs.append((
+                (int(log["blockNumber"]), int(log["logIndex"])),
+                pair,
+                int.from_bytes(data[:32], "big"),
+                int.from_bytes(data[32:64], "big"),
+            ))
+        syncs.sort()
+        return syncs
 
     def fetch_new_events(self, from_block: int, to_block: int) -> List[Dict[str, Any]]:
         logger.info(f"[{self.chain_id}] Fetching Swap logs {from_block}–{to_block}")
-        logs = self.w3.eth.get_logs({
-            "fromBlock": from_block,
-            "toBlock": to_block,
-            "topics": [UNISWAP_V2_SWAP_TOPIC]
-        })
+        self._rpc = {"http": 0, "calls": 0}
+        tracked = self._tracked_set()
+        sync_logs = None
+        if self.wallet_filter == "node":
+            matched = self._get_logs_for_wallets(from_block, to_block)
+            n_logs = len(matched)
+        else:
+            matched, n_logs, sync_logs = self._get_logs_by_sender(from_block, to_block, tracked)
         events: List[Dict[str, Any]] = []
 
-        for log in logs:
+        tracked_logs = [log for log, _ in matched]
+        block_ts = self._get_block_timestamps(sorted({int(log["blockNumber"]) for log in tracked_logs}))
+
+        # metadata semua pair & token di range ini sekaligus (LRU → DB → multicall)
+        pairs = self.meta.get_pairs(
+            {Web3.to_checksum_address(log["address"]) for log, _ in matched}, self._resolve_pairs
+        )
+        tokens = self.meta.get_tokens({t for p in pairs.values() for t in p}, self._resolve_tokens)
+        for t, (_, dec) in tokens.items():
+            self.reserves.register_decimals(t, dec)
+        syncs = self._update_reserves(from_block, to_block, pairs, sync_logs)
+
+        # fase 1: metadata per log, fase 2: decode + klasifikasi bulk
+        rows = []
+        for log, wallet in matched:
             try:
-                tx = self.w3.eth.get_transaction(log["transactionHash"])
-                wallet = tx["from"]
-                if not is_tracked_wallet(wallet):
+                ts = block_ts.get(int(log["blockNumber"]))
+                if ts is None:
+                    logger.warning(f"[{self.chain_id}] No timestamp for block {log['blockNumber']}, skipping log")
                     continue
 
-                block = self.w3.eth.get_block(log["blockNumber"])
-                ts = block["timestamp"]
-
-                pair_addr = log["address"]
-                token0, token1 = self._get_pair_tokens(pair_addr)
-                t0_sym, t0_dec = self._get_token_meta(token0)
-                t1_sym, t1_dec = self._get_token_meta(token1)
-
-                data_bytes = bytes.fromhex(log["data"][2:])
-                amount0_in, amount1_in, amount0_out, amount1_out = \
-                    self.w3.codec.decode(["uint256", "uint256", "uint256", "uint256"], data_bytes)
-
-                token0_lower = token0.lower()
-                token1_lower = token1.lower()
-
-                amt0_in = amount0_in / (10 ** t0_dec)
-                amt1_in = amount1_in / (10 ** t1_dec)
-                amt0_out = amount0_out / (10 ** t0_dec)
-                amt1_out = amount1_out / (10 ** t1_dec)
-
-                if token0_lower in KNOWN_STABLES and token1_lower not in KNOWN_STABLES:
-                    main_token_addr = token1
-                    main_symbol = t1_sym
-                    if amt1_out > 0:
-                        side = "BUY"
-                        amount_token = amt1_out
-                        stable_amount = amt0_in
-                    else:
-                        side = "SELL"
-                        amount_token = amt1_in
-                        stable_amount = amt0_out
-                elif token1_lower in KNOWN_STABLES and token0_lower not in KNOWN_STABLES:
-                    main_token_addr = token0
-                    main_symbol = t0_sym
-                    if amt0_out > 0:
-                        side = "BUY"
-                        amount_token = amt0_out
-                        stable_amount = amt1_in
-                    else:
-                        side = "SELL"
-                        amount_token = amt0_in
-                        stable_amount = amt1_out
-                else:
-                    main_token_addr = token0
-                    main_symbol = t0_sym
-                    side = "BUY" if amt0_out > 0 else "SELL"
-                    amount_token = amt0_out if amt0_out > 0 else amt0_in
-                    stable_amount = 0.0
-
-                if stable_amount > 0 and amount_token > 0:
-                    price = stable_amount / amount_token
-                    amount_usd = stable_amount
+                pair_addr = Web3.to_checksum_address(log["address"])
+                pair_tokens = pairs.get(pair_addr)
+                if pair_tokens is None:
+                    continue
+                token0, token1 = pair_tokens
+                t0_meta, t1_meta = tokens[token0], tokens[token1]
+                data_bytes = log_data_bytes(log["data"])
+                if len(data_bytes) < SWAP_DATA_SIZE:
+                    logger.warning(f"[{self.chain_id}] Short Swap data in {Web3.to_hex(log['transactionHash'])}, skipping log")
+                    continue
+                rows.append((log, wallet, ts, token0, token1, t0_meta, t1_meta, data_bytes, pair_addr))
+            except Exception as e:
+                logger.error(f"[{self.chain_id}] Error parsing log: {e}")
+        # urut (block, logIndex) supaya Sync bisa diterapkan sambil jalan
+        rows.sort(key=lambda r: (int(r[0]["blockNumber"]), int(r[0]["logIndex"])))
+
+        decoded = decode_swaps(
+            [r[7] for r in rows],
+            [r[5][1] for r in rows],
+            [r[6][1] for r in rows],
+            [r[3].lower() in KNOWN_STABLES for r in rows],
+            [r[4].lower() in KNOWN_STABLES for r in rows],
+        )
+
+        si = 0
+        for i, (log, wallet, ts, token0, token1, t0_meta, t1_meta, _, pair_addr) in enumerate(rows):
+            # reserve = kondisi tepat sebelum log Swap ini (Sync V2 di-emit sebelum Swap)
+            pos = (int(log["blockNumber"]), int(log["logIndex"]))
+            while si < len(syncs) and syncs[si][0] < pos:
+                self.reserves.apply_sync(syncs[si][1], syncs[si][2], syncs[si][3], syncs[si][0])
+                si += 1
+            try:
+                if decoded["main_is_token1"][i]:
+                    main_token_addr, main_symbol = token1, t1_meta[0]
                 else:
-                    price = 0.0
-                    amount_usd = 0.0
+                    main_token_addr, main_symbol = token0, t0_meta[0]
+                side = "BUY" if decoded["is_buy"][i] else "SELL"
+                amount_usd = decoded["amount_usd"][i]
+                price = decoded["price"][i]
+                amount_token = decoded["amount_token"][i]
+                if amount_usd <= 0 and amount_token > 0:
+                    # pair tanpa stable → harga lewat routing WETH/stable dari reserve
+                    price = self.reserves.usd_price(main_token_addr, pair_addr)
+                    amount_usd = amount_token * price
+                liquidity_usd = self.reserves.liquidity_usd(pair_addr)
 
+                tx_hash = Web3.to_hex(log["transactionHash"])
+                log_index = int(log["logIndex"])
                 events.append({
                     "wallet_address": wallet,
                     "chain_id": self.chain_id,
                     "dex": self.dex,
-                    "tx_hash": tx["hash"].hex(),
+                    "tx_hash": tx_hash,
+                    "log_index": log_index,
+                    "block_number": int(log["blockNumber"]),
+                    "block_hash": Web3.to_hex(log["blockHash"]),
                     "timestamp": int(ts),
                     "token_address": main_token_addr,
                     "token_symbol": main_symbol,
                     "side": side,
                     "amount_usd": float(amount_usd),
                     "price": float(price),
-                    "liquidity_usd": 0.0,
+                    "liquidity_usd": float(liquidity_usd),
+                    "source_id": f"{self.chain_id}:{tx_hash}:{log_index}",
                 })
             except Exception as e:
                 logger.error(f"[{self.chain_id}] Error parsing log: {e}")
+        for pos, pair, r0, r1 in syncs[si:]:
+            self.reserves.apply_sync(pair, r0, r1, pos)
+
+        logger.info(
+            f"[{self.chain_id}] Range {from_block}–{to_block} ({self.wallet_filter}): {n_logs} logs, "
+            f"{len(tracked_logs)} tracked, {len(events)} events, "
+            f"RPC http={self._rpc['http']} calls={self._rpc['calls']} "
+            f"(per-log path: ~{1 + 2 * n_logs}), block cache={len(self._block_ts)}, "
+            f"chunk={self._chunk_blocks} blocks"
+        )
         return events
@@ -0,0 +1,238 @@
+# smartmoney/connectors/hyperliquid_client.py
+from typing import Any, Dict, Optional
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from .records import json_loads
+
+DEFAULT_INFO_URL = "https://api.hyperliquid.xyz/info"
+
+# Budget REST Hyperliquid: 1200 weight / menit per IP
+DEFAULT_WEIGHT_BUDGET_PER_MIN = 1200
+
+# Weight per type request Info API (default 20)
+INFO_REQUEST_WEIGHTS = {
+    "l2Book": 2,
+    "allMids": 2,
+    "clearinghouseState": 2,
+    "orderStatus": 2,
+    "spotClearinghouseState": 2,
+    "exchangeStatus": 2,
+    "userRole": 60,
+}
+DEFAULT_INFO_WEIGHT = 20
+
+# Type yang kena weight tambahan per 20 item di response
+PER_ITEM_WEIGHT_TYPES = {
+    "userFills",
+    "userFillsByTime",
+    "historicalOrders",
+    "userTwapSliceFills",
+    "userFunding",
+    "userNonFundingLedgerUpdates",
+    "fundingHistory",
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HyperliquidAPIError(Exception):
+    """Request gagal setelah semua retry habis (request di-drop)."""
+
+
+def request_weight(req_type: str) -> int:
+    return INFO_REQUEST_WEIGHTS.get(req_type, DEFAULT_INFO_WEIGHT)
+
+
+def response_extra_weight(req_type: str, data: Any) -> int:
+    if req_type in PER_ITEM_WEIGHT_TYPES and isinstance(data, list):
+        return len(data) // 20
+    return 0
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe:
+    - capacity = budget weight per menit
+    - refill linear capacity/60 per detik
+    - charge() boleh bikin saldo negatif (weight tambahan yang baru
+      ketahuan setelah response), acquire() berikutnya akan menunggu
+    """
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.refill_per_sec)
+        self._last = now
+
+    def acquire(self, weight: float) -> float:
+        """Blok sampai weight tersedia. Return total detik menunggu."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return waited
+                need = (weight - self._tokens) / self.refill_per_sec
+            time.sleep(need)
+            waited += need
+
+    def charge(self, weight: float):
+        with self._lock:
+            self._refill()
+            self._tokens -= weight
+
+
+class HyperliquidInfoClient:
+    """
+    Client HTTP bersama untuk connector & discovery:
+    - requests.Session dengan connection pool keep-alive
+    - token bucket sesuai weight tiap type request
+    - retry exponential backoff + jitter untuk 429 / 5xx / error koneksi
+    - counter: requests, retries, throttled (429), local_waits, dropped
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_INFO_URL,
+        weight_budget_per_min: int = DEFAULT_WEIGHT_BUDGET_PER_MIN,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        pool_maxsize: int = 16,
+        timeout: float = 15.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.timeout = float(timeout)
+        self.limiter = TokenBucket(weight_budget_per_min, weight_budget_per_min / 60.0)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, int(pool_maxsize)))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "local_waits": 0,
+            "local_wait_s": 0.0,
+            "dropped": 0,
+            "weight_used": 0,
+        }
+
+    def _incr(self, key: str, value=1):
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(cap / 2.0, cap)
+
+    def _request(
+        self, method: str, url: str, weight: int, label: str, timeout: Optional[float] = None, **kwargs
+    ) -> requests.Response:
+        last_err: Optional[str] = None
+        timeout = self.timeout if timeout is None else float(timeout)
+        for attempt in range(self.max_retries + 1):
+            if weight > 0:
+                waited = self.limiter.acquire(weight)
+                if waited > 0:
+                    self._incr("local_waits")
+                    self._incr("local_wait_s", waited)
+                self._incr("weight_used", weight)
+
+            self._incr("requests")
+            retry_after = None
+            try:
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    return resp
+                if resp.status_code == 429:
+                    self._incr("throttled")
+                retry_after = resp.headers.get("Retry-After")
+                last_err = f"HTTP {resp.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_err = str(e)
+
+            if attempt < self.max_retries:
+                self._incr("retries")
+                time.sleep(self._backoff(attempt, retry_after))
+
+        self._incr("dropped")
+        raise HyperliquidAPIError(f"{label} failed after {self.max_retries + 1} attempts: {last_err}")
+
+    def post_info(self, body: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """
+        POST ke Info API, return JSON yang sudah di-decode (orjson kalau ada).
+        timeout: batas per attempt HTTP (detik); None → timeout client.
+        """
+        req_type = body.get("type", "")
+        resp = self._request(
+            "POST",
+            self.base_url,
+            request_weight(req_type),
+            req_type,
+            timeout=timeout,
+            json=body,
+        )
+        data = json_loads(resp.content)
+        extra = response_extra_weight(req_type, data)
+        if extra:
+            self.limiter.charge(extra)
+            self._incr("weight_used", extra)
+        return data
+
+    def get_json(self, url: str, weight: int = 0) -> Any:
+        """
+        GET JSON dari URL lain (mis. stats server leaderboard).
+        weight=0 → tidak dihitung ke budget Info API.
+        """
+        resp = self._request("GET", url, weight, url)
+        return json_loads(resp.content)
+
+
+_clients: Dict[str, HyperliquidInfoClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_info_client(base_url: str = DEFAULT_INFO_URL, **kwargs) -> HyperliquidInfoClient:
+    """
+    Client bersama per base_url (1 pool + 1 budget per endpoint).
+    kwargs hanya dipakai saat client pertama kali dibuat.
+    """
+    key = (base_url or DEFAULT_INFO_URL).rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = HyperliquidInfoClient(base_url=key, **kwargs)
+            _clients[key] = client
+            logger.info(f"[HLClient] Created shared Info API client for {key}")
+        return client
@@ -22,6 +22,9 @@ class MockSpotConnector(BaseSpotConnector):
             "chain_id": self.chain_id,
             "dex": self.dex,
             "tx_hash": f"0xMOCKTX{to_block}",
+            "log_index": 0,
+            "block_number": to_block,
+            "block_hash": f"0xMOCKBLOCK{to_block}",
             "timestamp": now,
             "token_address": "0xMOCKTOKEN",
             "token_symbol": "MOCK",
@@ -29,8 +32,12 @@ class MockSpotConnector(BaseSpotConnector):
             "amount_usd": 10000.0,
             "price": 1.0,
             "liquidity_usd": 500000.0,
+            "source_id": f"{self.chain_id}:0xMOCKTX{to_block}:0",
         }]
 
+    def get_block_hashes(self, block_numbers: List[int]) -> Dict[int, str]:
+        return {bn: f"0xMOCKBLOCK{bn}" for bn in block_numbers if bn <= self._block}
+
 class MockPerpConnector(BasePerpConnector):
     def __init__(self):
         self.platform_name = "mock_perp"
@@ -47,4 +54,5 @@ class MockPerpConnector(BasePerpConnector):
             "size_usd": 50000.0,
             "leverage": 3.0,
             "timestamp": now,
+            "source_id": f"{self.platform_name}:0xmockwallet:{now}",
         }]
@@ -1,10 +1,49 @@
 # smartmoney/connectors/perp_hyperliquid.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Iterator, Tuple, TYPE_CHECKING
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 import time
-import requests
 from loguru import logger
 
 from .base_perp import BasePerpConnector
+from .hyperliquid_client import HyperliquidInfoClient, get_info_client
+from .poll_scheduler import WalletPollScheduler
+from .records import DIR_TABLE, PERP_DIRS, PerpEvent, PerpFill
+
+if TYPE_CHECKING:
+    from ..engine.positions import PositionBook
+
+# userFillsByTime maksimal mengembalikan 2000 fill per response
+FILLS_PAGE_LIMIT = 2000
+
+# cursor fill = (time_ms, tid)
+FillCursor = Tuple[int, int]
+
+
+def _fill_key(f: PerpFill) -> FillCursor:
+    return f.time, f.tid
+
+
+def parse_fills(raw_fills: List[Dict[str, Any]]) -> Tuple[List[PerpFill], Optional[FillCursor]]:
+    """
+    dict JSON → PerpFill, hanya untuk fill perp dengan `dir` yang dikenal
+    (fill spot '@...' / 'TOKEN/USDC' dan dir lain dibuang sebelum konversi angka).
+    Return juga key (time, tid) terbesar dari SEMUA fill mentah, supaya cursor
+    tetap maju melewati fill yang dibuang.
+    """
+    out: List[PerpFill] = []
+    last_key: Optional[FillCursor] = None
+    for d in raw_fills:
+        try:
+            key = (int(d.get("time") or 0), int(d.get("tid") or 0))
+            if last_key is None or key > last_key:
+                last_key = key
+            coin = d.get("coin")
+            if not coin or coin[0] == "@" or "/" in coin or d.get("dir") not in PERP_DIRS:
+                continue
+            out.append(PerpFill.from_raw(d))
+        except Exception as e:
+            logger.error(f"[Hyperliquid] Malformed fill skipped: {e}")
+    return out, last_key
 
 
 class HyperliquidConnector(BasePerpConnector):
@@ -14,12 +53,113 @@ class HyperliquidConnector(BasePerpConnector):
     - type: "userFillsByTime"
     - Per wallet, ambil trade perp (Open/Increase Long/Short)
     - Daftar wallet diisi dinamis lewat .set_tracked_wallets([...])
+    - Fetch per wallet jalan paralel (thread pool), maksimal
+      `max_concurrency` request in-flight sekaligus
+    - HTTP lewat HyperliquidInfoClient bersama (keep-alive, rate limit, retry)
+    - Cursor per wallet (time ms + tid): tiap poll hanya ambil fill baru,
+      paginated sampai wallet caught-up. Cursor di-load / di-persist oleh runner
+      lewat load_cursors() / pop_dirty_cursors().
+    - Opsional PositionBook: fill → OPEN/INCREASE/DECREASE/CLOSE (flip = CLOSE + OPEN)
+      dengan leverage & liq price asli; posisi direkonsiliasi berkala dengan
+      snapshot clearinghouseState (round-robin, `reconcile_batch` wallet per cycle)
     """
 
-    def __init__(self, base_url: str = "https://api.hyperliquid.xyz/info"):
+    def __init__(
+        self,
+        base_url: str = "https://api.hyperliquid.xyz/info",
+        max_concurrency: int = 8,
+        batch_timeout: float = 30.0,
+        request_timeout: Optional[float] = None,
+        client: Optional[HyperliquidInfoClient] = None,
+        max_pages_per_poll: int = 10,
+        aggregate_by_time: bool = True,
+        scheduler: Optional[WalletPollScheduler] = None,
+        position_book: Optional["PositionBook"] = None,
+        reconcile_interval: float = 300.0,
+        reconcile_batch: int = 20,
+    ):
         self.platform_name = "hyperliquid"
         self.base_url = base_url.rstrip("/")
+        self.client = client or get_info_client(self.base_url, pool_maxsize=max_concurrency)
         self._tracked_wallets: List[str] = []
+        self.max_concurrency = max(1, int(max_concurrency))
+        # batas waktu 1 batch; wallet yang belum selesai di-skip (tidak menahan batch)
+        self.batch_timeout = float(batch_timeout)
+        # timeout per request HTTP, di bawah batch_timeout supaya thread yang
+        # macet di socket lepas sendiri (future yang sudah jalan tidak bisa di-cancel)
+        if request_timeout is None:
+            request_timeout = min(self.client.timeout, self.batch_timeout / 2)
+        self.request_timeout = min(float(request_timeout), self.batch_timeout / 2)
+        self._executor = None
+        # wallet yang fetch-nya masih jalan di thread pool (mis. lewat batch_timeout):
+        # tidak di-submit ulang sampai future-nya selesai
+        self._inflight: Dict[str, Future] = {}
+        # batas halaman per wallet per poll; sisa catch-up lanjut di poll berikutnya
+        self.max_pages_per_poll = max(1, int(max_pages_per_poll))
+        self.aggregate_by_time = bool(aggregate_by_time)
+        # opsional: kalau ada, hanya wallet yang "due" menurut scheduler yang di-poll
+        self.scheduler = scheduler
+        self._cursors: Dict[str, FillCursor] = {}
+        self._dirty_cursors: Dict[str, FillCursor] = {}
+        # cursor terakhir yang sudah di-commit (atau titik awal wallet baru) → target rewind
+        self._committed_cursors: Dict[str, FillCursor] = {}
+        self.position_book = position_book
+        # tiap wallet direkonsiliasi paling lambat tiap reconcile_interval detik
+        self.reconcile_interval = float(reconcile_interval)
+        self.reconcile_batch = max(1, int(reconcile_batch))
+        self._reconciled_at: Dict[str, float] = {}
+
+    def load_cursors(self, cursors: Dict[str, FillCursor]):
+        """Isi cursor awal (biasanya dari DB saat startup)."""
+        loaded = {w.lower(): tuple(c) for w, c in cursors.items()}
+        self._cursors.update(loaded)
+        self._committed_cursors.update(loaded)
+
+    def pop_dirty_cursors(self) -> Dict[str, FillCursor]:
+        """Ambil cursor yang berubah sejak pemanggilan terakhir (untuk di-persist)."""
+        dirty, self._dirty_cursors = self._dirty_cursors, {}
+        return dirty
+
+    def mark_cursors_persisted(self, cursors: Dict[str, FillCursor]):
+        """Dipanggil setelah cursor hasil pop_dirty_cursors() ter-commit."""
+        self._committed_cursors.update(cursors)
+
+    def rewind_cursors(self) -> List[str]:
+        """
+        Job persist gagal: kembalikan semua cursor ke posisi terakhir yang
+        ter-commit, supaya fill cycle itu diambil ulang (bukan hilang).
+        Return wallet yang di-rewind.
+        """
+        rewound = [w for w, c in self._cursors.items() if self._committed_cursors.get(w) != c]
+        for w in rewound:
+            committed = self._committed_cursors.get(w)
+            if committed is None:
+                del self._cursors[w]
+            else:
+                self._cursors[w] = committed
+            self._dirty_cursors.pop(w, None)
+        return rewound
+
+    def advance_cursor(
+        self,
+        wallet: str,
+        fills: List[PerpFill],
+        last_key: Optional[FillCursor],
+        since_ts: int,
+    ) -> List[PerpFill]:
+        """
+        Gate fill lewat cursor wallet: hanya fill dengan (time, tid) > cursor yang lolos,
+        lalu cursor maju ke last_key (key terbesar dari semua fill mentah).
+        Dipakai juga oleh stream connector.
+        """
+        cursor = self._cursors.get(wallet)
+        if cursor is None:
+            cursor = self._committed_cursors.setdefault(wallet, (since_ts * 1000, -1))
+        new = [f for f in sorted(fills, key=_fill_key) if _fill_key(f) > cursor]
+        if last_key is not None and last_key > cursor:
+            self._cursors[wallet] = last_key
+            self._dirty_cursors[wallet] = last_key
+        return new
 
     def set_tracked_wallets(self, wallets: List[str]):
         """
@@ -27,131 +167,302 @@ class HyperliquidConnector(BasePerpConnector):
         wallets: list of address string (0x...)
         """
         uniq = {w.lower() for w in wallets if w}
-        self._tracked_wallets = list(uniq)
+        # sorted → urutan fetch & merge hasil selalu deterministik
+        self._tracked_wallets = sorted(uniq)
         logger.info(f"[Hyperliquid] Tracked wallets updated, count={len(self._tracked_wallets)}")
 
-    def _fetch_fills_for_wallet(self, wallet: str, since_ts: int) -> List[Dict[str, Any]]:
+    def set_wallet_tiers(self, tiers: Dict[str, str]):
         """
-        Call userFillsByTime untuk 1 wallet:
-        - startTime / endTime dalam ms
-        - since_ts masuk dalam detik → dikali 1000
+        Seperti set_tracked_wallets, plus tier per wallet untuk scheduler.
+        tiers: address → tier (S/A/B/ignore)
         """
-        start_ms = since_ts * 1000
-        end_ms = int(time.time() * 1000)
+        self.set_tracked_wallets(list(tiers.keys()))
+        if self.scheduler is not None:
+            self.scheduler.set_wallets(tiers)
 
+    def apply_wallet_diff(self, changed: Dict[str, str], removed: Iterable[str]):
+        """
+        Update incremental dari WalletRegistry.pop_diff():
+        changed = wallet baru / tier berubah (address lowercase → tier), removed = berhenti di-scan.
+        """
+        removed = set(removed)
+        if not changed and not removed:
+            return
+        cur = set(self._tracked_wallets)
+        new = (cur | set(changed)) - removed
+        if new != cur:
+            self._tracked_wallets = sorted(new)
+            logger.info(
+                f"[Hyperliquid] Tracked wallets +{len(new - cur)} -{len(cur - new)}, count={len(new)}"
+            )
+        if self.scheduler is not None:
+            self.scheduler.apply_diff(changed, removed)
+
+    def _fetch_fills_page(self, wallet: str, start_ms: int) -> List[Dict[str, Any]]:
+        """
+        Call userFillsByTime untuk 1 wallet, 1 halaman (maks FILLS_PAGE_LIMIT fill).
+        Error dilempar ke caller supaya cursor tidak maju.
+        """
         body = {
             "type": "userFillsByTime",
             "user": wallet,
             "startTime": start_ms,
-            "endTime": end_ms,
-            "aggregateByTime": True,
+            "endTime": int(time.time() * 1000),
+            "aggregateByTime": self.aggregate_by_time,
         }
+        fills = self.client.post_info(body, timeout=self.request_timeout)
+        if not isinstance(fills, list):
+            raise ValueError(f"Unexpected response format: {fills}")
+        return fills
 
-        try:
-            resp = requests.post(
-                self.base_url,
-                json=body,
-                headers={"Content-Type": "application/json"},
-                timeout=15,
+    def iter_fill_pages(
+        self, wallet: str, cursor: FillCursor
+    ) -> Iterator[Tuple[List[PerpFill], FillCursor]]:
+        """
+        Generator halaman fill yang lebih baru dari cursor (time_ms, tid).
+        Yield (fill baru, cursor setelah halaman ini).
+        - startTime halaman berikut = time fill terakhir di halaman ini
+          (inklusif, duplikat di ms yang sama dibuang lewat tie-breaker tid)
+        - berhenti kalau halaman < FILLS_PAGE_LIMIT (sudah caught-up)
+          atau sudah max_pages_per_poll halaman
+        """
+        start_ms = cursor[0]
+        for _ in range(self.max_pages_per_poll):
+            raw = self._fetch_fills_page(wallet, start_ms)
+            fills, last_key = parse_fills(raw)
+            if last_key is not None and last_key > cursor:
+                new = sorted((f for f in fills if _fill_key(f) > cursor), key=_fill_key)
+                cursor = last_key
+                yield new, cursor
+
+            if len(raw) < FILLS_PAGE_LIMIT or last_key is None:
+                return
+
+            next_start = last_key[0]
+            if next_start <= start_ms:
+                # 1 halaman penuh di ms yang sama → paksa maju supaya tidak loop
+                logger.warning(f"[Hyperliquid] Full page at {start_ms} ms for {wallet}, skipping ahead 1 ms")
+                next_start = start_ms + 1
+            start_ms = next_start
+
+    def _fetch_fills_for_wallet(
+        self, wallet: str, since_ts: int
+    ) -> Tuple[List[PerpFill], Optional[FillCursor]]:
+        """
+        Ambil semua fill baru 1 wallet mulai dari cursor-nya.
+        Return (fills, key terakhir yang sudah dibaca).
+        - Wallet tanpa cursor mulai dari since_ts (detik)
+        - Error di halaman mana pun dilempar: wallet dianggap gagal cycle ini,
+          cursor tidak maju dan semua halaman diambil ulang di poll berikutnya
+        """
+        cursor = self._cursors.get(wallet) or self._committed_cursors.get(wallet) or (since_ts * 1000, -1)
+        fills: List[PerpFill] = []
+        last_key: Optional[FillCursor] = None
+        for page, last_key in self.iter_fill_pages(wallet, cursor):
+            fills.extend(page)
+        return fills, last_key
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="hl-fills",
             )
-            resp.raise_for_status()
-        except Exception as e:
-            logger.error(f"[Hyperliquid] Error calling userFillsByTime for {wallet}: {e}")
-            return []
+        return self._executor
 
-        try:
-            fills = resp.json()
-        except Exception as e:
-            logger.error(f"[Hyperliquid] Failed to decode JSON for {wallet}: {e}")
-            return []
+    def _release_inflight(self, wallet: str, fut: Future) -> None:
+        if self._inflight.get(wallet) is fut:
+            del self._inflight[wallet]
 
-        if not isinstance(fills, list):
-            logger.warning(f"[Hyperliquid] Unexpected response format for {wallet}: {fills}")
-            return []
+    def fetch_fills_batch(
+        self, wallets: List[str], since_ts: int
+    ) -> Dict[str, Tuple[List[PerpFill], Optional[FillCursor]]]:
+        """
+        Fetch fills untuk banyak wallet sekaligus.
+        - max_concurrency == 1 → serial (perilaku lama)
+        - selain itu → thread pool, tunggu maksimal batch_timeout detik
+        Wallet yang error / belum selesai tidak masuk hasil (cursor-nya tidak maju).
+        Wallet yang fetch batch sebelumnya masih jalan di-skip (tidak ditumpuk di pool);
+        hasil fetch yang telat itu dibuang, cycle berikutnya mulai lagi dari cursor.
+        """
+        results: Dict[str, Tuple[List[PerpFill], Optional[FillCursor]]] = {}
+        if self.max_concurrency <= 1:
+            for wal in wallets:
+                try:
+                    results[wal] = self._fetch_fills_for_wallet(wal, since_ts)
+                except Exception as e:
+                    logger.error(f"[Hyperliquid] Error calling userFillsByTime for {wal}: {e}")
+            return results
 
-        return fills
+        executor = self._get_executor()
+        futures = {}
+        busy = 0
+        for w in wallets:
+            if w in self._inflight:
+                busy += 1
+                continue
+            fut = executor.submit(self._fetch_fills_for_wallet, w, since_ts)
+            self._inflight[w] = fut
+            fut.add_done_callback(lambda f, w=w: self._release_inflight(w, f))
+            futures[fut] = w
+        if busy:
+            logger.warning(f"[Hyperliquid] {busy} wallets still fetching from a previous batch, skipped this cycle")
+        if not futures:
+            return results
+        done, not_done = wait(futures, timeout=self.batch_timeout)
+
+        for fut in done:
+            wal = futures[fut]
+            try:
+                results[wal] = fut.result()
+            except Exception as e:
+                logger.error(f"[Hyperliquid] Error calling userFillsByTime for {wal}: {e}")
+
+        if not_done:
+            for fut in not_done:
+                fut.cancel()  # hanya yang belum mulai; yang jalan tetap tercatat in-flight
+            logger.warning(
+                f"[Hyperliquid] {len(not_done)} wallets not finished after {self.batch_timeout}s, skipped this cycle"
+            )
+
+        return results
+
+    def fills_to_events(self, wal: str, fills: List[PerpFill], now: int) -> List[PerpEvent]:
+        """Fill 1 wallet (sudah lewat cursor) → PerpEvent. Dipakai juga oleh stream connector."""
+        events: List[PerpEvent] = []
+        wal = wal.lower()
+        platform = self.platform_name
+        book = self.position_book
+        # fill spot / dir yang tidak dipakai sudah dibuang di parse_fills
+        for f in fills:
+            if book is not None:
+                if f.px * f.sz > 0:
+                    # tid sama untuk 2 sisi trade → wallet ikut jadi bagian identitas
+                    events.extend(book.apply_fill(wal, f, f"{platform}:{wal}:{f.tid}"))
+                continue
+            # tanpa PositionBook: close / flip tidak jadi event (perilaku lama)
+            parsed = DIR_TABLE.get(f.dir)
+            size_usd = f.px * f.sz
+            if parsed is None or size_usd <= 0:
+                continue
 
-    def fetch_new_events(self, since_ts: int) -> List[Dict[str, Any]]:
+            events.append(PerpEvent(
+                wal,
+                platform,
+                f.coin + "-PERP",
+                parsed[0],
+                parsed[1],
+                f.px,
+                size_usd,
+                1.0,
+                # convert ms → detik
+                f.time // 1000 if f.time else now,
+                # tid sama untuk 2 sisi trade → wallet ikut jadi bagian identitas
+                f"{platform}:{wal}:{f.tid}",
+                f.closed_pnl,
+            ))
+        return events
+
+    def _fetch_clearinghouse_state(self, wallet: str) -> Dict[str, Any]:
+        state = self.client.post_info(
+            {"type": "clearinghouseState", "user": wallet}, timeout=self.request_timeout
+        )
+        if not isinstance(state, dict):
+            raise ValueError(f"Unexpected response format: {state}")
+        return state
+
+    def reconcile_positions(self, now: Optional[float] = None) -> int:
+        """
+        Rekonsiliasi PositionBook dengan snapshot clearinghouseState (weight 2).
+        Ambil maks reconcile_batch wallet yang paling lama belum direkonsiliasi;
+        request jalan paralel lewat thread pool yang sama dengan fetch fill.
+        Return jumlah posisi yang dikoreksi.
         """
-        Convert fills -> perp events:
+        book = self.position_book
+        if book is None or not self._tracked_wallets:
+            return 0
+        now = time.time() if now is None else now
+        due = [w for w in self._tracked_wallets if now - self._reconciled_at.get(w, 0.0) >= self.reconcile_interval]
+        if not due:
+            return 0
+        due.sort(key=lambda w: self._reconciled_at.get(w, 0.0))
+        due = due[: self.reconcile_batch]
+
+        executor = self._get_executor()
+        futures = {executor.submit(self._fetch_clearinghouse_state, w): w for w in due}
+        done, not_done = wait(futures, timeout=self.batch_timeout)
+        for fut in not_done:
+            fut.cancel()
+
+        changed = 0
+        # urut wallet → hasil deterministik
+        for fut in sorted(done, key=lambda f: futures[f]):
+            wal = futures[fut]
+            try:
+                state = fut.result()
+            except Exception as e:
+                logger.error(f"[Hyperliquid] Error calling clearinghouseState for {wal}: {e}")
+                continue
+            changed += book.reconcile(wal, state, int(now))
+            self._reconciled_at[wal] = now
+
+        if changed:
+            logger.info(f"[Hyperliquid] Reconciled {len(done)} wallets, {changed} positions corrected")
+        return changed
+
+    def fetch_new_events(self, since_ts: int) -> List[PerpEvent]:
+        """
+        Convert fills -> perp events (PerpEvent, akses gaya dict tetap bisa):
         - Filter hanya perp coin (coin tidak dimulai '@' dan tidak mengandung '/')
-        - Gunakan field `dir`:
+        - Gunakan field `dir` (lookup DIR_TABLE):
           * "Open Long"      → LONG,  OPEN
           * "Open Short"     → SHORT, OPEN
           * "Increase Long"  → LONG,  INCREASE
           * "Increase Short" → SHORT, INCREASE
+          Tanpa PositionBook fill close / flip dilewati. Kalau ada PositionBook:
+          event diturunkan dari startPosition (DECREASE, CLOSE, flip = CLOSE + OPEN)
+          dan leverage dari snapshot terakhir
         - size_usd = px * sz
         - time dari API dalam ms → kita convert ke detik
+        - since_ts hanya dipakai untuk wallet yang belum punya cursor
         """
-        all_events: List[Dict[str, Any]] = []
+        all_events: List[PerpEvent] = []
         now = int(time.time())
 
         if not self._tracked_wallets:
             logger.info("[Hyperliquid] No tracked wallets set, skipping fetch")
             return []
 
+        wallets = self._tracked_wallets
+        poll_ts = time.time()
+        if self.scheduler is not None:
+            wallets = sorted(self.scheduler.due_wallets(poll_ts))
+            if not wallets:
+                self.reconcile_positions(poll_ts)
+                return []
+
         logger.info(
-            f"[Hyperliquid] Fetching fills since {since_ts} for {len(self._tracked_wallets)} wallets..."
+            f"[Hyperliquid] Fetching fills since {since_ts} for {len(wallets)}/{len(self._tracked_wallets)} wallets..."
         )
 
-        for wal in self._tracked_wallets:
-            fills = self._fetch_fills_for_wallet(wal, since_ts)
-            for f in fills:
-                try:
-                    coin = f.get("coin")
-                    # Spot / index fill biasanya '@...' atau 'TOKEN/USDC' → skip
-                    if not coin or coin.startswith("@") or "/" in coin:
-                        continue
-
-                    dir_str = f.get("dir", "") or ""
-                    dir_str = str(dir_str)
-
-                    if "Open Long" in dir_str:
-                        direction = "LONG"
-                        event_type = "OPEN"
-                    elif "Open Short" in dir_str:
-                        direction = "SHORT"
-                        event_type = "OPEN"
-                    elif "Increase Long" in dir_str:
-                        direction = "LONG"
-                        event_type = "INCREASE"
-                    elif "Increase Short" in dir_str:
-                        direction = "SHORT"
-                        event_type = "INCREASE"
-                    else:
-                        # Close / reduce / lainnya tidak kita pakai sebagai entry sinyal
-                        continue
-
-                    px = float(f.get("px", "0") or 0.0)
-                    sz = float(f.get("sz", "0") or 0.0)
-                    size_usd = px * sz
-
-                    raw_time = f.get("time", now)
-                    try:
-                        ts_ms = int(raw_time)
-                        # convert ms → detik
-                        ts = ts_ms // 1000
-                    except Exception:
-                        ts = now
-
-                    if size_usd <= 0:
-                        continue
-
-                    all_events.append(
-                        {
-                            "wallet_address": wal.lower(),
-                            "platform": self.platform_name,
-                            "pair": f"{coin}-PERP",
-                            "direction": direction,
-                            "event_type": event_type,
-                            "entry_price": px,
-                            "size_usd": size_usd,
-                            "leverage": 1.0,
-                            "timestamp": ts,
-                        }
-                    )
-                except Exception as e:
-                    logger.error(f"[Hyperliquid] Error parsing fill for {wal}: {e}")
+        fills_by_wallet = self.fetch_fills_batch(wallets, since_ts)
+
+        # merge sesuai urutan wallet (sorted), bukan urutan selesai request
+        for wal in wallets:
+            fills, last_key = fills_by_wallet.get(wal, ([], None))
+            fills = self.advance_cursor(wal, fills, last_key, since_ts)
+            if self.scheduler is not None:
+                self.scheduler.record_poll(
+                    wal, poll_ts, [_fill_key(f)[0] for f in fills], ok=wal in fills_by_wallet
+                )
+            if fills:
+                all_events.extend(self.fills_to_events(wal, fills, now))
+
+        # rekonsiliasi setelah fill diterapkan → snapshot menang atas estimasi dari fill
+        self.reconcile_positions(poll_ts)
 
         logger.info(f"[Hyperliquid] New perp events (since {since_ts}): {len(all_events)}")
+        logger.info(f"[Hyperliquid] Client stats: {self.client.stats()}")
+        if self.scheduler is not None:
+            logger.info(f"[Hyperliquid] Poll schedule: {self.scheduler.summary(poll_ts)}")
         return all_events
@@ -0,0 +1,251 @@
+# smartmoney/connectors/perp_hyperliquid_ws.py
+from typing import List, Dict, Iterable, Optional, Set
+import asyncio
+import json
+import queue
+import random
+import threading
+import time
+
+import websockets
+from loguru import logger
+
+from .base_perp import BasePerpConnector
+from .perp_hyperliquid import HyperliquidConnector, parse_fills
+from .records import PerpEvent, PerpFill, json_loads
+
+DEFAULT_WS_URL = "wss://api.hyperliquid.xyz/ws"
+
+
+class HyperliquidStreamConnector(BasePerpConnector):
+    """
+    Connector perp Hyperliquid mode streaming (WebSocket):
+    - Subscribe "userFills" per wallet, banyak wallet di-multiplex per koneksi
+      (maks `max_users_per_conn` wallet per koneksi)
+    - Koneksi jalan di 1 thread asyncio background, auto reconnect (backoff + jitter)
+    - Setiap (re)connect → wallet di koneksi itu ditandai untuk backfill lewat REST
+      (HyperliquidConnector), jadi gap selama putus tetap terisi
+    - Fill dari WS dan REST lewat cursor yang sama (time ms + tid) → tidak dobel
+    - Output fetch_new_events() sama persis dengan HyperliquidConnector
+      (termasuk PositionBook & rekonsiliasi kalau dipasang di connector REST)
+    """
+
+    def __init__(
+        self,
+        ws_url: str = DEFAULT_WS_URL,
+        rest: Optional[HyperliquidConnector] = None,
+        max_users_per_conn: int = 10,
+        ping_interval: float = 30.0,
+        reconnect_max_s: float = 30.0,
+    ):
+        self.platform_name = "hyperliquid"
+        self.ws_url = ws_url
+        # fill WS tidak di-aggregate, jadi backfill REST juga tanpa aggregate
+        self.rest = rest or HyperliquidConnector(aggregate_by_time=False)
+        self.max_users_per_conn = max(1, int(max_users_per_conn))
+        self.ping_interval = float(ping_interval)
+        self.reconnect_max_s = float(reconnect_max_s)
+
+        self._tracked_wallets: List[str] = []
+        self._fills_queue: "queue.Queue" = queue.Queue()
+        self._backfill_lock = threading.Lock()
+        self._needs_backfill: Set[str] = set()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._shards: List[List[str]] = []
+        self._shard_tasks: List[asyncio.Task] = []
+
+    # === cursor: delegasi ke REST connector (1 sumber kebenaran) ===
+    def load_cursors(self, cursors):
+        self.rest.load_cursors(cursors)
+
+    def pop_dirty_cursors(self):
+        return self.rest.pop_dirty_cursors()
+
+    def mark_cursors_persisted(self, cursors):
+        self.rest.mark_cursors_persisted(cursors)
+
+    def rewind_cursors(self) -> List[str]:
+        # fill WS yang sudah di-drain tidak datang lagi → wallet di-backfill ulang lewat REST
+        rewound = self.rest.rewind_cursors()
+        if rewound:
+            with self._backfill_lock:
+                self._needs_backfill.update(rewound)
+        return rewound
+
+    def set_tracked_wallets(self, wallets: List[str]):
+        uniq = sorted({w.lower() for w in wallets if w})
+        if uniq == self._tracked_wallets:
+            return
+        self._tracked_wallets = uniq
+        self.rest.set_tracked_wallets(uniq)
+        self._ensure_started()
+        self._loop.call_soon_threadsafe(self._resync_shards, list(uniq))
+        logger.info(f"[HyperliquidWS] Tracked wallets updated, count={len(uniq)}")
+
+    def apply_wallet_diff(self, changed: Dict[str, str], removed: Iterable[str]):
+        """Diff dari WalletRegistry; shard WS hanya di-resync kalau keanggotaan berubah."""
+        removed = set(removed)
+        if not changed and not removed:
+            return
+        self.rest.apply_wallet_diff(changed, removed)
+        cur = set(self._tracked_wallets)
+        new = (cur | set(changed)) - removed
+        if new == cur:
+            return
+        self._tracked_wallets = sorted(new)
+        self._ensure_started()
+        self._loop.call_soon_threadsafe(self._resync_shards, list(self._tracked_wallets))
+        logger.info(
+            f"[HyperliquidWS] Tracked wallets +{len(new - cur)} -{len(cur - new)}, count={len(new)}"
+        )
+
+    # === background asyncio thread ===
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="hl-ws",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _resync_shards(self, wallets: List[str]):
+        """Jalan di loop thread: restart hanya shard yang isinya berubah."""
+        n = self.max_users_per_conn
+        new_shards = [wallets[i:i + n] for i in range(0, len(wallets), n)]
+
+        for idx, shard in enumerate(new_shards):
+            if idx < len(self._shards) and self._shards[idx] == shard:
+                continue
+            if idx < len(self._shard_tasks):
+                self._shard_tasks[idx].cancel()
+                self._shard_tasks[idx] = self._loop.create_task(self._run_shard(idx, shard))
+            else:
+                self._shard_tasks.append(self._loop.create_task(self._run_shard(idx, shard)))
+
+        for task in self._shard_tasks[len(new_shards):]:
+            task.cancel()
+        self._shard_tasks = self._shard_tasks[:len(new_shards)]
+        self._shards = new_shards
+
+    async def _run_shard(self, idx: int, wallets: List[str]):
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, ping_interval=None) as ws:
+                    for w in wallets:
+                        await ws.send(json.dumps({
+                            "method": "subscribe",
+                            "subscription": {"type": "userFills", "user": w},
+                        }))
+                    with self._backfill_lock:
+                        self._needs_backfill.update(wallets)
+                    logger.info(f"[HyperliquidWS] Shard {idx} connected ({len(wallets)} wallets)")
+                    backoff = 1.0
+
+                    pinger = asyncio.ensure_future(self._ping(ws))
+                    try:
+                        async for raw in ws:
+                            self._handle_message(raw)
+                    finally:
+                        pinger.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[HyperliquidWS] Shard {idx} disconnected: {e}")
+
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(self.reconnect_max_s, backoff * 2)
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(json.dumps({"method": "ping"}))
+
+    def _handle_message(self, raw):
+        try:
+            msg = json_loads(raw)
+        except ValueError:
+            logger.warning(f"[HyperliquidWS] Non-JSON message: {raw!r:.200}")
+            return
+        if msg.get("channel") != "userFills":
+            return
+        data = msg.get("data") or {}
+        user = (data.get("user") or "").lower()
+        fills = data.get("fills") or []
+        if user and fills:
+            parsed, last_key = parse_fills(fills)
+            self._fills_queue.put((user, parsed, last_key))
+
+    # === ingestion ===
+    def fetch_new_events(self, since_ts: int) -> List[PerpEvent]:
+        """
+        1. Backfill REST untuk wallet yang baru (re)subscribe
+        2. Drain fill dari WS
+        Backfill diproses duluan: cursor tidak boleh maju ke fill WS
+        sebelum gap di belakangnya terisi. Wallet yang backfill-nya gagal, atau
+        yang (re)connect lagi selama drain (ditandai ulang di _needs_backfill),
+        fill WS-nya ditahan di queue sampai backfill-nya selesai.
+        """
+        if not self._tracked_wallets:
+            logger.info("[HyperliquidWS] No tracked wallets set, skipping fetch")
+            return []
+
+        now = int(time.time())
+        fills_by_wallet: Dict[str, List[PerpFill]] = {}
+
+        with self._backfill_lock:
+            backfill = sorted(self._needs_backfill)
+            self._needs_backfill.clear()
+        if backfill:
+            logger.info(f"[HyperliquidWS] Backfilling {len(backfill)} wallets via REST")
+            results = self.rest.fetch_fills_batch(backfill, since_ts)
+            for wal, (fills, last_key) in results.items():
+                fills_by_wallet.setdefault(wal, []).extend(
+                    self.rest.advance_cursor(wal, fills, last_key, since_ts)
+                )
+            # backfill gagal / timeout → coba lagi cycle berikutnya
+            pending = set(backfill) - set(results)
+            if pending:
+                with self._backfill_lock:
+                    self._needs_backfill.update(pending)
+
+        tracked = set(self._tracked_wallets)
+        held = []
+        while True:
+            try:
+                item = self._fills_queue.get_nowait()
+            except queue.Empty:
+                break
+            wal, fills, last_key = item
+            if wal not in tracked:
+                continue
+            # dicek ulang per item (bukan snapshot di atas): shard bisa reconnect
+            # selama drain dan menandai wallet-nya lagi
+            with self._backfill_lock:
+                gap = wal in self._needs_backfill
+            if gap:
+                # tahan dulu: cursor jangan lompati gap yang belum ke-backfill
+                held.append(item)
+                continue
+            fills_by_wallet.setdefault(wal, []).extend(
+                self.rest.advance_cursor(wal, fills, last_key, since_ts)
+            )
+        for item in held:
+            self._fills_queue.put(item)
+
+        all_events: List[PerpEvent] = []
+        for wal in self._tracked_wallets:
+            fills = fills_by_wallet.get(wal)
+            if fills:
+                all_events.extend(self.rest.fills_to_events(wal, fills, now))
+
+        # snapshot posisi (leverage / liq price) tetap lewat REST
+        self.rest.reconcile_positions()
+
+        logger.info(f"[HyperliquidWS] New perp events: {len(all_events)}")
+        return all_events
@@ -0,0 +1,179 @@
+# smartmoney/connectors/poll_scheduler.py
+from typing import Dict, Iterable, List, Optional
+import math
+
+# interval dasar poll per tier (detik)
+DEFAULT_TIER_INTERVALS = {"S": 5.0, "A": 10.0, "B": 60.0, "ignore": 300.0}
+TIER_PRIORITY = {"S": 0, "A": 1, "B": 2, "ignore": 3}
+
+
+class _WalletPollState:
+    __slots__ = (
+        "tier", "next_due", "last_polled", "first_success", "last_success",
+        "last_fill_ts", "activity", "activity_ts",
+    )
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.next_due = 0.0          # 0 → langsung due di cycle pertama
+        self.last_polled = 0.0
+        self.first_success = 0.0     # mulai diamati (dasar penentuan dormant)
+        self.last_success = 0.0
+        self.last_fill_ts = 0.0
+        self.activity = 0.0          # jumlah fill dengan decay eksponensial
+        self.activity_ts = 0.0
+
+
+class WalletPollScheduler:
+    """
+    Scheduler poll per wallet untuk jalur ingestion perp:
+    - interval dasar dari tier (S/A cepat, B lambat, ignore paling lambat)
+    - wallet "hot" (aktivitas fill baru-baru ini) → interval dipercepat (base / 2)
+    - wallet dormant (tidak ada fill > dormant_after_s) → minimal dormant_interval_s
+    - total weight per menit dijaga di bawah weight_budget_per_min:
+      budget dibagi per tier sesuai prioritas (S dulu, ignore terakhir); tier yang
+      tidak kebagian cukup budget interval-nya di-stretch, dan jumlah poll per cycle
+      dibatasi oleh budget yang terkumpul
+    - staleness per wallet (detik sejak poll sukses terakhir) bisa dibaca lewat staleness()
+    """
+
+    def __init__(
+        self,
+        weight_budget_per_min: float = 900.0,
+        weight_per_poll: float = 20.0,
+        tier_intervals: Optional[Dict[str, float]] = None,
+        min_interval_s: float = 5.0,
+        hot_threshold: float = 1.0,
+        activity_halflife_s: float = 900.0,
+        dormant_after_s: float = 86400.0,
+        dormant_interval_s: float = 180.0,
+        retry_interval_s: float = 10.0,
+    ):
+        self.weight_budget_per_min = float(weight_budget_per_min)
+        self.weight_per_poll = float(weight_per_poll)
+        self.tier_intervals = dict(DEFAULT_TIER_INTERVALS)
+        self.tier_intervals.update(tier_intervals or {})
+        self.min_interval_s = float(min_interval_s)
+        self.hot_threshold = float(hot_threshold)
+        self.activity_halflife_s = float(activity_halflife_s)
+        self.dormant_after_s = float(dormant_after_s)
+        self.dormant_interval_s = float(dormant_interval_s)
+        self.retry_interval_s = float(retry_interval_s)
+
+        self._state: Dict[str, _WalletPollState] = {}
+        self._stretch: Dict[str, float] = {}
+        self._last_select: Optional[float] = None
+
+    def set_wallets(self, tiers: Dict[str, str]):
+        """tiers: address → tier. Wallet yang tidak ada di mapping dihapus dari jadwal."""
+        tiers = {w.lower(): (t or "ignore") for w, t in tiers.items() if w}
+        self.apply_diff(tiers, [w for w in self._state if w not in tiers])
+
+    def apply_diff(self, changed: Dict[str, str], removed: Iterable[str]):
+        """changed: wallet baru / tier berubah (address lowercase → tier); removed: dihapus dari jadwal."""
+        for w in removed:
+            self._state.pop(w, None)
+        for w, tier in changed.items():
+            tier = tier or "ignore"
+            st = self._state.get(w)
+            if st is None:
+                self._state[w] = _WalletPollState(tier)
+            elif st.tier != tier:
+                st.tier = tier
+                # tier naik → jangan tunggu jadwal lama yang panjang
+                st.next_due = min(st.next_due, st.last_polled + self._interval(st, st.last_polled))
+
+    def _activity_at(self, st: _WalletPollState, now: float) -> float:
+        if st.activity <= 0:
+            return 0.0
+        return st.activity * math.exp(-(now - st.activity_ts) * math.log(2) / self.activity_halflife_s)
+
+    def _base_interval(self, st: _WalletPollState, now: float) -> float:
+        base = self.tier_intervals.get(st.tier, self.tier_intervals["ignore"])
+        if self._activity_at(st, now) >= self.hot_threshold:
+            return max(self.min_interval_s, base / 2.0)
+        if st.first_success and now - max(st.last_fill_ts, st.first_success) > self.dormant_after_s:
+            return max(base, self.dormant_interval_s)
+        return max(self.min_interval_s, base)
+
+    def _interval(self, st: _WalletPollState, now: float) -> float:
+        return self._base_interval(st, now) * self._stretch.get(st.tier, 1.0)
+
+    def _update_stretch(self, now: float, min_share: float = 0.05):
+        """
+        Bagi budget per tier sesuai prioritas. Tier yang kebagian kurang dari
+        demand-nya di-stretch; tiap tier tetap dapat minimal min_share budget.
+        """
+        demand: Dict[str, float] = {}
+        for st in self._state.values():
+            demand[st.tier] = demand.get(st.tier, 0.0) + 60.0 / self._base_interval(st, now) * self.weight_per_poll
+
+        remaining = self.weight_budget_per_min
+        stretch: Dict[str, float] = {}
+        for tier in sorted(demand, key=lambda t: TIER_PRIORITY.get(t, 9)):
+            share = max(remaining, self.weight_budget_per_min * min_share)
+            stretch[tier] = max(1.0, demand[tier] / share)
+            remaining = max(0.0, remaining - demand[tier] / stretch[tier])
+        self._stretch = stretch
+
+    def due_wallets(self, now: float) -> List[str]:
+        """
+        Wallet yang harus di-poll cycle ini, urut prioritas
+        (tier lalu paling lama overdue), dibatasi budget weight.
+        """
+        self._update_stretch(now)
+
+        elapsed = 60.0 if self._last_select is None else min(60.0, now - self._last_select)
+        self._last_select = now
+        max_polls = max(1, int(self.weight_budget_per_min / self.weight_per_poll * elapsed / 60.0))
+
+        due = [(w, st) for w, st in self._state.items() if st.next_due <= now]
+        due.sort(key=lambda x: (TIER_PRIORITY.get(x[1].tier, 9), x[1].next_due, x[0]))
+        if len(due) > max_polls:
+            due = due[:max_polls]
+        return [w for w, _ in due]
+
+    def record_poll(self, wallet: str, now: float, fills_ms: List[int], ok: bool):
+        """
+        Catat hasil poll:
+        - ok=False → coba lagi setelah retry_interval_s
+        - fills_ms: timestamp (ms) fill baru yang didapat
+        """
+        st = self._state.get(wallet)
+        if st is None:
+            return
+        st.last_polled = now
+        if not ok:
+            st.next_due = now + self.retry_interval_s
+            return
+        st.last_success = now
+        if not st.first_success:
+            st.first_success = now
+        if fills_ms:
+            st.activity = self._activity_at(st, now) + len(fills_ms)
+            st.activity_ts = now
+            st.last_fill_ts = max(st.last_fill_ts, max(fills_ms) / 1000.0)
+        st.next_due = now + self._interval(st, now)
+
+    def staleness(self, now: float) -> Dict[str, float]:
+        """address → detik sejak poll sukses terakhir (inf kalau belum pernah)."""
+        return {
+            w: (now - st.last_success) if st.last_success else math.inf
+            for w, st in self._state.items()
+        }
+
+    def summary(self, now: float) -> Dict[str, Dict[str, float]]:
+        """Ringkasan per tier: jumlah wallet, interval efektif rata-rata, staleness maks."""
+        out: Dict[str, Dict[str, float]] = {}
+        for st in self._state.values():
+            row = out.setdefault(st.tier, {"wallets": 0, "avg_interval_s": 0.0, "max_staleness_s": 0.0})
+            row["wallets"] += 1
+            row["avg_interval_s"] += self._interval(st, now)
+            stale = (now - st.last_success) if st.last_success else math.inf
+            row["max_staleness_s"] = max(row["max_staleness_s"], stale)
+        for row in out.values():
+            row["avg_interval_s"] = round(row["avg_interval_s"] / row["wallets"], 1)
+        for tier, factor in self._stretch.items():
+            if tier in out:
+                out[tier]["stretch"] = round(factor, 2)
+        return out
@@ -0,0 +1,159 @@
+# smartmoney/connectors/records.py
+from typing import Any, Dict, Optional, Tuple
+from operator import itemgetter
+import json
+
+try:
+    import orjson
+except ImportError:  # opsional: fallback ke json stdlib
+    orjson = None
+
+
+def json_loads(raw):
+    """Decode JSON (bytes/str). Pakai orjson kalau terpasang."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# field `dir` Hyperliquid → (direction, event_type), lookup exact (tanpa scan substring)
+DIR_TABLE: Dict[str, Tuple[str, str]] = {
+    "Open Long": ("LONG", "OPEN"),
+    "Open Short": ("SHORT", "OPEN"),
+    "Increase Long": ("LONG", "INCREASE"),
+    "Increase Short": ("SHORT", "INCREASE"),
+}
+
+# dir fill perp yang diproses: DIR_TABLE (tanpa PositionBook hanya ini yang jadi event)
+# + close & flip, yang hanya dipakai PositionBook (event diturunkan dari startPosition)
+PERP_DIRS = frozenset(DIR_TABLE) | {"Close Long", "Close Short", "Long > Short", "Short > Long"}
+
+
+# 1 panggilan C untuk semua field fill (jalur cepat; fallback .get() kalau ada key hilang)
+_FILL_FIELDS = itemgetter(
+    "coin", "px", "sz", "time", "tid", "dir", "side",
+    "startPosition", "closedPnl", "hash", "oid",
+)
+
+
+class PerpFill:
+    """
+    1 fill Hyperliquid dalam bentuk ringkas (__slots__, angka sudah float/int).
+    time dalam ms.
+    """
+
+    __slots__ = (
+        "coin", "px", "sz", "time", "tid", "dir", "side",
+        "start_position", "closed_pnl", "hash", "oid",
+    )
+
+    def __init__(
+        self,
+        coin: str,
+        px: float,
+        sz: float,
+        time: int,
+        tid: int,
+        dir: str,
+        side: str = "",
+        start_position: float = 0.0,
+        closed_pnl: float = 0.0,
+        hash: str = "",
+        oid: int = 0,
+    ):
+        self.coin = coin
+        self.px = px
+        self.sz = sz
+        self.time = time
+        self.tid = tid
+        self.dir = dir
+        self.side = side
+        self.start_position = start_position
+        self.closed_pnl = closed_pnl
+        self.hash = hash
+        self.oid = oid
+
+    @classmethod
+    def from_raw(cls, d: Dict[str, Any]) -> "PerpFill":
+        """Dari dict JSON API (px/sz/startPosition/closedPnl berupa string)."""
+        try:
+            coin, px, sz, t, tid, dir_, side, start_pos, closed_pnl, h, oid = _FILL_FIELDS(d)
+            return cls(
+                coin, float(px), float(sz), int(t), int(tid), dir_, side,
+                float(start_pos), float(closed_pnl), h, int(oid),
+            )
+        except (KeyError, TypeError):
+            pass
+        return cls(
+            d.get("coin") or "",
+            float(d.get("px") or 0.0),
+            float(d.get("sz") or 0.0),
+            int(d.get("time") or 0),
+            int(d.get("tid") or 0),
+            d.get("dir") or "",
+            d.get("side") or "",
+            float(d.get("startPosition") or 0.0),
+            float(d.get("closedPnl") or 0.0),
+            d.get("hash") or "",
+            int(d.get("oid") or 0),
+        )
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.time, self.tid
+
+
+class PerpEvent:
+    """
+    Normalized perp event (pengganti dict). Field sama dengan dokumentasi
+    BasePerpConnector; akses gaya dict (e["pair"], e.get(...)) tetap didukung
+    supaya stage lain tidak perlu tahu bedanya.
+    """
+
+    __slots__ = (
+        "wallet_address", "platform", "pair", "direction", "event_type",
+        "entry_price", "size_usd", "leverage", "timestamp", "source_id", "closed_pnl",
+    )
+
+    def __init__(
+        self,
+        wallet_address: str,
+        platform: str,
+        pair: str,
+        direction: str,
+        event_type: str,
+        entry_price: float,
+        size_usd: float,
+        leverage: float,
+        timestamp: int,
+        source_id: Optional[str] = None,
+        closed_pnl: float = 0.0,
+    ):
+        self.wallet_address = wallet_address
+        self.platform = platform
+        self.pair = pair
+        self.direction = direction
+        self.event_type = event_type
+        self.entry_price = entry_price
+        self.size_usd = size_usd
+        self.leverage = leverage
+        self.timestamp = timestamp
+        # identitas fill sumber (dedup exactly-once), mis. "hyperliquid:0xwallet:tid"
+        self.source_id = source_id
+        # realized PnL fill (closedPnl Hyperliquid), 0 untuk OPEN / INCREASE
+        self.closed_pnl = closed_pnl
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key: str, default: Optional[Any] = None):
+        return getattr(self, key, default)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return f"PerpEvent({self.as_dict()})"
@@ -0,0 +1,216 @@
+# smartmoney/connectors/reserves.py
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from web3 import Web3
+
+from ..cache import LRUCache
+
+# Sync(uint112 reserve0, uint112 reserve1), di-emit pair V2 setiap reserve berubah
+UNISWAP_V2_SYNC_TOPIC = Web3.to_hex(Web3.keccak(text="Sync(uint112,uint112)"))
+
+# routing default per chain: WETH + pair WETH/stable acuan + factory V2 (CREATE2)
+DEFAULT_ROUTING = {
+    "1": {
+        "weth": "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2",
+        "factory": "0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f",
+        "init_code_hash": "0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f",
+    },
+}
+
+_MISSING = "missing"
+
+
+def pair_address_for(factory: str, init_code_hash: str, token_a: str, token_b: str) -> str:
+    """Alamat pair V2 via CREATE2 (tanpa RPC)."""
+    t0, t1 = sorted((token_a.lower(), token_b.lower()))
+    salt = Web3.keccak(bytes.fromhex(t0[2:]) + bytes.fromhex(t1[2:]))
+    raw = Web3.keccak(
+        b"\xff" + bytes.fromhex(factory[2:]) + salt + bytes.fromhex(init_code_hash[2:])
+    )
+    return Web3.to_checksum_address(raw[12:])
+
+
+class ReserveIndex:
+    """
+    Index reserve pool V2 in-memory, di-update incremental dari event Sync:
+    - reserve per pair (raw int) + posisi (block, logIndex) update terakhir;
+      Sync yang lebih lama dari posisi itu diabaikan
+    - harga USD token lewat routing: stable = 1, token/stable langsung,
+      selain itu token/WETH x WETH/stable (pair dicari via CREATE2, tanpa RPC)
+    - liquidity_usd pool = nilai kedua sisi reserve dalam USD
+    Lookup harga & likuiditas O(1) (dict) setelah reserve terisi.
+    Pair yang belum pernah terlihat di-bootstrap sekali (getReserves via multicall,
+    oleh connector), setelah itu hanya Sync.
+    """
+
+    def __init__(
+        self,
+        stables: Iterable[str],
+        weth: Optional[str] = None,
+        factory: Optional[str] = None,
+        init_code_hash: Optional[str] = None,
+        maxsize: int = 100_000,
+    ):
+        self.stables: Set[str] = {s.lower() for s in stables}
+        self._stable_addrs = sorted(Web3.to_checksum_address(s) for s in self.stables)
+        self.weth = Web3.to_checksum_address(weth) if weth else None
+        self.factory = factory
+        self.init_code_hash = init_code_hash
+        # pair → (reserve0, reserve1, (block, log_index)) atau _MISSING (pair tidak ada)
+        self._reserves = LRUCache(maxsize)
+        self._pair_tokens: Dict[str, Tuple[str, str]] = {}
+        self._decimals: Dict[str, int] = {}
+        self._route_cache: Dict[Tuple[str, str], str] = {}
+
+    # === registrasi metadata (dari TokenMetaStore connector) ===
+    def register_pair(self, pair: str, token0: str, token1: str) -> None:
+        self._pair_tokens[pair] = (token0, token1)
+
+    def pair_tokens(self, pair: str) -> Optional[Tuple[str, str]]:
+        """(token0, token1) pair yang sudah terdaftar, atau None."""
+        return self._pair_tokens.get(pair)
+
+    def register_decimals(self, token: str, decimals: int) -> None:
+        self._decimals[token] = int(decimals)
+
+    def is_stable(self, token: str) -> bool:
+        return token.lower() in self.stables
+
+    def route_pair(self, token_a: str, token_b: str) -> Optional[str]:
+        """Alamat pair V2 token_a/token_b (None kalau factory tidak dikonfigurasi)."""
+        if not self.factory or not self.init_code_hash:
+            return None
+        key = (token_a, token_b) if token_a < token_b else (token_b, token_a)
+        addr = self._route_cache.get(key)
+        if addr is None:
+            addr = pair_address_for(self.factory, self.init_code_hash, token_a, token_b)
+            self._route_cache[key] = addr
+            # token0 V2 = address terkecil
+            t0, t1 = sorted(key, key=str.lower)
+            self._pair_tokens.setdefault(addr, (t0, t1))
+        return addr
+
+    def route_pairs_for(self, token: str) -> List[str]:
+        """Pair yang dibutuhkan untuk harga token: token/WETH + WETH/stable."""
+        out = []
+        if self.weth and not self.is_stable(token) and token != self.weth:
+            p = self.route_pair(token, self.weth)
+            if p:
+                out.append(p)
+        out.extend(self.weth_usd_pairs())
+        return out
+
+    def weth_usd_pairs(self) -> List[str]:
+        if not self.weth:
+            return []
+        return [p for p in (self.route_pair(self.weth, s) for s in self._stable_addrs) if p]
+
+    # === reserve ===
+    def has(self, pair: str) -> bool:
+        return pair in self._reserves
+
+    def mark_missing(self, pair: str) -> None:
+        self._reserves.put(pair, _MISSING)
+
+    def apply_sync(
+        self,
+        pair: str,
+        reserve0: int,
+        reserve1: int,
+        pos: Optional[Tuple[int, int]] = None,
+        snapshot: bool = False,
+    ) -> None:
+        """
+        pos = (block, logIndex) Sync; Sync yang lebih lama dari reserve tersimpan diabaikan.
+        snapshot=True → bootstrap getReserves di posisi pos, selalu menimpa
+        (pos=None → snapshot tanpa posisi, dianggap paling awal).
+        """
+        if pos is None:
+            pos = (-1, -1)
+        elif not snapshot:
+            cur = self._reserves.get(pair)
+            if cur is not None and cur != _MISSING and cur[2] > pos:
+                return
+        self._reserves.put(pair, (int(reserve0), int(reserve1), pos))
+
+    def _amounts(self, pair: str) -> Optional[Tuple[str, float, str, float]]:
+        """(token0, reserve0 scaled, token1, reserve1 scaled) atau None."""
+        r = self._reserves.get(pair)
+        tokens = self._pair_tokens.get(pair)
+        if r is None or r == _MISSING or tokens is None:
+            return None
+        t0, t1 = tokens
+        d0, d1 = self._decimals.get(t0), self._decimals.get(t1)
+        if d0 is None or d1 is None:
+            return None
+        return t0, r[0] / 10.0 ** d0, t1, r[1] / 10.0 ** d1
+
+    def _price_in(self, pair: Optional[str], token: str) -> float:
+        """Harga token dalam token pasangannya di pair (0 kalau tidak ada reserve)."""
+        if not pair:
+            return 0.0
+        a = self._amounts(pair)
+        if a is None:
+            return 0.0
+        t0, r0, t1, r1 = a
+        if token == t0 and r0 > 0:
+            return r1 / r0
+        if token == t1 and r1 > 0:
+            return r0 / r1
+        return 0.0
+
+    def weth_usd(self) -> float:
+        # pair WETH/stable dengan reserve stable terbesar = acuan paling dalam
+        best, best_depth = 0.0, 0.0
+        for p in self.weth_usd_pairs():
+            a = self._amounts(p)
+            if a is None:
+                continue
+            t0, r0, t1, r1 = a
+            depth = r1 if t0 == self.weth else r0
+            if depth > best_depth:
+                best, best_depth = self._price_in(p, self.weth), depth
+        return best
+
+    def usd_price(self, token: str, pair: Optional[str] = None) -> float:
+        """
+        Harga USD token. Urutan: stable → pair yang diberikan (kalau pasangannya
+        stable / WETH) → token/WETH x WETH/USD. 0 kalau tidak bisa di-route.
+        """
+        if self.is_stable(token):
+            return 1.0
+        if self.weth and token == self.weth:
+            return self.weth_usd()
+        if pair:
+            tokens = self._pair_tokens.get(pair)
+            if tokens:
+                other = tokens[1] if token == tokens[0] else tokens[0]
+                if self.is_stable(other):
+                    px = self._price_in(pair, token)
+                    if px > 0:
+                        return px
+                if self.weth and other == self.weth:
+                    px = self._price_in(pair, token)
+                    if px > 0:
+                        return px * self.weth_usd()
+        if self.weth:
+            px = self._price_in(self.route_pair(token, self.weth), token)
+            if px > 0:
+                return px * self.weth_usd()
+        return 0.0
+
+    def liquidity_usd(self, pair: str) -> float:
+        a = self._amounts(pair)
+        if a is None:
+            return 0.0
+        t0, r0, t1, r1 = a
+        p0 = self.usd_price(t0, pair)
+        p1 = self.usd_price(t1, pair)
+        if p0 > 0 and p1 > 0:
+            return r0 * p0 + r1 * p1
+        # cuma 1 sisi yang bisa dihargai → pool V2 seimbang, 2x sisi itu
+        if p0 > 0:
+            return 2 * r0 * p0
+        if p1 > 0:
+            return 2 * r1 * p1
+        return 0.0
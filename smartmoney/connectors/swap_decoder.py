@@ -0,0 +1,119 @@
+# smartmoney/connectors/swap_decoder.py
+from typing import Any, Dict, List, Sequence
+from hexbytes import HexBytes
+
+try:
+    import numpy as np
+except ImportError:  # opsional: fallback ke int.from_bytes per word
+    np = None
+
+# data Swap V2 = 4 x uint256 (amount0In, amount1In, amount0Out, amount1Out)
+SWAP_DATA_SIZE = 128
+_WORD = 32
+
+# bobot 4 limb uint64 (big-endian) dalam 1 uint256
+_LIMB_SCALE = (2.0 ** 192, 2.0 ** 128, 2.0 ** 64, 1.0)
+
+
+def log_data_bytes(data: Any) -> bytes:
+    """Data log web3 (HexBytes baru / string hex lama) → bytes."""
+    return bytes(HexBytes(data))
+
+
+def _raw_amounts_numpy(blob: bytes, n: int):
+    # 1 buffer n x 16 uint64 big-endian → n x 4 word x 4 limb
+    limbs = np.frombuffer(blob, dtype=">u8").reshape(n, 4, 4).astype(np.float64)
+    return limbs @ np.array(_LIMB_SCALE)
+
+
+def _raw_amounts_python(datas: Sequence[bytes]) -> List[List[float]]:
+    return [
+        [float(int.from_bytes(d[i:i + _WORD], "big")) for i in range(0, SWAP_DATA_SIZE, _WORD)]
+        for d in datas
+    ]
+
+
+def decode_swaps(
+    datas: Sequence[bytes],
+    dec0: Sequence[int],
+    dec1: Sequence[int],
+    stable0: Sequence[bool],
+    stable1: Sequence[bool],
+) -> Dict[str, List]:
+    """
+    Decode + klasifikasi 1 batch Swap V2 sekaligus (kolom per field).
+    Input per log: data 128 byte, decimals token0/token1, flag stable token0/token1.
+    Output (list sejajar input):
+      main_is_token1 : main token = token1 (token0 stable, token1 bukan)
+      is_buy         : BUY / SELL dari sisi main token
+      amount_token   : jumlah main token (sudah di-scale decimals)
+      amount_usd     : jumlah sisi stable (0 kalau pair tanpa stable)
+      price          : amount_usd / amount_token (0 kalau salah satunya 0)
+    Aturan klasifikasi sama dengan jalur per-log lama.
+    """
+    n = len(datas)
+    if n == 0:
+        return {"main_is_token1": [], "is_buy": [], "amount_token": [], "amount_usd": [], "price": []}
+    if any(len(d) < SWAP_DATA_SIZE for d in datas):
+        raise ValueError("Swap data shorter than 128 bytes")
+
+    if np is None:
+        return _classify_python(_raw_amounts_python(datas), dec0, dec1, stable0, stable1)
+
+    raw = _raw_amounts_numpy(b"".join(d[:SWAP_DATA_SIZE] for d in datas), n)
+    s0 = 10.0 ** np.asarray(dec0, dtype=np.float64)
+    s1 = 10.0 ** np.asarray(dec1, dtype=np.float64)
+    a0_in, a1_in = raw[:, 0] / s0, raw[:, 1] / s1
+    a0_out, a1_out = raw[:, 2] / s0, raw[:, 3] / s1
+
+    st0 = np.asarray(stable0, dtype=bool)
+    st1 = np.asarray(stable1, dtype=bool)
+    main1 = st0 & ~st1             # stable di token0 → main token1
+    main0_stable = st1 & ~st0      # stable di token1 → main token0
+
+    buy = np.where(main1, a1_out > 0, a0_out > 0)
+    amount_token = np.where(
+        main1,
+        np.where(buy, a1_out, a1_in),
+        np.where(buy, a0_out, a0_in),
+    )
+    stable_amount = np.where(
+        main1,
+        np.where(buy, a0_in, a0_out),
+        np.where(main0_stable, np.where(buy, a1_in, a1_out), 0.0),
+    )
+
+    ok = (stable_amount > 0) & (amount_token > 0)
+    price = np.divide(stable_amount, amount_token, out=np.zeros(n), where=ok)
+    amount_usd = np.where(ok, stable_amount, 0.0)
+    return {
+        "main_is_token1": main1.tolist(),
+        "is_buy": buy.tolist(),
+        "amount_token": amount_token.tolist(),
+        "amount_usd": amount_usd.tolist(),
+        "price": price.tolist(),
+    }
+
+
+def _classify_python(raw, dec0, dec1, stable0, stable1) -> Dict[str, List]:
+    out = {"main_is_token1": [], "is_buy": [], "amount_token": [], "amount_usd": [], "price": []}
+    for (r0i, r1i, r0o, r1o), d0, d1, st0, st1 in zip(raw, dec0, dec1, stable0, stable1):
+        s0, s1 = 10.0 ** d0, 10.0 ** d1
+        a0_in, a1_in, a0_out, a1_out = r0i / s0, r1i / s1, r0o / s0, r1o / s1
+        main1 = st0 and not st1
+        if main1:
+            buy = a1_out > 0
+            amount_token, stable_amount = (a1_out, a0_in) if buy else (a1_in, a0_out)
+        elif st1 and not st0:
+            buy = a0_out > 0
+            amount_token, stable_amount = (a0_out, a1_in) if buy else (a0_in, a1_out)
+        else:
+            buy = a0_out > 0
+            amount_token, stable_amount = (a0_out if buy else a0_in), 0.0
+        ok = stable_amount > 0 and amount_token > 0
+        out["main_is_token1"].append(main1)
+        out["is_buy"].append(buy)
+        out["amount_token"].append(amount_token)
+        out["amount_usd"].append(stable_amount if ok else 0.0)
+        out["price"].append(stable_amount / amount_token if ok else 0.0)
+    return out
@@ -0,0 +1,69 @@
+# smartmoney/cursors.py
+from typing import Dict, Tuple
+import datetime as dt
+from sqlalchemy.orm import Session
+
+from .models import PerpFillCursor, SpotSignalCursor
+
+# cursor fill = (time_ms, tid)
+FillCursor = Tuple[int, int]
+
+# batas parameter IN (...) per query
+_DB_CHUNK = 500
+
+
+def load_perp_cursors(db: Session, platform: str) -> Dict[str, FillCursor]:
+    rows = db.query(PerpFillCursor).filter(PerpFillCursor.platform == platform).all()
+    return {r.wallet_address: (int(r.last_fill_ms or 0), int(r.last_tid or 0)) for r in rows}
+
+
+def save_perp_cursors(db: Session, platform: str, cursors: Dict[str, FillCursor]) -> None:
+    """
+    Tulis cursor yang berubah ke session (commit dilakukan caller,
+    supaya cursor ikut 1 transaksi dengan signal dari fill yang sama).
+    """
+    if not cursors:
+        return
+    now = dt.datetime.utcnow()
+    wallets = list(cursors.keys())
+    existing = {}
+    for i in range(0, len(wallets), _DB_CHUNK):
+        for r in db.query(PerpFillCursor).filter(
+            PerpFillCursor.platform == platform,
+            PerpFillCursor.wallet_address.in_(wallets[i:i + _DB_CHUNK]),
+        ):
+            existing[r.wallet_address] = r
+    for wallet, (last_ms, last_tid) in cursors.items():
+        row = existing.get(wallet)
+        if row is None:
+            row = PerpFillCursor(wallet_address=wallet, platform=platform)
+            db.add(row)
+        row.last_fill_ms = last_ms
+        row.last_tid = last_tid
+        row.updated_at = now
+
+
+def load_spot_signal_cursors(db: Session) -> Dict[str, int]:
+    return {r.chain_id: int(r.last_block or 0) for r in db.query(SpotSignalCursor).all()}
+
+
+def save_spot_signal_cursors(db: Session, marks: Dict[str, int]) -> None:
+    """
+    Tulis watermark signal spot per chain (block terakhir batch yang diproses;
+    bisa mundur setelah reorg). Commit oleh caller, 1 transaksi dengan signal
+    dari swap yang sama.
+    """
+    if not marks:
+        return
+    now = dt.datetime.utcnow()
+    existing = {
+        r.chain_id: r
+        for r in db.query(SpotSignalCursor).filter(SpotSignalCursor.chain_id.in_(list(marks)))
+    }
+    for chain_id, last_block in marks.items():
+        row = existing.get(chain_id)
+        if row is None:
+            row = SpotSignalCursor(chain_id=chain_id)
+            db.add(row)
+        row.last_block = last_block
+        row.updated_at = now
@@ -1,14 +1,233 @@
 # smartmoney/db.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, List, Sequence
 
-from .models import Base
+from loguru import logger
+from sqlalchemy import create_engine, event, insert, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from .models import Base, SpotTrade
 from .env import env
 
 DB_URL = env("DATABASE_URL", "sqlite:///smartmoney.db")
 
-engine = create_engine(DB_URL, echo=False, future=True)
+# tuning SQLite (diabaikan untuk DB lain)
+SQLITE_SYNCHRONOUS = env("SQLITE_SYNCHRONOUS", "NORMAL")   # WAL + NORMAL: aman dari korupsi, fsync hanya saat checkpoint
+SQLITE_CACHE_MB = int(env("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(env("SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(env("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+DB_POOL_SIZE = int(env("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(env("DB_MAX_OVERFLOW", "8"))
+
+
+def _is_file_sqlite(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+
+def _make_engine(url: str, read_only: bool = False):
+    if not _is_file_sqlite(url):
+        return create_engine(url, echo=False, future=True, pool_pre_ping=True)
+
+    eng = create_engine(
+        url,
+        echo=False,
+        future=True,
+        # koneksi dipakai lintas thread (worker spot, writer thread, main loop)
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000.0},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+
+    @event.listens_for(eng, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        # WAL: reader tidak memblok writer (dan sebaliknya)
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+
+    return eng
+
+
+engine = _make_engine(DB_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+# path baca (dashboard, tools, warm-up cache): pool koneksi sendiri, query_only;
+# dengan WAL tidak pernah menunggu writer
+read_engine = _make_engine(DB_URL, read_only=True) if _is_file_sqlite(DB_URL) else engine
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    migrate_spot_trades(engine)
+    add_missing_columns(engine)
+    ensure_indexes(engine)
+    verify_schema(engine)
+
+
+# nilai awal kolom baru untuk baris lama, kalau default model bukan skalar (mis. utcnow)
+_BACKFILL = {
+    ("alerts", "created_at"): "COALESCE(sent_at, CURRENT_TIMESTAMP)",
+}
+
+
+def _ddl_default(col, dialect) -> str:
+    """DEFAULT literal untuk ADD COLUMN dari default skalar di model ('' kalau tidak ada)."""
+    d = col.default
+    if d is None or not d.is_scalar:
+        return ""
+    return " DEFAULT " + col.type.literal_processor(dialect)(d.arg)
+
+
+def _spot_trades_needs_migration(insp) -> bool:
+    """True kalau wallet_trades_spot masih memakai UNIQUE(tx_hash) lama / belum punya unique per log."""
+    if SpotTrade.__tablename__ not in insp.get_table_names():
+        return False
+    uniques = [u["column_names"] for u in insp.get_unique_constraints(SpotTrade.__tablename__)]
+    uniques += [i["column_names"] for i in insp.get_indexes(SpotTrade.__tablename__) if i.get("unique")]
+    has_log_key = any(set(u) == {"chain_id", "tx_hash", "log_index"} for u in uniques)
+    return ["tx_hash"] in uniques or not has_log_key
+
+
+def migrate_spot_trades(eng) -> None:
+    """
+    Identitas SpotTrade berubah dari UNIQUE(tx_hash) ke (chain_id, tx_hash,
+    log_index) + kolom log_index / block_number / block_hash / orphaned.
+    SQLite tidak bisa mengubah constraint → tabel di-rebuild dalam 1 transaksi:
+    rename tabel lama, buat tabel sesuai models, salin semua baris (kolom baru
+    = default model), drop tabel lama. DB lain: unique index lama diganti di tempat.
+    """
+    insp = inspect(eng)
+    if not _spot_trades_needs_migration(insp):
+        return
+    name = SpotTrade.__tablename__
+    table = SpotTrade.__table__
+    old_cols = {c["name"] for c in insp.get_columns(name)}
+    old_indexes = [i["name"] for i in insp.get_indexes(name) if i.get("name")]
+
+    if eng.dialect.name != "sqlite":
+        with eng.begin() as conn:
+            for idx_name in old_indexes:
+                conn.execute(text(f'DROP INDEX "{idx_name}"'))
+        # kolom baru dulu, lalu unique per log; index non-unique dibuat ensure_indexes
+        add_missing_columns(eng)
+        with eng.begin() as conn:
+            conn.execute(text(f"UPDATE {name} SET log_index = 0 WHERE log_index IS NULL"))
+            conn.execute(text(
+                f"ALTER TABLE {name} ADD CONSTRAINT uq_spot_trade_log UNIQUE (chain_id, tx_hash, log_index)"
+            ))
+        logger.info(f"[DB] Migrated {name}: UNIQUE(tx_hash) → UNIQUE(chain_id, tx_hash, log_index)")
+        return
+
+    old = f"{name}_old"
+    cols, exprs = [], []
+    for col in table.columns:
+        default = col.default.arg if col.default is not None and col.default.is_scalar else None
+        literal = col.type.literal_processor(eng.dialect)(default) if default is not None else None
+        if col.name in old_cols:
+            exprs.append(f'COALESCE("{col.name}", {literal})' if literal is not None else f'"{col.name}"')
+        elif literal is not None:
+            exprs.append(literal)
+        else:
+            continue
+        cols.append(f'"{col.name}"')
+    with eng.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO {old}"))
+        # nama index global di SQLite: index tabel lama dibuang sebelum tabel baru dibuat
+        for idx_name in old_indexes:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{idx_name}"'))
+        table.create(conn)
+        n = conn.execute(text(
+            f"INSERT INTO {name} ({', '.join(cols)}) SELECT {', '.join(exprs)} FROM {old}"
+        )).rowcount
+        conn.execute(text(f"DROP TABLE {old}"))
+    logger.info(f"[DB] Rebuilt {name} with UNIQUE(chain_id, tx_hash, log_index), {n} rows copied")
+
+
+def add_missing_columns(eng) -> None:
+    """
+    create_all tidak mengubah tabel yang sudah ada: kolom yang ditambahkan
+    belakangan di models di-ALTER TABLE ADD COLUMN di sini (aditif; baris
+    lama = default skalar model, selain itu NULL). Kolom unique → unique
+    index terpisah (SQLite tidak bisa ADD COLUMN ... UNIQUE). Kolom yang
+    sudah ada dilewati. Dijalankan sebelum ensure_indexes().
+    """
+    insp = inspect(eng)
+    existing_tables = set(insp.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        have = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in have:
+                continue
+            col_type = col.type.compile(dialect=eng.dialect)
+            default = _ddl_default(col, eng.dialect)
+            with eng.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{col.name}" {col_type}{default}'))
+                fill = _BACKFILL.get((table.name, col.name))
+                if fill:
+                    conn.execute(text(f'UPDATE {table.name} SET "{col.name}" = {fill}'))
+                if col.unique:
+                    conn.execute(text(
+                        f'CREATE UNIQUE INDEX IF NOT EXISTS "uq_{table.name}_{col.name}" '
+                        f'ON {table.name} ("{col.name}")'
+                    ))
+            logger.info(f"[DB] Added column {table.name}.{col.name} ({col_type})")
+
+
+def ensure_indexes(eng) -> None:
+    """
+    create_all hanya membuat index untuk tabel baru; index yang ditambahkan
+    belakangan di models dibuat di sini untuk DB yang sudah ada.
+    Gagal → exception (skema tidak cocok, jangan jalan setengah).
+    """
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            try:
+                idx.create(bind=eng, checkfirst=True)
+            except Exception as e:
+                raise RuntimeError(f"[DB] Index {idx.name} on {table.name} could not be created: {e}") from e
+
+
+def verify_schema(eng) -> None:
+    """Semua tabel & kolom di models harus ada di DB; kalau tidak → RuntimeError."""
+    insp = inspect(eng)
+    tables = set(insp.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(table.name)
+            continue
+        have = {c["name"] for c in insp.get_columns(table.name)}
+        missing.extend(f"{table.name}.{c.name}" for c in table.columns if c.name not in have)
+    if missing:
+        raise RuntimeError(f"[DB] Schema does not match models, missing: {', '.join(missing)}")
+
+
+def bulk_insert_returning(
+    db: Session, model, rows: List[Dict[str, Any]], key: Sequence[str]
+) -> List[Any]:
+    """
+    INSERT banyak baris sekaligus (insertmanyvalues, 1 statement per batch) dengan
+    RETURNING → objek ORM lengkap dengan id, urut sama dengan `rows`.
+    Urutan baris RETURNING tidak dijamin, jadi hasil dipetakan balik lewat kolom
+    `key` (natural key, unik per batch). Kalau key tidak unik di `rows` (mis.
+    source_id NULL), pakai sort_by_parameter_order (di SQLite 1 INSERT per baris).
+    Tidak commit.
+    """
+    if not rows:
+        return []
+    keys = [tuple(r.get(k) for k in key) for r in rows]
+    if len(set(keys)) != len(keys):
+        stmt = insert(model).returning(model, sort_by_parameter_order=True)
+        return db.scalars(stmt, rows).all()
+    by_key = {tuple(getattr(o, k) for k in key): o for o in db.scalars(insert(model).returning(model), rows)}
+    return [by_key[k] for k in keys]
@@ -0,0 +1,166 @@
+# smartmoney/db_writer.py
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+import queue
+import threading
+import time
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+
+WriteJob = Callable[[Session], Any]
+
+
+class DBWriter:
+    """
+    Satu-satunya penulis DB (mode threaded):
+    - producer (main loop, worker spot per chain) submit job `fn(session)`;
+      job hanya boleh menulis/membaca lewat session itu (tanpa RPC / efek samping
+      lain), karena bisa dijalankan ulang
+    - thread writer mengambil job dari queue dan menjalankan sebanyak mungkin
+      dalam 1 transaksi (group commit): semua job yang sudah antre, ditambah
+      yang datang dalam max_delay_ms, maksimal max_batch → 1 commit/fsync untuk
+      banyak producer. Selama 1 batch jalan, job berikutnya menumpuk di queue,
+      jadi batch membesar sendiri saat beban naik
+    - batch gagal → rollback, lalu tiap job diulang di transaksi sendiri, jadi
+      1 job rusak tidak menggagalkan job lain; error dikirim lewat Future
+    threaded=False → call() langsung jalan + commit di thread pemanggil
+    (perilaku lama, untuk tools / test).
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        threaded: bool = True,
+        max_batch: int = 64,
+        max_delay_ms: float = 2.0,
+        queue_size: int = 1000,
+    ):
+        self.session_factory = session_factory
+        self.threaded = threaded
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[WriteJob, Future]]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"batches": 0, "jobs": 0, "retried": 0, "failed": 0}
+        self._last_report = time.monotonic()
+
+    # === API producer ===
+    def submit(self, fn: WriteJob) -> Future:
+        fut: Future = Future()
+        if not self.threaded:
+            try:
+                fut.set_result(self._run_single(fn))
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+        self._ensure_started()
+        # queue penuh → producer menunggu (backpressure)
+        self._queue.put((fn, fut))
+        return fut
+
+    def call(self, fn: WriteJob, timeout: Optional[float] = None) -> Any:
+        """submit + tunggu hasil (setelah commit). Error job dilempar ulang."""
+        return self.submit(fn).result(timeout=timeout)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return dict(self._stats, queued=self._queue.qsize())
+
+    # === writer thread ===
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def _collect(self) -> Tuple[List[Tuple[WriteJob, Future]], bool]:
+        """
+        Ambil 1 batch: semua job yang sudah antre (tanpa menunggu), lalu kalau
+        belum max_batch tunggu job lain paling lama max_delay. Return (jobs, stop).
+        """
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        jobs = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(jobs) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                return jobs, True
+            jobs.append(item)
+        return jobs, False
+
+    def _run(self) -> None:
+        logger.info(
+            f"[DBWriter] Started (group commit: max {self.max_batch} jobs / {self.max_delay * 1000:.0f} ms)"
+        )
+        while True:
+            jobs, stop = self._collect()
+            if jobs:
+                self._run_batch(jobs)
+            if stop:
+                break
+        logger.info(f"[DBWriter] Stopped, stats={self._stats}")
+
+    def _run_batch(self, jobs: List[Tuple[WriteJob, Future]]) -> None:
+        t0 = time.perf_counter()
+        db = self.session_factory()
+        try:
+            results = [fn(db) for fn, _ in jobs]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.close()
+            logger.warning(f"[DBWriter] Group commit of {len(jobs)} jobs failed ({e}), retrying one by one")
+            self._stats["retried"] += len(jobs)
+            for fn, fut in jobs:
+                try:
+                    fut.set_result(self._run_single(fn))
+                except Exception as ex:
+                    self._stats["failed"] += 1
+                    fut.set_exception(ex)
+            return
+        db.close()
+        for (_, fut), res in zip(jobs, results):
+            fut.set_result(res)
+
+        self._stats["batches"] += 1
+        self._stats["jobs"] += len(jobs)
+        took = (time.perf_counter() - t0) * 1000
+        now = time.monotonic()
+        if took > 1000 or now - self._last_report > 300:
+            self._last_report = now
+            logger.info(
+                f"[DBWriter] batch {len(jobs)} jobs in {took:.0f} ms, "
+                f"queue {self._queue.qsize()}, stats={self._stats}"
+            )
+
+    def _run_single(self, fn: WriteJob) -> Any:
+        db = self.session_factory()
+        try:
+            res = fn(db)
+            db.commit()
+            return res
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
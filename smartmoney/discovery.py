@@ -1,10 +1,12 @@
 # smartmoney/discovery.py
-from typing import List
-import requests
+from typing import Dict, List, Tuple
+import datetime as dt
+
 from loguru import logger
 from sqlalchemy.orm import Session
 
 from .env import env
+from .connectors.hyperliquid_client import DEFAULT_INFO_URL, get_info_client
 from .models import Wallet
 from .tracked import load_config
 
@@ -24,10 +26,9 @@ def _get_leaderboard_url() -> str:
 
 def _fetch_leaderboard_raw() -> dict:
     url = _get_leaderboard_url()
+    client = get_info_client(env("HYPERLIQUID_BASE_URL", DEFAULT_INFO_URL))
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
+        return client.get_json(url)
     except Exception as e:
         logger.error(f"[Discovery] Error fetching leaderboard from {url}: {e}")
         return {}
@@ -69,29 +70,30 @@ def _parse_row_stats(row: dict):
     return acct_val, pnl_all, roi_all_frac
 
 
-def refresh_leaderboard_wallets(
-    db: Session,
+# stats leaderboard per wallet: (account_value_usd, pnl_all_usd, roi_all)
+WalletStats = Tuple[float, float, float]
+
+# batas parameter per statement (IN / VALUES multi-row)
+_DB_CHUNK = 500
+
+
+def _fingerprint(stats) -> Tuple[float, float, float]:
+    """Stats dibulatkan (sen USD, ROI 1e-6) → beda float kecil tidak dianggap berubah."""
+    acct_val, pnl_all, roi_all = (float(x or 0.0) for x in stats)
+    return round(acct_val, 2), round(pnl_all, 2), round(roi_all, 6)
+
+
+def fetch_leaderboard_stats(
     top_n: int = TOP_N_DEFAULT,
     min_account_value: float = MIN_ACCOUNT_VALUE_DEFAULT,
-) -> List[str]:
-    """
-    Ambil leaderboard → update/insert Wallet dengan:
-    - account_value_usd
-    - pnl_all_usd
-    - roi_all
-    Return: list address (string) yang lulus filter.
-    """
-    logger.info(
-        f"[Discovery] Refresh leaderboard wallets (top_n={top_n}, min_account_value={min_account_value})"
-    )
+) -> Dict[str, WalletStats]:
+    """Ambil leaderboard (HTTP saja, tanpa DB) → {address lowercase: stats} yang lulus filter."""
     raw = _fetch_leaderboard_raw()
     if not raw:
-        return []
-
-    rows = raw.get("leaderboardRows", [])
-    selected_addrs: List[str] = []
+        return {}
 
-    for row in rows[:top_n]:
+    out: Dict[str, WalletStats] = {}
+    for row in raw.get("leaderboardRows", [])[:top_n]:
         try:
             addr = row.get("ethAddress")
             if not addr:
@@ -99,28 +101,106 @@ def refresh_leaderboard_wallets(
             acct_val, pnl_all, roi_all = _parse_row_stats(row)
             if acct_val < min_account_value:
                 continue
-
-            addr_lc = addr.lower()
-            wallet = db.query(Wallet).get(addr_lc)
-            if not wallet:
-                wallet = Wallet(address=addr_lc)
-                db.add(wallet)
-
-            wallet.account_value_usd = acct_val
-            wallet.pnl_all_usd = pnl_all
-            wallet.roi_all = roi_all
-
-            selected_addrs.append(addr_lc)
+            out.setdefault(addr.lower(), (acct_val, pnl_all, roi_all))
         except Exception as e:
             logger.error(f"[Discovery] Error parsing leaderboard row: {e}")
             continue
+    return out
+
 
-    if selected_addrs:
-        db.commit()
-        logger.info(
-            f"[Discovery] Upserted {len(selected_addrs)} wallets from leaderboard (after filters)"
-        )
+def _upsert_stmt(db: Session, rows: List[dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
     else:
+        return None
+    stmt = dialect_insert(Wallet).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Wallet.address],
+        set_={
+            "account_value_usd": stmt.excluded.account_value_usd,
+            "pnl_all_usd": stmt.excluded.pnl_all_usd,
+            "roi_all": stmt.excluded.roi_all,
+            "last_updated_at": stmt.excluded.last_updated_at,
+        },
+    )
+
+
+def upsert_leaderboard_wallets(db: Session, stats: Dict[str, WalletStats]) -> Dict[str, int]:
+    """
+    Tulis stats leaderboard ke Wallet (DB saja, bisa diulang; commit oleh caller):
+    - wallet existing di-load dengan 1 query per chunk, fingerprint dibandingkan
+    - hanya wallet baru / berubah yang ditulis, lewat INSERT .. ON CONFLICT DO UPDATE
+      (SQLite / PostgreSQL; dialect lain fallback ORM)
+    Return jumlah {"inserted", "updated", "skipped"}.
+    """
+    addrs = sorted(stats)
+    existing: Dict[str, Tuple[float, float, float]] = {}
+    for i in range(0, len(addrs), _DB_CHUNK):
+        for addr, acct_val, pnl_all, roi_all in db.query(
+            Wallet.address, Wallet.account_value_usd, Wallet.pnl_all_usd, Wallet.roi_all
+        ).filter(Wallet.address.in_(addrs[i:i + _DB_CHUNK])):
+            existing[addr] = _fingerprint((acct_val, pnl_all, roi_all))
+
+    now = dt.datetime.utcnow()
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    rows: List[dict] = []
+    for addr in addrs:
+        old = existing.get(addr)
+        if old is not None and old == _fingerprint(stats[addr]):
+            counts["skipped"] += 1
+            continue
+        counts["updated" if old is not None else "inserted"] += 1
+        acct_val, pnl_all, roi_all = stats[addr]
+        rows.append({
+            "address": addr,
+            "account_value_usd": acct_val,
+            "pnl_all_usd": pnl_all,
+            "roi_all": roi_all,
+            "last_updated_at": now,
+        })
+
+    for i in range(0, len(rows), _DB_CHUNK):
+        chunk = rows[i:i + _DB_CHUNK]
+        stmt = _upsert_stmt(db, chunk)
+        if stmt is not None:
+            db.execute(stmt)
+        else:
+            for r in chunk:
+                db.merge(Wallet(**r))
+    return counts
+
+
+def refresh_leaderboard_wallets(
+    db: Session,
+    top_n: int = TOP_N_DEFAULT,
+    min_account_value: float = MIN_ACCOUNT_VALUE_DEFAULT,
+) -> List[str]:
+    """
+    Ambil leaderboard → insert/update Wallet (hanya yang baru / stats-nya berubah):
+    - account_value_usd
+    - pnl_all_usd
+    - roi_all
+    Return: list address (string) yang lulus filter.
+    """
+    logger.info(
+        f"[Discovery] Refresh leaderboard wallets (top_n={top_n}, min_account_value={min_account_value})"
+    )
+    stats = fetch_leaderboard_stats(top_n, min_account_value)
+    if not stats:
         logger.warning("[Discovery] No wallets passed filters from leaderboard")
+        return []
+
+    counts = upsert_leaderboard_wallets(db, stats)
+    db.commit()
+    log_upsert_counts(counts)
+    return sorted(stats)
 
-    return selected_addrs
+
+def log_upsert_counts(counts: Dict[str, int]) -> None:
+    logger.info(
+        f"[Discovery] Leaderboard wallets: {counts['inserted']} inserted, "
+        f"{counts['updated']} updated, {counts['skipped']} unchanged (skipped)"
+    )
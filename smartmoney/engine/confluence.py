@@ -1,11 +1,13 @@
 # smartmoney/engine/confluence.py
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from loguru import logger
 
+from ..db import bulk_insert_returning
 from ..models import Signal as SignalModel, Alert
 from .setup import generate_trade_setup
 from ..schemas import AlertSchema, SpotContext, PerpContext, Setup
+from .positions import PositionBook
 
 def derive_spot_bias(signals: List[SignalModel]) -> int:
     if not signals:
@@ -51,8 +53,14 @@ def decide_confluence(spot_bias: int, perp_bias: int):
 def process_signals_into_alerts(
     db: Session,
     new_signals: List[SignalModel],
-    risk_per_trade_default: float
+    risk_per_trade_default: float,
+    positions: Optional[PositionBook] = None,
 ) -> List[AlertSchema]:
+    """
+    Gabungkan signal per (wallet, token) jadi alert. Semua alert cycle ini
+    di-insert bulk (INSERT .. RETURNING untuk id); commit oleh caller,
+    1 transaksi bersama signal.
+    """
     if not new_signals:
         return []
 
@@ -61,7 +69,7 @@ def process_signals_into_alerts(
         key = (s.wallet_address, s.token_symbol)
         grouped.setdefault(key, []).append(s)
 
-    alerts_schemas: List[AlertSchema] = []
+    pending = []  # (kolom Alert, field AlertSchema tanpa id)
 
     for (wallet_address, token_symbol), sigs in grouped.items():
         spot_sigs = [s for s in sigs if s.signal_type.startswith("SPOT_")]
@@ -101,7 +109,8 @@ def process_signals_into_alerts(
             perp_ctx.pair = p0.pair_perp
             perp_ctx.entry_price_wallet = p0.price
             perp_ctx.size_usd = p0.size_usd
-            perp_ctx.leverage = 1.0
+            # leverage asli dari buku posisi (snapshot clearinghouseState), default 1x
+            perp_ctx.leverage = positions.leverage_for(wallet_address, p0.pair_perp) if positions else 1.0
             perp_ctx.bias = perp_bias
 
         raw_payload = {
@@ -112,8 +121,9 @@ def process_signals_into_alerts(
             "mode": mode,
         }
 
-        alert_model = Alert(
-            alert_type="HYBRID" if spot_sigs and perp_sigs else ("SPOT_ONLY" if spot_sigs else "PERP_ONLY"),
+        alert_type = "HYBRID" if spot_sigs and perp_sigs else ("SPOT_ONLY" if spot_sigs else "PERP_ONLY")
+        alert_row = dict(
+            alert_type=alert_type,
             signal_strength=signal_strength,
             wallet_address=wallet_address,
             wallet_score=main_sig.wallet_score,
@@ -131,19 +141,18 @@ def process_signals_into_alerts(
             tp3=setup.tp3,
             raw_payload=raw_payload,
         )
-        db.add(alert_model)
-        db.commit()
-
-        alert_schema = AlertSchema(
-            id=str(alert_model.id),
-            alert_type=alert_model.alert_type,
+        pending.append((alert_row, dict(
+            alert_type=alert_type,
             signal_strength=signal_strength,
             wallet_address=wallet_address,
             wallet_score=main_sig.wallet_score,
             spot=spot_ctx,
             perp=perp_ctx,
             setup=setup,
-        )
-        alerts_schemas.append(alert_schema)
+        )))
 
-    return alerts_schemas
+    # 1 alert per (wallet, token) → natural key untuk memetakan hasil RETURNING
+    models = bulk_insert_returning(
+        db, Alert, [row for row, _ in pending], key=("wallet_address", "token_symbol")
+    )
+    return [AlertSchema(id=str(m.id), **fields) for m, (_, fields) in zip(models, pending)]
@@ -0,0 +1,100 @@
+# smartmoney/engine/dedup.py
+from typing import Any, Iterable, List, Set, Tuple
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from loguru import logger
+
+from ..cache import LRUCache
+from ..models import Signal
+
+# batas jumlah parameter per query IN (...) (aman untuk SQLite)
+_IN_CHUNK = 500
+
+
+class SeenFillFilter:
+    """
+    Buang event yang sumbernya (fill / swap log) sudah pernah diproses,
+    SEBELUM dibuat jadi objek ORM:
+    - cek LRU in-memory (bounded) dulu
+    - sisanya dicek ke DB (kolom unik signals.source_id) dengan 1 query per chunk
+    Event tanpa source_id (mis. connector lama) selalu lolos.
+    """
+
+    def __init__(self, capacity: int = 200_000):
+        self._seen = LRUCache(capacity)
+
+    def warm(self, db: Session, limit: int = 50_000) -> None:
+        """
+        Isi LRU dari signal terbaru di DB (dipanggil saat startup).
+        DB lama yang belum di-migrate (kolom source_id belum ada, init_db belum
+        jalan) → seen-set kosong, bukan crash.
+        """
+        try:
+            rows = (
+                db.query(Signal.source_id)
+                .filter(Signal.source_id.isnot(None))
+                .order_by(Signal.id.desc())
+                .limit(limit)
+                .all()
+            )
+        except OperationalError as e:
+            db.rollback()
+            logger.warning(f"[Dedup] Could not warm seen-set (run init_db to migrate signals.source_id): {e.orig}")
+            return
+        for (sid,) in reversed(rows):
+            self._seen.put(sid)
+        logger.info(f"[Dedup] Warmed seen-set with {len(rows)} source ids")
+
+    def _existing_in_db(self, db: Session, ids: List[str]) -> Set[str]:
+        found: Set[str] = set()
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            found.update(
+                sid for (sid,) in db.query(Signal.source_id).filter(Signal.source_id.in_(chunk))
+            )
+        return found
+
+    def filter_new(
+        self, db: Session, spot_events: List[Any], perp_events: List[Any]
+    ) -> Tuple[List[Any], List[Any]]:
+        candidates = [
+            e.get("source_id")
+            for e in (*spot_events, *perp_events)
+            if e.get("source_id") and e.get("source_id") not in self._seen
+        ]
+        in_db = self._existing_in_db(db, list(dict.fromkeys(candidates))) if candidates else set()
+
+        dropped = 0
+        batch_seen: Set[str] = set()
+
+        def keep(e) -> bool:
+            nonlocal dropped
+            sid = e.get("source_id")
+            if not sid:
+                return True
+            if sid in batch_seen or sid in in_db or sid in self._seen:
+                dropped += 1
+                return False
+            batch_seen.add(sid)
+            return True
+
+        spot_new = [e for e in spot_events if keep(e)]
+        perp_new = [e for e in perp_events if keep(e)]
+        for sid in batch_seen:
+            self._seen.put(sid)
+        for sid in in_db:
+            self._seen.put(sid)
+
+        if dropped:
+            logger.info(f"[Dedup] Dropped {dropped} duplicate events")
+        return spot_new, perp_new
+
+    def forget(self, events: Iterable[Any]) -> None:
+        """
+        Keluarkan source_id event dari seen-set (signal-nya tidak jadi
+        ter-commit), supaya event yang sama lolos lagi saat diproses ulang.
+        """
+        for e in events:
+            sid = e.get("source_id")
+            if sid:
+                self._seen.pop(sid)
@@ -0,0 +1,292 @@
+# smartmoney/engine/positions.py
+from typing import Any, Dict, List, Optional, Set, Tuple
+import datetime as dt
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from ..connectors.records import PerpEvent, PerpFill
+from ..models import PerpPosition
+
+# toleransi size (unit coin) untuk menganggap posisi 0
+_EPS = 1e-9
+
+# batas parameter IN (...) per query
+_DB_CHUNK = 500
+
+# dir yang berarti sisi beli (dipakai kalau field `side` tidak ada)
+_BUY_DIRS = {"Open Long", "Increase Long", "Close Short", "Short > Long"}
+
+
+class PositionState:
+    """Posisi 1 wallet di 1 pair. szi bertanda: + long, - short (unit coin)."""
+
+    __slots__ = ("szi", "entry_px", "leverage", "liq_px", "opened_at", "updated_at")
+
+    def __init__(self):
+        self.szi = 0.0
+        self.entry_px = 0.0
+        self.leverage = 1.0
+        self.liq_px: Optional[float] = None
+        self.opened_at = 0
+        self.updated_at = 0
+
+    def snapshot(self) -> Tuple:
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def restore(self, snap: Tuple) -> None:
+        for f, v in zip(self.__slots__, snap):
+            setattr(self, f, v)
+
+    @property
+    def direction(self) -> str:
+        return "LONG" if self.szi > 0 else "SHORT"
+
+    @property
+    def size_usd(self) -> float:
+        return abs(self.szi) * self.entry_px
+
+
+def _sign(x: float) -> int:
+    if x > _EPS:
+        return 1
+    if x < -_EPS:
+        return -1
+    return 0
+
+
+class PositionBook:
+    """
+    Buku posisi perp in-memory per (wallet, pair), di-update incremental dari fill:
+    - apply_fill() → event OPEN / INCREASE / DECREASE / CLOSE; flip (long → short
+      atau sebaliknya) jadi 2 event: CLOSE posisi lama + OPEN posisi baru
+    - startPosition dari exchange dipakai sebagai size sebelum fill (self-healing
+      kalau ada fill yang terlewat)
+    - leverage & liquidation price diambil dari snapshot clearinghouseState lewat
+      reconcile(), yang juga mengoreksi size / entry
+    - lookup posisi O(1) lewat get() / leverage_for()
+    - flush() hanya menulis posisi yang berubah ke tabel PerpPosition
+    - state sebelum perubahan pertama sejak commit terakhir disimpan (undo log):
+      rewind() mengembalikannya kalau job persist gagal (fill diambil ulang dan
+      tidak boleh diterapkan 2x), mark_persisted() membuangnya setelah commit
+    """
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self._positions: Dict[Tuple[str, str], PositionState] = {}
+        self._dirty: set = set()
+        # key → snapshot state sebelum berubah (None: belum ada di buku)
+        self._undo: Dict[Tuple[str, str], Optional[Tuple]] = {}
+
+    def get(self, wallet: str, pair: str) -> Optional[PositionState]:
+        st = self._positions.get((wallet.lower(), pair))
+        if st is None or _sign(st.szi) == 0:
+            return None
+        return st
+
+    def leverage_for(self, wallet: str, pair: str, default: float = 1.0) -> float:
+        st = self._positions.get((wallet.lower(), pair))
+        return st.leverage if st is not None else default
+
+    def wallets_with_positions(self) -> List[str]:
+        return sorted({w for (w, _), st in self._positions.items() if _sign(st.szi) != 0})
+
+    def _state(self, key: Tuple[str, str]) -> PositionState:
+        """State untuk diubah: snapshot-nya masuk undo log sekali per commit."""
+        st = self._positions.get(key)
+        if key not in self._undo:
+            self._undo[key] = st.snapshot() if st is not None else None
+        if st is None:
+            st = PositionState()
+            self._positions[key] = st
+        return st
+
+    def apply_fill(self, wallet: str, fill: PerpFill, source_id: str) -> List[PerpEvent]:
+        pair = fill.coin + "-PERP"
+        key = (wallet, pair)
+        st = self._state(key)
+        ts = fill.time // 1000
+
+        if fill.side in ("B", "A"):
+            is_buy = fill.side == "B"
+        else:
+            is_buy = fill.dir in _BUY_DIRS
+        before = fill.start_position
+        after = before + (fill.sz if is_buy else -fill.sz)
+        s_before, s_after = _sign(before), _sign(after)
+
+        if _sign(st.szi - before) != 0 and s_before != 0:
+            # ada fill yang terlewat: ikut angka exchange, entry lama tetap jadi estimasi
+            logger.debug(f"[Positions] {wallet} {pair} size drift {st.szi} → {before}")
+            if st.entry_px <= 0:
+                st.entry_px = fill.px
+
+        def event(direction: str, event_type: str, size_coin: float, sid: str, closed_pnl: float = 0.0) -> PerpEvent:
+            return PerpEvent(
+                wallet, self.platform, pair, direction, event_type,
+                fill.px, size_coin * fill.px, st.leverage, ts, sid, closed_pnl,
+            )
+
+        events: List[PerpEvent] = []
+        if s_before == 0 and s_after != 0:
+            st.entry_px = fill.px
+            st.opened_at = ts
+            events.append(event("LONG" if s_after > 0 else "SHORT", "OPEN", abs(after), source_id))
+        elif s_before != 0 and s_after == 0:
+            events.append(event("LONG" if s_before > 0 else "SHORT", "CLOSE", abs(before), source_id, fill.closed_pnl))
+        elif s_before != 0 and s_after != 0 and s_before != s_after:
+            # flip: tutup posisi lama, buka posisi baru di arah sebaliknya
+            events.append(event("LONG" if s_before > 0 else "SHORT", "CLOSE", abs(before), source_id + ":close", fill.closed_pnl))
+            st.entry_px = fill.px
+            st.opened_at = ts
+            events.append(event("LONG" if s_after > 0 else "SHORT", "OPEN", abs(after), source_id))
+        elif s_before != 0:
+            direction = "LONG" if s_before > 0 else "SHORT"
+            if abs(after) > abs(before):
+                st.entry_px = (abs(before) * st.entry_px + fill.sz * fill.px) / abs(after)
+                events.append(event(direction, "INCREASE", fill.sz, source_id))
+            else:
+                events.append(event(direction, "DECREASE", fill.sz, source_id, fill.closed_pnl))
+
+        st.szi = after if s_after != 0 else 0.0
+        if s_after == 0:
+            st.liq_px = None
+        st.updated_at = ts
+        self._dirty.add(key)
+        return events
+
+    def reconcile(self, wallet: str, state: Dict[str, Any], ts: int) -> int:
+        """
+        Sinkronkan posisi 1 wallet dengan snapshot clearinghouseState.
+        Return jumlah posisi yang dikoreksi.
+        """
+        seen = set()
+        changed = 0
+        for ap in state.get("assetPositions") or []:
+            pos = ap.get("position") or {}
+            coin = pos.get("coin")
+            if not coin:
+                continue
+            key = (wallet, coin + "-PERP")
+            seen.add(key)
+            st = self._state(key)
+
+            szi = float(pos.get("szi") or 0.0)
+            entry_px = float(pos.get("entryPx") or 0.0)
+            lev = pos.get("leverage") or {}
+            leverage = float(lev.get("value") or 1.0) if isinstance(lev, dict) else float(lev or 1.0)
+            liq_raw = pos.get("liquidationPx")
+            liq_px = float(liq_raw) if liq_raw not in (None, "") else None
+
+            if (
+                _sign(st.szi - szi) != 0
+                or abs(st.entry_px - entry_px) > _EPS
+                or st.leverage != leverage
+                or st.liq_px != liq_px
+            ):
+                if _sign(st.szi) == 0 and _sign(szi) != 0:
+                    st.opened_at = ts
+                st.szi, st.entry_px, st.leverage, st.liq_px = szi, entry_px, leverage, liq_px
+                st.updated_at = ts
+                self._dirty.add(key)
+                changed += 1
+
+        # posisi di buku yang tidak ada di snapshot → sudah tertutup
+        for key, st in self._positions.items():
+            if key[0] == wallet and key not in seen and _sign(st.szi) != 0:
+                self._undo.setdefault(key, st.snapshot())
+                st.szi = 0.0
+                st.liq_px = None
+                st.updated_at = ts
+                self._dirty.add(key)
+                changed += 1
+        return changed
+
+    def load(self, db: Session) -> None:
+        """Isi buku dari baris PerpPosition OPEN (saat startup)."""
+        rows = db.query(PerpPosition).filter(
+            PerpPosition.platform == self.platform,
+            PerpPosition.status == "OPEN",
+        ).all()
+        for r in rows:
+            st = self._positions.setdefault((r.wallet_address, r.pair), PositionState())
+            entry = r.entry_price or 0.0
+            size_coin = (r.size_usd or 0.0) / entry if entry > 0 else 0.0
+            st.szi = size_coin if r.direction == "LONG" else -size_coin
+            st.entry_px = entry
+            st.leverage = r.leverage or 1.0
+            st.liq_px = r.liq_price
+            st.opened_at = int(r.opened_at.timestamp()) if r.opened_at else 0
+            st.updated_at = int(r.updated_at.timestamp()) if r.updated_at else 0
+        logger.info(f"[Positions] Loaded {len(rows)} open {self.platform} positions")
+
+    def take_dirty(self) -> Set[Tuple[str, str]]:
+        """Ambil (dan kosongkan) daftar posisi yang berubah sejak flush terakhir."""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def restore_dirty(self, dirty: Set[Tuple[str, str]]) -> None:
+        """Job flush gagal: posisi hasil take_dirty() ditulis lagi di flush berikutnya."""
+        self._dirty.update(dirty)
+
+    def mark_persisted(self) -> None:
+        """Job persist ter-commit: state saat ini jadi titik rewind berikutnya."""
+        self._undo.clear()
+
+    def rewind(self) -> int:
+        """
+        Job persist gagal: kembalikan semua state yang berubah sejak commit
+        terakhir (apply_fill / reconcile). Return jumlah posisi yang dikembalikan.
+        """
+        for key, snap in self._undo.items():
+            if snap is None:
+                self._positions.pop(key, None)
+                self._dirty.discard(key)
+            else:
+                self._positions[key].restore(snap)
+        n = len(self._undo)
+        self._undo.clear()
+        return n
+
+    def flush(self, db: Session, dirty: Optional[Set[Tuple[str, str]]] = None) -> int:
+        """
+        Tulis posisi yang berubah sejak flush terakhir ke PerpPosition
+        (1 baris per wallet+pair; status OPEN/CLOSED). Commit oleh caller.
+        dirty: hasil take_dirty() (job DBWriter yang bisa diulang); None → ambil sendiri.
+        """
+        if dirty is None:
+            dirty = self.take_dirty()
+        if not dirty:
+            return 0
+        wallets = sorted({w for w, _ in dirty})
+        existing = {}
+        for i in range(0, len(wallets), _DB_CHUNK):
+            for r in db.query(PerpPosition).filter(
+                PerpPosition.platform == self.platform,
+                PerpPosition.wallet_address.in_(wallets[i:i + _DB_CHUNK]),
+            ):
+                existing[(r.wallet_address, r.pair)] = r
+        for key in dirty:
+            st = self._positions[key]
+            row = existing.get(key)
+            is_open = _sign(st.szi) != 0
+            if row is None:
+                if not is_open:
+                    continue
+                row = PerpPosition(
+                    wallet_address=key[0],
+                    platform=self.platform,
+                    platform_type="appchain",
+                    pair=key[1],
+                )
+                db.add(row)
+            if is_open:
+                row.direction = st.direction
+                row.entry_price = st.entry_px
+                row.size_usd = st.size_usd
+                row.opened_at = dt.datetime.utcfromtimestamp(st.opened_at) if st.opened_at else None
+            row.leverage = st.leverage
+            row.liq_price = st.liq_px
+            row.updated_at = dt.datetime.utcfromtimestamp(st.updated_at) if st.updated_at else dt.datetime.utcnow()
+            row.status = "OPEN" if is_open else "CLOSED"
+        return len(dirty)
@@ -1,18 +1,36 @@
 # smartmoney/engine/runner.py
+import atexit
 import time
 import yaml
 from loguru import logger
 from sqlalchemy.orm import Session
 
-from ..db import SessionLocal
+from ..db import SessionLocal, ReadSessionLocal
+from ..db_writer import DBWriter
+from ..archive import EventArchiver
 from ..models import Wallet
-from ..scoring import compute_smart_score_from_wallet, assign_tiers_by_rank
+from ..registry import WalletRegistry
 from ..connectors.perp_hyperliquid import HyperliquidConnector
+from ..connectors.perp_hyperliquid_ws import HyperliquidStreamConnector, DEFAULT_WS_URL
+from ..connectors.hyperliquid_client import get_info_client
+from ..connectors.poll_scheduler import WalletPollScheduler
+from ..connectors.evm_spot_uniswap import UniswapV2SpotConnector, MULTICALL3_ADDRESS
 from ..bots.telegram_bot import TelegramAlerter
 from ..env import env
 from .signals import create_signals_from_events
 from .confluence import process_signals_into_alerts
-from ..discovery import refresh_leaderboard_wallets
+from .dedup import SeenFillFilter
+from .positions import PositionBook
+from .spot_ingest import SpotIngestor
+from .spot_workers import SpotWorkerPool
+from .wallet_stats import WalletStatsBook
+from ..discovery import (
+    refresh_leaderboard_wallets,
+    fetch_leaderboard_stats,
+    upsert_leaderboard_wallets,
+    log_upsert_counts,
+)
+from ..cursors import load_perp_cursors, save_perp_cursors, save_spot_signal_cursors
 
 
 def load_config():
@@ -40,11 +58,47 @@ def seed_tracked_wallets(db: Session, config):
     db.commit()
 
 
+def build_spot_ingestors(config) -> list:
+    """1 SpotIngestor (Uniswap V2) per entry evm_chains di config.yaml."""
+    ingestors = []
+    for c in config.get("evm_chains", []) or []:
+        chain_id = str(c["chain_id"])
+        rpc_url = env(c.get("rpc_url_env", ""), "")
+        if not rpc_url:
+            logger.error(f"[{chain_id}] RPC URL env {c.get('rpc_url_env')} not set, chain skipped")
+            continue
+        conn = UniswapV2SpotConnector(
+            chain_id=chain_id,
+            rpc_url=rpc_url,
+            dex_name=c.get("dex", "uniswap_v2"),
+            rpc_batch_size=int(c.get("rpc_batch_size", 100)),
+            wallet_filter=c.get("wallet_filter", "tx_sender"),
+            topic_chunk_size=int(c.get("topic_chunk_size", 50)),
+            log_concurrency=int(c.get("log_concurrency", 4)),
+            initial_chunk_blocks=int(c.get("initial_chunk_blocks", 500)),
+            max_chunk_blocks=int(c.get("max_chunk_blocks", 10_000)),
+            metadata_cache_size=int(c.get("metadata_cache_size", 50_000)),
+            multicall_address=c.get("multicall_address", MULTICALL3_ADDRESS),
+            weth_address=c.get("weth_address"),
+            v2_factory=c.get("v2_factory"),
+            v2_init_code_hash=c.get("v2_init_code_hash"),
+            max_watched_pools=int(c.get("max_watched_pools", 5000)),
+        )
+        ingestors.append(SpotIngestor(
+            conn,
+            confirmations=int(c.get("confirmations", 12)),
+            max_range_blocks=int(c.get("max_range_blocks", 2000)),
+            start_lookback_blocks=int(c.get("start_lookback_blocks", 0)),
+        ))
+    return ingestors
+
+
 def main_loop():
     config = load_config()
     thresholds = config["thresholds"]
 
     min_spot_size_usd = thresholds["min_spot_size_usd"]   # tidak dipakai untuk saat ini
+    min_liquidity_usd = float(thresholds.get("min_liquidity_usd", 0))
     min_perp_size_usd = thresholds["min_perp_size_usd"]
     risk_default = thresholds["risk_per_trade_default"]
     min_wallet_score = float(thresholds.get("min_wallet_score", 0.0))
@@ -57,6 +111,16 @@ def main_loop():
             chat_id=env("TELEGRAM_CHAT_ID"),
         )
 
+    # === Shared Hyperliquid Info API client (dipakai connector & discovery) ===
+    for p in config.get("perp_platforms", []):
+        if p["name"] == "hyperliquid":
+            get_info_client(
+                env(p.get("base_url_env", ""), "https://api.hyperliquid.xyz/info"),
+                weight_budget_per_min=int(p.get("weight_budget_per_min", 1200)),
+                max_retries=int(p.get("max_retries", 4)),
+                pool_maxsize=int(p.get("max_concurrency", 8)),
+            )
+
     # === Seed awal wallet manual ===
     db0 = SessionLocal()
     seed_tracked_wallets(db0, config)
@@ -67,86 +131,308 @@ def main_loop():
 
     # === Init perp connector (Hyperliquid) ===
     perp_connectors = []
+    position_books = []
     for p in config.get("perp_platforms", []):
         if p["name"] == "hyperliquid":
             base_url = env(p.get("base_url_env", ""), "https://api.hyperliquid.xyz/info")
-            perp_connectors.append(HyperliquidConnector(base_url=base_url))
+            stream_mode = p.get("mode", "poll") == "stream"
+            sched_cfg = p.get("poll_scheduler") or {}
+            scheduler = None
+            if sched_cfg.get("enabled") and not stream_mode:
+                scheduler = WalletPollScheduler(
+                    weight_budget_per_min=float(sched_cfg.get("weight_budget_per_min", 900)),
+                    tier_intervals=sched_cfg.get("tier_intervals"),
+                    dormant_after_s=float(sched_cfg.get("dormant_after_s", 86400)),
+                    dormant_interval_s=float(sched_cfg.get("dormant_interval_s", 180)),
+                )
+            book = PositionBook("hyperliquid")
+            position_books.append(book)
+            rest = HyperliquidConnector(
+                base_url=base_url,
+                max_concurrency=int(p.get("max_concurrency", 8)),
+                batch_timeout=float(p.get("batch_timeout", 30.0)),
+                request_timeout=p.get("request_timeout"),
+                max_pages_per_poll=int(p.get("max_pages_per_poll", 10)),
+                aggregate_by_time=not stream_mode,
+                scheduler=scheduler,
+                position_book=book,
+                reconcile_interval=float(p.get("reconcile_interval_s", 300)),
+                reconcile_batch=int(p.get("reconcile_batch", 20)),
+            )
+            if stream_mode:
+                perp_connectors.append(HyperliquidStreamConnector(
+                    ws_url=env(p.get("ws_url_env", ""), DEFAULT_WS_URL),
+                    rest=rest,
+                    max_users_per_conn=int(p.get("max_users_per_conn", 10)),
+                ))
+            else:
+                perp_connectors.append(rest)
+
+    # === Writer DB tunggal (group commit) untuk main loop + worker spot ===
+    storage_cfg = config.get("storage") or {}
+    writer = DBWriter(
+        threaded=bool(storage_cfg.get("writer_thread", True)),
+        max_batch=int(storage_cfg.get("group_commit_max_jobs", 64)),
+        max_delay_ms=float(storage_cfg.get("group_commit_ms", 2)),
+        queue_size=int(storage_cfg.get("queue_size", 1000)),
+    )
+
+    # === Init spot ingestion (EVM, opsional): 1 worker thread per chain ===
+    spot_cfg = config.get("spot_ingestion") or {}
+    spot_pool = SpotWorkerPool(
+        build_spot_ingestors(config),
+        writer,
+        queue_size=int(spot_cfg.get("queue_size", 64)),
+        poll_interval=float(spot_cfg.get("poll_interval_s", 5)),
+        max_backoff=float(spot_cfg.get("max_backoff_s", 60)),
+    )
+    max_spot_events = int(spot_cfg.get("max_events_per_cycle", 50_000))
 
-    if not perp_connectors:
+    # === Archive event mentah (Parquet per hari + platform), thread sendiri ===
+    archive_cfg = config.get("archive") or {}
+    archiver = None
+    if archive_cfg.get("enabled", True):
+        archiver = EventArchiver(
+            root=archive_cfg.get("path", "data/archive"),
+            compression=archive_cfg.get("compression", "zstd"),
+            flush_rows=int(archive_cfg.get("flush_rows", 50_000)),
+            flush_interval_s=float(archive_cfg.get("flush_interval_s", 300)),
+            queue_size=int(archive_cfg.get("queue_size", 256)),
+        )
+        # buffer yang belum ditulis ikut di-flush saat proses berhenti
+        atexit.register(archiver.stop)
+
+    # === Statistik rolling 30 hari per wallet (winrate / PnL / drawdown / leverage) ===
+    stats_cfg = config.get("wallet_stats") or {}
+    wallet_stats = WalletStatsBook(
+        window_s=int(float(stats_cfg.get("window_days", 30)) * 86400),
+        bucket_s=int(float(stats_cfg.get("bucket_hours", 6)) * 3600),
+        leverage_half_life_s=float(stats_cfg.get("leverage_half_life_days", 7)) * 86400,
+    )
+    stats_flush_interval = float(stats_cfg.get("flush_interval_s", 300))
+    if stats_cfg.get("rebuild_from_archive", True):
+        wallet_stats.rebuild_from_archive(archive_cfg.get("path", "data/archive"))
+    last_stats_flush = 0
+
+    if not perp_connectors and not len(spot_pool):
         logger.error("No perp connectors configured. Check config.yaml")
         return
 
-    last_ts_perp = {pc.platform_name: int(time.time()) - 120 for pc in perp_connectors}
+    # === Load cursor fill per wallet dari DB (resume persis setelah restart) ===
+    db0 = ReadSessionLocal()
+    for pc in perp_connectors:
+        if hasattr(pc, "load_cursors"):
+            pc.load_cursors(load_perp_cursors(db0, pc.platform_name))
+    # === Buku posisi perp dari PerpPosition OPEN ===
+    for book in position_books:
+        book.load(db0)
+    db0.close()
+
+    # === Seen-set fill (exactly-once: 1 fill → maksimal 1 signal) ===
+    seen_fills = SeenFillFilter()
+    db0 = ReadSessionLocal()
+    seen_fills.warm(db0)
+    db0.close()
+
+    # wallet tanpa cursor (baru ditemukan) mulai dari now - lookback
+    perp_lookback_s = 120
     last_discovery_ts = int(time.time()) - 3600  # supaya loop pertama langsung discovery
 
+    # === Registry wallet in-memory (sekali load, selanjutnya delta) ===
+    registry = WalletRegistry()
+    db0 = ReadSessionLocal()
+    registry.load(db0)
+    db0.close()
+
+    def push_wallet_diff():
+        changed, removed = registry.pop_diff()
+        if not changed and not removed:
+            return
+        for pc in perp_connectors:
+            if hasattr(pc, "apply_wallet_diff"):
+                pc.apply_wallet_diff(changed, removed)
+            elif hasattr(pc, "set_tracked_wallets"):
+                pc.set_tracked_wallets(registry.addresses())
+        spot_pool.apply_wallet_diff(changed, removed)
+
+    def rollback_cycle(events, dirty_positions):
+        """
+        Job persist cycle tidak ter-commit → state in-memory kembali ke commit
+        terakhir: cursor fill di-rewind (fill diambil ulang cycle berikutnya),
+        source_id dilepas dari seen-set, state posisi dikembalikan ke commit
+        terakhir (fill yang diambil ulang tidak diterapkan 2x) dan ditandai dirty
+        lagi, registry (skor / tier yang sudah diterapkan) di-load ulang dari DB.
+        """
+        for pc in perp_connectors:
+            if hasattr(pc, "rewind_cursors"):
+                rewound = pc.rewind_cursors()
+                if rewound:
+                    logger.warning(f"[Persist] {pc.platform_name}: rewound {len(rewound)} fill cursors")
+        seen_fills.forget(events)
+        for book, dirty in dirty_positions:
+            book.restore_dirty(dirty)
+        for book in position_books:
+            rewound = book.rewind()
+            if rewound:
+                logger.warning(f"[Persist] {book.platform}: rewound {rewound} positions")
+        db_reload = ReadSessionLocal()
+        try:
+            registry.load(db_reload)
+        finally:
+            db_reload.close()
+
+    # event spot (+ watermark signal per chain) yang belum ter-commit bersama signal-nya:
+    # replay dari SpotTrade saat startup, atau hasil drain yang job persist-nya gagal
+    db0 = ReadSessionLocal()
+    carry_spot_events, carry_spot_marks = spot_pool.unsignalled(db0)
+    db0.close()
+
+    # worker spot butuh tracked wallet sebelum step pertama
+    push_wallet_diff()
+    spot_pool.start()
+
     logger.info("Starting main loop (Hyperliquid perp-only + leaderboard smart money)...")
 
     while True:
-        db = SessionLocal()
+        db = ReadSessionLocal()
         try:
-            all_spot_events = []  # kosong (spot nonaktif)
+            all_spot_events = []  # kosong kalau evm_chains tidak diisi
             all_perp_events = []
+            dirty_positions = []
+            # True sejak cursor in-memory maju sampai job persist ter-commit
+            cycle_open = False
 
             now_ts = int(time.time())
 
             # === Leaderboard refresh tiap 15 menit ===
             if now_ts - last_discovery_ts > 900:
                 logger.info("[Discovery] Updating leaderboard wallets...")
-                refresh_leaderboard_wallets(db)
+                # HTTP di main loop, tulis (hanya wallet baru / berubah) lewat writer
+                lb_stats = fetch_leaderboard_stats()
+                if lb_stats:
+                    log_upsert_counts(writer.call(lambda s: upsert_leaderboard_wallets(s, lb_stats)))
+                    registry.apply_stats(lb_stats)
                 last_discovery_ts = now_ts
 
-            # === Ambil semua wallet di DB sebagai tracked list ===
-            wallets_in_db = [w.address for w in db.query(Wallet).all()]
-            for pc in perp_connectors:
-                if hasattr(pc, "set_tracked_wallets"):
-                    pc.set_tracked_wallets(wallets_in_db)
+            # === Wallet baru / tier berubah → connector (diff, bukan daftar penuh) ===
+            push_wallet_diff()
 
-            # === Fetch perp events ===
+            # === Fetch perp events (cursor in-memory maju, di-persist bersama signal) ===
+            cycle_open = True
             for pc in perp_connectors:
-                ev = pc.fetch_new_events(last_ts_perp[pc.platform_name])
+                ev = pc.fetch_new_events(now_ts - perp_lookback_s)
                 all_perp_events.extend(ev)
-                last_ts_perp[pc.platform_name] = now_ts
-
-            # === Recompute skor & tier (rank-based) untuk SEMUA wallet ===
-            wallets = db.query(Wallet).all()
-            for w in wallets:
-                w.smart_score = compute_smart_score_from_wallet(w)
-
-            assign_tiers_by_rank(
-                wallets,
-                min_score=min_wallet_score,
-                frac_s=0.10,   # top 10% → S
-                frac_a=0.30,   # berikutnya 20% → A
-                frac_b=0.60,   # berikutnya 30% → B
-            )
 
-            db.commit()
+            # === Event spot dari worker per chain (SpotTrade + cursor block sudah di-commit worker;
+            # watermark signal ditulis di job persist bersama signal-nya) ===
+            drained, spot_marks = spot_pool.drain(max_spot_events)
+            all_spot_events = carry_spot_events + drained
+            spot_marks = {**carry_spot_marks, **spot_marks}
+            carry_spot_events, carry_spot_marks = all_spot_events, spot_marks
 
-            # === Generate signals dari perp saja ===
-            new_signals = create_signals_from_events(
-                db,
-                all_spot_events,
-                all_perp_events,
-                min_spot_size_usd=min_spot_size_usd,
-                min_perp_size_usd=min_perp_size_usd,
-            )
+            # dedup fill/swap di path baca, sebelum job tulis (job harus bisa diulang)
+            all_spot_events, all_perp_events = seen_fills.filter_new(db, all_spot_events, all_perp_events)
+            db.close()
 
-            # === Signals → Alerts (dengan setup entry/SL/TP) ===
-            alerts = process_signals_into_alerts(
-                db,
-                new_signals,
-                risk_per_trade_default=risk_default,
+            # === Cursor fill & posisi ikut 1 transaksi dengan signal dari fill yang sama ===
+            dirty_cursors = [
+                (pc, pc.pop_dirty_cursors())
+                for pc in perp_connectors if hasattr(pc, "pop_dirty_cursors")
+            ]
+            dirty_positions = [(book, book.take_dirty()) for book in position_books]
+            new_wallets = registry.unknown(
+                (e.get("wallet_address") or "").lower() for e in (*all_spot_events, *all_perp_events)
             )
 
+            # === Skor & tier (rank-based) hanya kalau stats wallet berubah ===
+            # diterapkan ke registry dulu supaya signal cycle ini memakai tier baru;
+            # kalau job gagal, registry di-load ulang dari DB
+            score_changes = {}
+            if registry.needs_rescore:
+                score_changes = registry.plan_rescore(
+                    min_score=min_wallet_score,
+                    frac_s=0.10,   # top 10% → S
+                    frac_a=0.30,   # berikutnya 20% → A
+                    frac_b=0.60,   # berikutnya 30% → B
+                )
+                registry.apply_scores(score_changes)
+                if score_changes:
+                    logger.info(f"[Registry] Rescored: {len(score_changes)}/{len(registry)} wallets changed")
+
+            # kolom 30d hanya wallet yang nilainya berubah, tiap stats_flush_interval
+            stats_rows = []
+            flush_stats = now_ts - last_stats_flush >= stats_flush_interval
+            if flush_stats:
+                stats_rows = wallet_stats.snapshot(now_ts, known=registry)
+
+            def persist_cycle(s: Session):
+                WalletRegistry.write_scores(s, score_changes)
+                WalletStatsBook.write_rows(s, stats_rows)
+
+                for pc, cursors in dirty_cursors:
+                    save_perp_cursors(s, pc.platform_name, cursors)
+                save_spot_signal_cursors(s, spot_marks)
+                for book, dirty in dirty_positions:
+                    book.flush(s, dirty)
+
+                # === Generate signals ===
+                new_signals = create_signals_from_events(
+                    s,
+                    all_spot_events,
+                    all_perp_events,
+                    min_spot_size_usd=min_spot_size_usd,
+                    min_perp_size_usd=min_perp_size_usd,
+                    min_liquidity_usd=min_liquidity_usd,
+                    registry=registry,
+                )
+
+                # === Signals → Alerts (dengan setup entry/SL/TP) ===
+                alerts = process_signals_into_alerts(
+                    s,
+                    new_signals,
+                    risk_per_trade_default=risk_default,
+                    positions=position_books[0] if position_books else None,
+                )
+                return len(new_signals), alerts
+
+            # === 1 job writer (1 commit): skor + cursor + posisi + signal + alert ===
+            t_write = time.perf_counter()
+            n_signals, alerts = writer.call(persist_cycle)
+            cycle_open = False
+            carry_spot_events, carry_spot_marks = [], {}
+            for pc, cursors in dirty_cursors:
+                if hasattr(pc, "mark_cursors_persisted"):
+                    pc.mark_cursors_persisted(cursors)
+            for book in position_books:
+                book.mark_persisted()
+            # wallet yang baru dibuat di job (signal dari wallet belum dikenal)
+            registry.add(new_wallets)
+
+            # semua event (belum difilter size / skor) → archive, non-blocking;
+            # setelah commit supaya event yang akan diproses ulang tidak tercatat 2x
+            if archiver is not None:
+                archiver.submit("perp", all_perp_events)
+                archiver.submit("spot", all_spot_events)
+            wallet_stats.add_events(all_perp_events)
+            if flush_stats:
+                wallet_stats.mark_written(stats_rows)
+                last_stats_flush = now_ts
+            if n_signals:
+                logger.info(
+                    f"[Persist] {n_signals} signals, {len(alerts)} alerts: "
+                    f"write {(time.perf_counter() - t_write) * 1000:.0f} ms (queue + build + commit)"
+                )
+
             # === Kirim Telegram ===
             if tele:
                 for a in alerts:
                     tele.send_alert(a)
 
-            db.close()
-
         except Exception as e:
             logger.exception(f"Error in main loop: {e}")
+            if cycle_open:
+                rollback_cycle((*all_spot_events, *all_perp_events), dirty_positions)
+        finally:
             db.close()
 
         time.sleep(5)
@@ -1,11 +1,34 @@
 # smartmoney/engine/signals.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 import datetime as dt
 from loguru import logger
 
+from ..db import bulk_insert_returning
 from ..models import Signal, Wallet
+from ..registry import WalletRegistry
 from .events import group_events_by_wallet_and_asset
+from .dedup import SeenFillFilter
+
+# batas parameter IN (...) per query
+_IN_CHUNK = 500
+
+
+def _load_wallets(db: Session, addrs: List[str]) -> Dict[str, Wallet]:
+    """
+    Wallet untuk semua address sekaligus; yang belum ada dibuat dan di-flush
+    (default kolom skor/tier terisi), tanpa commit.
+    """
+    found: Dict[str, Wallet] = {}
+    for i in range(0, len(addrs), _IN_CHUNK):
+        for w in db.query(Wallet).filter(Wallet.address.in_(addrs[i:i + _IN_CHUNK])):
+            found[w.address] = w
+    new = [Wallet(address=a) for a in addrs if a not in found]
+    if new:
+        db.add_all(new)
+        db.flush()
+        found.update((w.address, w) for w in new)
+    return found
 
 
 def _safe_timestamp_to_dt(ts: int) -> dt.datetime:
@@ -28,6 +51,9 @@ def create_signals_from_events(
     perp_events: List[Dict[str, Any]],
     min_spot_size_usd: float,
     min_perp_size_usd: float,
+    seen: Optional[SeenFillFilter] = None,
+    min_liquidity_usd: float = 0.0,
+    registry: Optional[WalletRegistry] = None,
 ) -> List[Signal]:
     """
     - SPOT: masih didukung tapi bukan fokus utama (boleh saja dibiarkan kosong).
@@ -35,46 +61,61 @@ def create_signals_from_events(
       dengan syarat:
         - size_usd >= min_perp_size_usd
         - event_type in ("OPEN", "INCREASE")
+    - seen: kalau diisi, event dengan source_id yang sudah pernah diproses
+      dibuang dulu sebelum jadi objek ORM
+    - min_liquidity_usd: SPOT di pool dengan liquidity_usd di bawah ini di-skip
+    - registry: kalau diisi, tier/skor wallet diambil dari registry (O(1));
+      hanya wallet yang belum dikenal yang dibaca / dibuat di DB
+    Signal di-insert bulk (INSERT .. RETURNING, id langsung terisi), wallet baru
+    lewat 1 flush; TIDAK di-commit — caller commit sekali per cycle bersama alert.
     """
 
+    if seen is not None:
+        spot_events, perp_events = seen.filter_new(db, spot_events, perp_events)
+
     contexts = group_events_by_wallet_and_asset(spot_events, perp_events)
-    created_signals: List[Signal] = []
+    rows: List[Dict[str, Any]] = []
+    addrs = sorted({(w or "").lower() for (w, _) in contexts} - {""})
+    if registry is not None:
+        wallets = {a: registry.get(a) for a in addrs if a in registry}
+        wallets.update(_load_wallets(db, [a for a in addrs if a not in wallets]))
+    else:
+        wallets = _load_wallets(db, addrs)
 
     for (wallet_address, token_symbol), ctx in contexts.items():
         wal_addr_lc = (wallet_address or "").lower()
         if not wal_addr_lc:
             continue
 
-        wallet: Wallet = db.query(Wallet).get(wal_addr_lc)
-        if not wallet:
-            wallet = Wallet(address=wal_addr_lc)
-            db.add(wallet)
-            db.commit()
+        wallet = wallets[wal_addr_lc]  # Wallet atau WalletEntry (smart_score, tier)
 
         # === SPOT signals (opsional, tetap ada tapi jarang dipakai) ===
         for e in ctx["spot"]:
             try:
                 if e["amount_usd"] < min_spot_size_usd:
                     continue
+                if e.get("liquidity_usd", 0.0) < min_liquidity_usd:
+                    continue
 
                 created_at = _safe_timestamp_to_dt(int(e["timestamp"]))
                 signal_type = "SPOT_BUY" if e["side"] == "BUY" else "SPOT_SELL"
 
-                sig = Signal(
+                rows.append(dict(
                     signal_type=signal_type,
                     wallet_address=wal_addr_lc,
                     wallet_score=wallet.smart_score,
                     wallet_tier=wallet.tier,
                     chain_id_spot=e["chain_id"],
+                    perp_platform=None,
+                    pair_perp=None,
                     token_symbol=token_symbol,
                     token_address=e["token_address"],
                     price=e["price"],
                     size_usd=e["amount_usd"],
                     liquidity_usd=e["liquidity_usd"],
                     created_at=created_at,
-                )
-                db.add(sig)
-                created_signals.append(sig)
+                    source_id=e.get("source_id"),
+                ))
             except Exception as ex:
                 logger.error(f"[Signals] Error creating spot signal: {ex}")
 
@@ -100,23 +141,26 @@ def create_signals_from_events(
                 else:
                     signal_type = "PERP_OPEN_SHORT"
 
-                sig = Signal(
+                rows.append(dict(
                     signal_type=signal_type,
                     wallet_address=wal_addr_lc,
                     wallet_score=wallet.smart_score,
                     wallet_tier=wallet.tier,
+                    chain_id_spot=None,
                     perp_platform=e["platform"],
                     pair_perp=e["pair"],
                     token_symbol=token_symbol,
+                    token_address=None,
                     price=e["entry_price"],
                     size_usd=e["size_usd"],
+                    liquidity_usd=None,
                     created_at=created_at,
-                )
-                db.add(sig)
-                created_signals.append(sig)
+                    source_id=e.get("source_id"),
+                ))
             except Exception as ex:
                 logger.error(f"[Signals] Error creating perp signal: {ex}")
 
-    db.commit()
+    # key dict spot & perp sama → 1 INSERT multi-row per batch
+    created_signals: List[Signal] = bulk_insert_returning(db, Signal, rows, key=("source_id",))
     logger.info(f"Created {len(created_signals)} signals")
     return created_signals
@@ -0,0 +1,273 @@
+# smartmoney/engine/spot_ingest.py
+from typing import Any, Dict, List, Optional
+import calendar
+import datetime as dt
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from ..connectors.base_spot import BaseSpotConnector
+from ..models import SpotBlockCursor, SpotTrade
+
+# batas parameter IN (...) per query
+_DB_CHUNK = 500
+
+
+class SpotIngestor:
+    """
+    Cursor block per chain untuk ingestion spot, reorg-aware:
+    - hanya ingest sampai head - confirmations; range berikut selalu mulai
+      dari last_block + 1 (steady state tidak pernah menyentuh block yang sama 2x)
+    - ring hash block terbaru (tip tiap range + block yang berisi swap) disimpan
+      bersama cursor di DB
+    - tiap step cek hash tip ring (1 call); block ter-hash-link, jadi tip sama →
+      tidak ada reorg di bawahnya. Beda → cari fork point dari ring, tandai
+      SpotTrade di block setelahnya orphaned, mundurkan cursor, ingest ulang
+    - hash block swap dicek lagi setelah fetch; kalau reorg terjadi di tengah
+      fetch, range dibuang dan diulang di step berikutnya
+    Dipisah jadi plan() (RPC saja) → apply(db) (DB saja, bisa diulang oleh
+    DBWriter) → advance() (state in-memory, setelah commit). step(db) = ketiganya.
+    """
+
+    def __init__(
+        self,
+        connector: BaseSpotConnector,
+        confirmations: int = 12,
+        max_range_blocks: int = 2000,
+        ring_size: int = 128,
+        start_lookback_blocks: int = 0,
+    ):
+        self.connector = connector
+        self.chain_id = connector.chain_id
+        self.confirmations = max(0, int(confirmations))
+        self.max_range_blocks = max(1, int(max_range_blocks))
+        self.ring_size = max(1, int(ring_size))
+        self.start_lookback_blocks = max(0, int(start_lookback_blocks))
+
+        self.last_block: Optional[int] = None
+        # block confirmed yang belum di-ingest (diisi tiap step; None = belum pernah step)
+        self.lag_blocks: Optional[int] = None
+        self._ring: Dict[int, str] = {}
+        self.loaded = False
+
+    def load(self, db: Session) -> None:
+        row = db.query(SpotBlockCursor).get(self.chain_id)
+        if row is not None:
+            self.last_block = int(row.last_block or 0)
+            self._ring = {int(k): v for k, v in (row.recent_hashes or {}).items()}
+            logger.info(f"[SpotIngest {self.chain_id}] Resume from block {self.last_block}")
+        self.loaded = True
+
+    def _save(self, db: Session, last_block: int, ring: Dict[int, str]) -> None:
+        row = db.query(SpotBlockCursor).get(self.chain_id)
+        if row is None:
+            row = SpotBlockCursor(chain_id=self.chain_id)
+            db.add(row)
+        row.last_block = last_block
+        row.recent_hashes = {str(k): v for k, v in sorted(ring.items())}
+        row.updated_at = dt.datetime.utcnow()
+
+    def _trim(self, ring: Dict[int, str]) -> Dict[int, str]:
+        if len(ring) > self.ring_size:
+            for bn in sorted(ring)[: len(ring) - self.ring_size]:
+                del ring[bn]
+        return ring
+
+    def _find_fork(self) -> Optional[int]:
+        """
+        Cek reorg lewat RPC saja. Return block terakhir yang masih canonical
+        (cursor harus mundur ke sini), atau None kalau tidak ada reorg.
+        """
+        if not self._ring:
+            return None
+        tip = max(self._ring)
+        if self.connector.get_block_hashes([tip]).get(tip) == self._ring[tip]:
+            return None
+
+        current = self.connector.get_block_hashes(sorted(self._ring))
+        bad = [bn for bn, h in self._ring.items() if current.get(bn) != h]
+        first_bad = min(bad)
+        good_below = [bn for bn, h in self._ring.items() if bn < first_bad and current.get(bn) == h]
+        if good_below:
+            base = max(good_below)
+        else:
+            base = min(self._ring) - 1
+            logger.warning(
+                f"[SpotIngest {self.chain_id}] Reorg deeper than hash ring, rolling back to {base}"
+            )
+        logger.warning(
+            f"[SpotIngest {self.chain_id}] Reorg detected at block {first_bad}: "
+            f"rollback {self.last_block} → {base}"
+        )
+        # cache per block connector (timestamp, reserve) tidak boleh dipakai lagi
+        self.connector.forget_blocks(range(base + 1, (self.last_block or base) + 1))
+        return base
+
+    def _persist_trades(self, db: Session, events: List[Dict[str, Any]]) -> None:
+        """Insert SpotTrade; baris yang sama (chain, tx, log_index) dari block orphan di-update."""
+        if not events:
+            return
+        tx_hashes = sorted({e["tx_hash"] for e in events})
+        existing = {}
+        for i in range(0, len(tx_hashes), _DB_CHUNK):
+            for r in db.query(SpotTrade).filter(
+                SpotTrade.chain_id == self.chain_id,
+                SpotTrade.tx_hash.in_(tx_hashes[i:i + _DB_CHUNK]),
+            ):
+                existing[(r.tx_hash, r.log_index)] = r
+
+        for e in events:
+            row = existing.get((e["tx_hash"], e["log_index"]))
+            if row is None:
+                row = SpotTrade(chain_id=self.chain_id, tx_hash=e["tx_hash"], log_index=e["log_index"])
+                db.add(row)
+                existing[(e["tx_hash"], e["log_index"])] = row
+            row.wallet_address = e["wallet_address"].lower()
+            row.dex = e["dex"]
+            row.block_number = e["block_number"]
+            row.block_hash = e["block_hash"]
+            row.orphaned = False
+            row.timestamp = dt.datetime.utcfromtimestamp(int(e["timestamp"]))
+            row.token_address = e["token_address"]
+            row.token_symbol = e["token_symbol"]
+            row.side = e["side"]
+            row.amount_usd = e["amount_usd"]
+            row.price = e["price"]
+            row.liquidity_usd = e["liquidity_usd"]
+
+    def plan(self) -> Optional[Dict[str, Any]]:
+        """
+        Fase RPC (tanpa DB, tanpa mengubah state): cek reorg, ambil range block
+        confirmed berikutnya, verifikasi hash block swap. Return rencana tulis
+        untuk apply(), atau None kalau tidak ada yang perlu ditulis.
+        Error RPC dilempar; state tidak berubah.
+        """
+        if not self.loaded:
+            raise RuntimeError("SpotIngestor.load() must be called before plan()")
+
+        head = self.connector.get_latest_block()
+        safe = head - self.confirmations
+        last = self.last_block
+        if last is None:
+            last = max(0, safe - self.start_lookback_blocks)
+            logger.info(f"[SpotIngest {self.chain_id}] No cursor, starting after block {last}")
+
+        rollback_to = self._find_fork()
+        ring = dict(self._ring)
+        if rollback_to is not None:
+            ring = {bn: h for bn, h in ring.items() if bn <= rollback_to}
+            last = rollback_to
+
+        plan = {
+            "rollback_to": rollback_to, "last_block": last, "ring": ring,
+            "events": [], "lag": max(0, safe - last),
+        }
+        if last >= safe:
+            if rollback_to is None and self.last_block is not None:
+                self.lag_blocks = 0
+                return None
+            return plan
+
+        lo = last + 1
+        hi = min(safe, lo + self.max_range_blocks - 1)
+        events = self.connector.fetch_new_events(lo, hi)
+
+        # verifikasi hash block swap + tip range terhadap chain saat ini
+        check = sorted({int(e["block_number"]) for e in events} | {hi})
+        hashes = self.connector.get_block_hashes(check)
+        stale = [e for e in events if hashes.get(int(e["block_number"])) != e["block_hash"]]
+        if stale or hi not in hashes:
+            self.connector.forget_blocks(range(lo, hi + 1))
+            logger.warning(
+                f"[SpotIngest {self.chain_id}] Blocks {lo}–{hi} changed during fetch "
+                f"({len(stale)} stale swaps), retrying next cycle"
+            )
+            # rollback (kalau ada) tetap ditulis, range diulang
+            return plan if rollback_to is not None else None
+
+        ring.update(hashes)
+        plan.update(
+            last_block=hi, ring=self._trim(ring), events=events, lag=safe - hi,
+            lo=lo, head=head,
+        )
+        return plan
+
+    def apply(self, db: Session, plan: Dict[str, Any]) -> None:
+        """
+        Fase DB (tanpa RPC, tidak mengubah state in-memory → aman diulang):
+        orphan SpotTrade setelah fork, upsert SpotTrade, tulis cursor. Commit oleh caller.
+        """
+        if plan["rollback_to"] is not None:
+            orphaned = db.query(SpotTrade).filter(
+                SpotTrade.chain_id == self.chain_id,
+                SpotTrade.block_number > plan["rollback_to"],
+                SpotTrade.orphaned.is_(False),
+            ).update({SpotTrade.orphaned: True}, synchronize_session=False)
+            logger.warning(f"[SpotIngest {self.chain_id}] {orphaned} trades orphaned")
+        self._persist_trades(db, plan["events"])
+        self._save(db, plan["last_block"], plan["ring"])
+
+    def advance(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Terapkan rencana ke state in-memory, SETELAH apply() ter-commit."""
+        self.last_block = plan["last_block"]
+        self._ring = plan["ring"]
+        self.lag_blocks = plan["lag"]
+        events = plan["events"]
+        if "lo" in plan:
+            logger.info(
+                f"[SpotIngest {self.chain_id}] Ingested {plan['lo']}–{plan['last_block']} "
+                f"(head {plan['head']}, lag {plan['lag']}): {len(events)} swaps"
+            )
+        return events
+
+    def unsignalled_events(self, db: Session, after_block: int) -> List[Dict[str, Any]]:
+        """
+        SpotTrade yang sudah ter-commit (block > after_block, tidak orphaned)
+        sebagai event spot, urut block + log_index. Dipakai saat startup untuk
+        swap yang sempat ter-commit worker tapi belum sampai tahap signal
+        (dedup source_id membuang yang ternyata sudah jadi signal).
+        """
+        rows = (
+            db.query(SpotTrade)
+            .filter(
+                SpotTrade.chain_id == self.chain_id,
+                SpotTrade.block_number > after_block,
+                SpotTrade.orphaned.is_(False),
+            )
+            .order_by(SpotTrade.block_number, SpotTrade.log_index)
+            .all()
+        )
+        return [
+            {
+                "wallet_address": r.wallet_address,
+                "chain_id": self.chain_id,
+                "dex": r.dex,
+                "tx_hash": r.tx_hash,
+                "log_index": r.log_index,
+                "block_number": r.block_number,
+                "block_hash": r.block_hash,
+                "timestamp": calendar.timegm(r.timestamp.utctimetuple()),
+                "token_address": r.token_address,
+                "token_symbol": r.token_symbol,
+                "side": r.side,
+                "amount_usd": r.amount_usd,
+                "price": r.price,
+                "liquidity_usd": r.liquidity_usd,
+                "source_id": f"{self.chain_id}:{r.tx_hash}:{r.log_index}",
+            }
+            for r in rows
+        ]
+
+    def step(self, db: Session) -> List[Dict[str, Any]]:
+        """
+        plan + apply + advance dalam 1 panggilan (session dipakai untuk load & tulis).
+        Return event spot baru (kosong kalau sudah caught-up / range diulang).
+        State in-memory maju di sini, jadi caller harus commit session ini.
+        """
+        if not self.loaded:
+            self.load(db)
+        plan = self.plan()
+        if plan is None:
+            return []
+        self.apply(db, plan)
+        return self.advance(plan)
@@ -0,0 +1,211 @@
+# smartmoney/engine/spot_workers.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import queue
+import random
+import threading
+import time
+
+from loguru import logger
+
+from sqlalchemy.orm import Session
+
+from ..cursors import load_spot_signal_cursors, save_spot_signal_cursors
+from ..db import ReadSessionLocal
+from ..db_writer import DBWriter
+from ..models import SpotBlockCursor
+from .spot_ingest import SpotIngestor
+
+# item queue: (chain_id, last_block range, event range itu); last_block = watermark signal setelah diproses
+SpotBatch = Tuple[str, int, List[Dict[str, Any]]]
+
+
+class SpotChainWorker:
+    """
+    1 thread ingestion per chain: SpotIngestor sendiri (cursor + connector/RPC
+    sendiri). Fase RPC (plan) jalan di thread ini tanpa koneksi DB; tulisan
+    (SpotTrade + cursor) dikirim ke DBWriter sebagai 1 job dan di-group-commit
+    bersama chain lain.
+    - event baru masuk queue SETELAH tulisan ter-commit, bersama last_block
+      range-nya; main loop menulis last_block itu sebagai watermark signal
+      (SpotSignalCursor) di transaksi yang sama dengan signal-nya
+    - queue penuh → worker menunggu (backpressure), cursor tidak lari jauh
+      di depan signal stage
+    - masih catch-up → langsung step berikut; sudah di head → tidur poll_interval
+    - error → backoff exponential + jitter, chain lain tidak terpengaruh
+    """
+
+    def __init__(
+        self,
+        ingestor: SpotIngestor,
+        out: "queue.Queue",
+        writer: DBWriter,
+        poll_interval: float = 5.0,
+        max_backoff: float = 60.0,
+        read_session_factory=ReadSessionLocal,
+    ):
+        self.ingestor = ingestor
+        self.chain_id = ingestor.chain_id
+        self.out = out
+        self.poll_interval = float(poll_interval)
+        self.max_backoff = float(max_backoff)
+        self.writer = writer
+        self.read_session_factory = read_session_factory
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"spot-{self.chain_id}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _step(self) -> Optional[SpotBatch]:
+        """Return batch untuk queue, atau None kalau tidak ada yang perlu di-signal."""
+        if not self.ingestor.loaded:
+            db = self.read_session_factory()
+            try:
+                self.ingestor.load(db)
+            finally:
+                db.close()
+        plan = self.ingestor.plan()
+        if plan is None:
+            return None
+        self.writer.call(lambda db: self.ingestor.apply(db, plan))
+        events = self.ingestor.advance(plan)
+        # rollback reorg tanpa event tetap dikirim: watermark signal ikut mundur
+        if not events and plan["rollback_to"] is None:
+            return None
+        return self.chain_id, plan["last_block"], events
+
+    def _put(self, batch: SpotBatch) -> None:
+        while not self._stop.is_set():
+            try:
+                self.out.put(batch, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self) -> None:
+        backoff = 1.0
+        logger.info(f"[SpotWorker {self.chain_id}] Started")
+        while not self._stop.is_set():
+            try:
+                t0 = time.monotonic()
+                batch = self._step()
+                took = time.monotonic() - t0
+                backoff = 1.0
+            except Exception as e:
+                logger.error(f"[SpotWorker {self.chain_id}] Step failed, retry in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff * random.uniform(0.5, 1.5))
+                backoff = min(self.max_backoff, backoff * 2)
+                continue
+
+            if batch is not None:
+                self._put(batch)
+                logger.debug(
+                    f"[SpotWorker {self.chain_id}] {len(batch[2])} events queued "
+                    f"(step {took:.2f}s, queue {self.out.qsize()}/{self.out.maxsize})"
+                )
+            lag = self.ingestor.lag_blocks
+            if lag is not None and lag > 0:
+                continue  # masih catch-up
+            self._stop.wait(self.poll_interval)
+        logger.info(f"[SpotWorker {self.chain_id}] Stopped")
+
+
+class SpotWorkerPool:
+    """
+    Kumpulan SpotChainWorker (1 per chain di evm_chains) yang menulis ke 1 queue
+    bounded. Main loop cukup drain() tiap cycle; chain yang RPC-nya lambat tidak
+    memperpanjang cycle chain lain.
+    """
+
+    def __init__(
+        self,
+        ingestors: List[SpotIngestor],
+        writer: DBWriter,
+        queue_size: int = 64,
+        poll_interval: float = 5.0,
+        max_backoff: float = 60.0,
+    ):
+        # item queue = batch event 1 step (bukan per event)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.writer = writer
+        self.workers = [
+            SpotChainWorker(si, self.queue, writer, poll_interval=poll_interval, max_backoff=max_backoff)
+            for si in ingestors
+        ]
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def set_tracked_wallets(self, wallets: List[str]) -> None:
+        for w in self.workers:
+            w.ingestor.connector.set_tracked_wallets(wallets)
+
+    def apply_wallet_diff(self, changed: Dict[str, str], removed: Iterable[str]) -> None:
+        removed = list(removed)
+        for w in self.workers:
+            w.ingestor.connector.apply_wallet_diff(changed, removed)
+
+    def start(self) -> None:
+        for w in self.workers:
+            w.start()
+
+    def stop(self) -> None:
+        for w in self.workers:
+            w.stop()
+
+    def drain(self, max_events: int = 50_000) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Ambil semua batch yang sudah ada di queue (non-blocking).
+        Return (event, watermark signal per chain = last_block batch terakhir).
+        """
+        out: List[Dict[str, Any]] = []
+        marks: Dict[str, int] = {}
+        while len(out) < max_events:
+            try:
+                chain_id, last_block, events = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            out.extend(events)
+            marks[chain_id] = last_block
+        return out, marks
+
+    def unsignalled(self, db: Session) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Dipanggil sebelum start(): swap yang sudah ter-commit worker tapi
+        belum lewat tahap signal (crash / restart / job persist gagal), yaitu
+        SpotTrade di atas watermark signal sampai cursor block chain.
+        Return (event, watermark) dengan bentuk sama seperti drain().
+        Chain tanpa watermark (pertama kali) mulai dari cursor block-nya,
+        ditulis langsung, tanpa replay histori.
+        """
+        signalled = load_spot_signal_cursors(db)
+        events: List[Dict[str, Any]] = []
+        marks: Dict[str, int] = {}
+        fresh: Dict[str, int] = {}
+        for w in self.workers:
+            row = db.query(SpotBlockCursor).get(w.chain_id)
+            if row is None:
+                continue
+            last_block = int(row.last_block or 0)
+            after = signalled.get(w.chain_id)
+            if after is None:
+                fresh[w.chain_id] = last_block
+            elif after != last_block:
+                events.extend(w.ingestor.unsignalled_events(db, after))
+                marks[w.chain_id] = last_block
+        if fresh:
+            self.writer.call(lambda s: save_spot_signal_cursors(s, fresh))
+        if events:
+            logger.info(f"[SpotWorkers] Replaying {len(events)} committed swaps not yet signalled")
+        return events, marks
@@ -0,0 +1,275 @@
+# smartmoney/engine/wallet_stats.py
+from collections import deque
+from typing import Any, Collection, Deque, Dict, Iterable, List, Optional, Tuple
+import datetime as dt
+import math
+import time
+
+from loguru import logger
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .. import archive
+from ..models import Wallet
+
+# kolom Wallet yang diisi: (winrate_30d, pnl_30d_usd, max_drawdown_30d, avg_leverage_30d)
+StatsRow = Dict[str, Any]
+
+# batas baris per bulk UPDATE
+_DB_CHUNK = 500
+
+
+class _Bucket:
+    """
+    Agregat realized PnL 1 slot waktu. Prefix = kumulatif PnL sejak awal
+    bucket (0 di awal), dipakai untuk menggabung drawdown antar bucket.
+    """
+
+    __slots__ = ("k", "net", "wins", "losses", "max_prefix", "min_prefix", "max_dd")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.net = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.max_prefix = 0.0
+        self.min_prefix = 0.0
+        self.max_dd = 0.0
+
+
+class _WalletWindow:
+    """State rolling window 1 wallet."""
+
+    __slots__ = ("buckets", "pnl", "wins", "losses", "lev_sum", "lev_weight", "lev_ts")
+
+    def __init__(self):
+        # bucket terurut waktu, hanya slot yang ada fill-nya (ring buffer jarang)
+        self.buckets: Deque[_Bucket] = deque()
+        self.pnl = 0.0
+        self.wins = 0
+        self.losses = 0
+        # EWMA leverage: sum & bobot yang meluruh exp(-dt / tau)
+        self.lev_sum = 0.0
+        self.lev_weight = 0.0
+        self.lev_ts = 0
+
+
+class WalletStatsBook:
+    """
+    Statistik rolling window (default 30 hari) per wallet, di-update streaming
+    dari setiap fill perp (O(1) amortized per fill):
+    - realized PnL & win/loss: ring buffer bucket waktu (bucket_s) per wallet
+      dengan total berjalan; bucket yang keluar window dikurangkan dari total
+    - max drawdown: tiap bucket menyimpan net, prefix max/min & drawdown
+      internalnya (peak-to-trough berjalan); drawdown window = gabungan bucket
+      (O(jumlah bucket), hanya saat snapshot)
+    - leverage: EWMA berbobot waktu (half-life leverage_half_life_s), 1 fill = bobot 1
+    - snapshot() → baris yang berubah sejak tulisan terakhir; write_rows() di
+      job writer; mark_written() setelah commit
+    - rebuild_from_archive() mengisi ulang state dari archive fill (Parquet)
+      saat startup
+    Winrate & drawdown dihitung dari fill yang punya closed_pnl != 0 (close / decrease).
+    max_drawdown_30d dalam USD (penurunan terbesar kurva realized PnL kumulatif).
+    """
+
+    def __init__(
+        self,
+        window_s: int = 30 * 86400,
+        bucket_s: int = 6 * 3600,
+        leverage_half_life_s: float = 7 * 86400,
+    ):
+        self.bucket_s = max(1, int(bucket_s))
+        self.n_buckets = max(1, int(window_s) // self.bucket_s)
+        self.window_s = self.n_buckets * self.bucket_s
+        self.tau = max(1.0, float(leverage_half_life_s)) / math.log(2)
+        self._wallets: Dict[str, _WalletWindow] = {}
+        # nilai terakhir yang sudah di-commit ke DB per wallet
+        self._written: Dict[str, Tuple[float, float, float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._wallets)
+
+    # === update dari fill ===
+    def add_fill(self, wallet: str, ts: int, closed_pnl: float, leverage: Optional[float]) -> None:
+        st = self._wallets.get(wallet)
+        if st is None:
+            st = self._wallets[wallet] = _WalletWindow()
+
+        if leverage:
+            if ts >= st.lev_ts:
+                decay = math.exp(-(ts - st.lev_ts) / self.tau)
+                st.lev_sum *= decay
+                st.lev_weight *= decay
+                st.lev_ts = ts
+                w = 1.0
+            else:
+                # fill terlambat: bobot sesuai umurnya relatif terhadap fill terbaru
+                w = math.exp(-(st.lev_ts - ts) / self.tau)
+            st.lev_sum += w * float(leverage)
+            st.lev_weight += w
+
+        if not closed_pnl:
+            return
+        k = ts // self.bucket_s
+        b = self._bucket(st, k)
+        if b is None:
+            return
+        p = b.net + closed_pnl
+        b.net = p
+        if p > b.max_prefix:
+            b.max_prefix = p
+        if p < b.min_prefix:
+            b.min_prefix = p
+        dd = b.max_prefix - p
+        if dd > b.max_dd:
+            b.max_dd = dd
+        st.pnl += closed_pnl
+        if closed_pnl > 0:
+            b.wins += 1
+            st.wins += 1
+        else:
+            b.losses += 1
+            st.losses += 1
+
+    def _bucket(self, st: _WalletWindow, k: int) -> Optional[_Bucket]:
+        buckets = st.buckets
+        if buckets and buckets[-1].k == k:
+            return buckets[-1]
+        if not buckets or k > buckets[-1].k:
+            b = _Bucket(k)
+            buckets.append(b)
+            self._expire(st, k)
+            return b
+        # fill terlambat untuk bucket lama (jarang): cari dari belakang
+        if k <= buckets[-1].k - self.n_buckets:
+            return None
+        for i in range(len(buckets) - 1, -1, -1):
+            if buckets[i].k == k:
+                return buckets[i]
+            if buckets[i].k < k:
+                b = _Bucket(k)
+                buckets.insert(i + 1, b)
+                return b
+        b = _Bucket(k)
+        buckets.appendleft(b)
+        return b
+
+    def _expire(self, st: _WalletWindow, k_now: int) -> None:
+        buckets = st.buckets
+        while buckets and buckets[0].k <= k_now - self.n_buckets:
+            b = buckets.popleft()
+            st.pnl -= b.net
+            st.wins -= b.wins
+            st.losses -= b.losses
+
+    def add_events(self, events: Iterable[Any]) -> int:
+        """PerpEvent hasil ingest (setelah dedup). Return jumlah event dipakai."""
+        n = 0
+        for e in events:
+            wallet = (e.get("wallet_address") or "").lower()
+            if not wallet:
+                continue
+            self.add_fill(wallet, int(e.get("timestamp") or 0), float(e.get("closed_pnl") or 0.0), e.get("leverage"))
+            n += 1
+        return n
+
+    # === baca ===
+    def stats(self, wallet: str, now: Optional[int] = None) -> Tuple[float, float, float, float]:
+        """(winrate, pnl, max_drawdown, avg_leverage) window yang berakhir di now."""
+        st = self._wallets.get(wallet)
+        if st is None:
+            return 0.0, 0.0, 0.0, 0.0
+        now = int(time.time()) if now is None else int(now)
+        self._expire(st, now // self.bucket_s)
+
+        closed = st.wins + st.losses
+        winrate = st.wins / closed if closed else 0.0
+
+        cum = peak = max_dd = 0.0
+        for b in st.buckets:
+            max_dd = max(max_dd, b.max_dd, peak - (cum + b.min_prefix))
+            peak = max(peak, cum + b.max_prefix)
+            cum += b.net
+
+        lev = 0.0
+        if st.lev_weight > 0 and now - st.lev_ts < self.window_s:
+            lev = st.lev_sum / st.lev_weight
+        # pnl dari total berjalan bisa menyimpan sisa pembulatan float; 0 kalau window kosong
+        pnl = st.pnl if st.buckets else 0.0
+        return winrate, pnl, max_dd, lev
+
+    # === flush ke tabel wallets ===
+    def snapshot(self, now: Optional[int] = None, known: Optional[Collection[str]] = None) -> List[StatsRow]:
+        """
+        Baris (address + 4 kolom 30d) untuk wallet yang nilainya berubah sejak
+        mark_written() terakhir: wallet dengan fill baru, plus wallet yang
+        bucket-nya keluar window. known: hanya address ini (yang sudah ada di DB).
+        """
+        now = int(time.time()) if now is None else int(now)
+        rows: List[StatsRow] = []
+        for wallet in list(self._wallets):
+            if known is not None and wallet not in known:
+                continue
+            vals = self.stats(wallet, now)
+            if self._written.get(wallet) == vals:
+                continue
+            rows.append({
+                "address": wallet,
+                "winrate_30d": vals[0],
+                "pnl_30d_usd": vals[1],
+                "max_drawdown_30d": vals[2],
+                "avg_leverage_30d": vals[3],
+            })
+        return rows
+
+    @staticmethod
+    def write_rows(db: Session, rows: List[StatsRow]) -> None:
+        """Bulk UPDATE (by primary key) kolom 30d. Commit oleh caller."""
+        for i in range(0, len(rows), _DB_CHUNK):
+            db.execute(update(Wallet), rows[i:i + _DB_CHUNK])
+
+    def mark_written(self, rows: List[StatsRow]) -> None:
+        for r in rows:
+            a = r["address"]
+            vals = (r["winrate_30d"], r["pnl_30d_usd"], r["max_drawdown_30d"], r["avg_leverage_30d"])
+            self._written[a] = vals
+            st = self._wallets.get(a)
+            if st is not None and not st.buckets and vals[3] == 0.0:
+                # window kosong & sudah tertulis 0 → state tidak perlu disimpan lagi
+                del self._wallets[a]
+
+    # === rebuild ===
+    def rebuild_from_archive(self, root: str, now: Optional[int] = None) -> int:
+        """
+        Isi ulang state dari archive fill perp (window terakhir), urut waktu.
+        Return jumlah fill yang dibaca. pyarrow tidak ada / archive kosong → 0.
+        """
+        if not archive.available():
+            logger.info("[WalletStats] pyarrow not installed, skip rebuild from archive")
+            return 0
+        now = int(time.time()) if now is None else int(now)
+        since = now - self.window_s
+        t0 = time.perf_counter()
+        table = archive.read_events(
+            root, "perp",
+            start=dt.datetime.utcfromtimestamp(since).date(),
+            columns=["wallet_address", "timestamp", "closed_pnl", "leverage"],
+        )
+        if not table.num_rows:
+            return 0
+        table = table.sort_by("timestamp")
+        wallets = table.column("wallet_address").to_pylist()
+        tss = table.column("timestamp").to_pylist()
+        pnls = table.column("closed_pnl").to_pylist()
+        levs = table.column("leverage").to_pylist()
+        n = 0
+        for wallet, ts, pnl, lev in zip(wallets, tss, pnls, levs):
+            if not wallet or ts is None or ts < since:
+                continue
+            self.add_fill(wallet.lower(), int(ts), float(pnl or 0.0), lev)
+            n += 1
+        logger.info(
+            f"[WalletStats] Rebuilt {len(self._wallets)} wallets from {n} archived fills "
+            f"in {time.perf_counter() - t0:.1f}s"
+        )
+        return n
@@ -1,7 +1,7 @@
 # smartmoney/models.py
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, Boolean, JSON
+    Column, Integer, BigInteger, String, Float, DateTime, Boolean, JSON, UniqueConstraint, Index
 )
 import datetime as dt
 
@@ -24,11 +24,17 @@ class Wallet(Base):
     # total ROI sepanjang waktu (dalam fraksi, 0.5 = 50%)
     roi_all = Column(Float, default=0.0)
 
-    # --- field lama (boleh dibiarkan, walau belum terisi benar) ---
+    # --- statistik rolling 30 hari dari fill perp (engine/wallet_stats.py) ---
+    # fraksi close/decrease dengan closed PnL > 0
     winrate_30d = Column(Float, default=0.0)
+    # realized PnL (USDC)
     pnl_30d_usd = Column(Float, default=0.0)
+    # penurunan terbesar kurva realized PnL kumulatif (USDC, positif)
     max_drawdown_30d = Column(Float, default=0.0)
+    # EWMA leverage per fill
     avg_leverage_30d = Column(Float, default=0.0)
+
+    # --- field lama (boleh dibiarkan, walau belum terisi benar) ---
     rugpull_ratio_30d = Column(Float, default=0.0)
     avg_trade_size_ratio = Column(Float, default=0.0)
     chains_traded_spot = Column(JSON, default=list)
@@ -37,12 +43,19 @@ class Wallet(Base):
 
 class SpotTrade(Base):
     __tablename__ = "wallet_trades_spot"
+    # 1 tx bisa berisi beberapa Swap → identitas = (chain, tx, log_index)
+    __table_args__ = (UniqueConstraint("chain_id", "tx_hash", "log_index", name="uq_spot_trade_log"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     wallet_address = Column(String, index=True)
     chain_id = Column(String)
     dex = Column(String)
-    tx_hash = Column(String, index=True, unique=True)
+    tx_hash = Column(String, index=True)
+    log_index = Column(Integer, default=0)
+    block_number = Column(BigInteger, index=True)
+    block_hash = Column(String, nullable=True)
+    # True → block-nya ter-reorg (bukan lagi di canonical chain)
+    orphaned = Column(Boolean, default=False)
     timestamp = Column(DateTime, index=True)
     token_address = Column(String)
     token_symbol = Column(String)
@@ -70,12 +83,68 @@ class PerpPosition(Base):
     updated_at = Column(DateTime)
     status = Column(String, default="OPEN")  # OPEN / CLOSED
 
+class PerpFillCursor(Base):
+    __tablename__ = "perp_fill_cursors"
+
+    # posisi terakhir fill yang sudah diproses per wallet (time ms + tid sebagai tie-breaker)
+    wallet_address = Column(String, primary_key=True)
+    platform = Column(String, primary_key=True)
+    last_fill_ms = Column(BigInteger, default=0)
+    last_tid = Column(BigInteger, default=0)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
+class SpotBlockCursor(Base):
+    __tablename__ = "spot_block_cursors"
+
+    # block terakhir yang sudah di-ingest per chain + ring hash block terbaru (deteksi reorg)
+    chain_id = Column(String, primary_key=True)
+    last_block = Column(BigInteger, default=0)
+    recent_hashes = Column(JSON, default=dict)   # {"<block_number>": "<block_hash>"}
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
+class SpotSignalCursor(Base):
+    __tablename__ = "spot_signal_cursors"
+
+    # block terakhir per chain yang swap-nya sudah lewat tahap signal (1 transaksi dengan signal);
+    # SpotTrade di atasnya (sampai spot_block_cursors.last_block) diproses ulang saat startup
+    chain_id = Column(String, primary_key=True)
+    last_block = Column(BigInteger, default=0)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
+class TokenMeta(Base):
+    __tablename__ = "token_meta"
+
+    # metadata ERC20 per chain (address checksum), di-resolve sekali lewat multicall
+    chain_id = Column(String, primary_key=True)
+    address = Column(String, primary_key=True)
+    symbol = Column(String)
+    decimals = Column(Integer)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
+class PairMeta(Base):
+    __tablename__ = "pair_meta"
+
+    # token0 / token1 pair Uniswap V2 per chain (immutable setelah pair dibuat)
+    chain_id = Column(String, primary_key=True)
+    pair_address = Column(String, primary_key=True)
+    token0 = Column(String)
+    token1 = Column(String)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
 class Signal(Base):
     __tablename__ = "signals"
+    # index mengikuti pola query: lookback per wallet+token, per wallet, per pair perp,
+    # antrian belum diproses (lihat benchmarks/bench_signal_queries.py)
+    __table_args__ = (
+        Index("ix_signals_wallet_token_created", "wallet_address", "token_symbol", "created_at"),
+        Index("ix_signals_wallet_created", "wallet_address", "created_at"),
+        Index("ix_signals_pair_created", "pair_perp", "created_at"),
+        Index("ix_signals_processed_created", "processed", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     signal_type = Column(String)
-    wallet_address = Column(String, index=True)
+    wallet_address = Column(String)
     wallet_score = Column(Float)
     wallet_tier = Column(String)
     chain_id_spot = Column(String, nullable=True)
@@ -88,9 +157,16 @@ class Signal(Base):
     liquidity_usd = Column(Float, nullable=True)
     created_at = Column(DateTime, default=dt.datetime.utcnow)
     processed = Column(Boolean, default=False)
+    # identitas fill / swap log sumber → 1 fill maksimal 1 signal
+    source_id = Column(String, nullable=True, unique=True)
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alerts_wallet_token_created", "wallet_address", "token_symbol", "created_at"),
+        Index("ix_alerts_pair_created", "pair_perp", "created_at"),
+        Index("ix_alerts_created", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     alert_type = Column(String)
@@ -112,3 +188,4 @@ class Alert(Base):
     raw_payload = Column(JSON)
     sent_to = Column(String, nullable=True)
     sent_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=dt.datetime.utcnow)
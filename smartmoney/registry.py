@@ -0,0 +1,214 @@
+# smartmoney/registry.py
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .models import Wallet
+from .scoring import RankTiers, ScoreEngine
+
+# (smart_score, tier) baru per address hasil plan_rescore()
+ScoreChanges = Dict[str, Tuple[float, str]]
+
+# batas baris per bulk UPDATE
+_DB_CHUNK = 500
+
+
+class WalletEntry:
+    """Snapshot 1 wallet (kolom yang dipakai scoring, tiering & signal)."""
+
+    __slots__ = ("address", "smart_score", "tier", "account_value_usd", "pnl_all_usd", "roi_all", "order")
+
+    def __init__(
+        self,
+        address: str,
+        smart_score: float = 0.0,
+        tier: str = "ignore",
+        account_value_usd: float = 0.0,
+        pnl_all_usd: float = 0.0,
+        roi_all: float = 0.0,
+    ):
+        self.address = address
+        self.smart_score = float(smart_score or 0.0)
+        self.tier = tier or "ignore"
+        self.account_value_usd = float(account_value_usd or 0.0)
+        self.pnl_all_usd = float(pnl_all_usd or 0.0)
+        self.roi_all = float(roi_all or 0.0)
+        # urutan masuk registry (tie-break ranking skor sama)
+        self.order = 0
+
+
+class WalletRegistry:
+    """
+    Registry wallet in-memory, write-through ke tabel wallets:
+    - load() sekali saat startup (1 query kolom, bukan objek ORM)
+    - lookup tier / skor O(1) untuk signal stage (get / tier / score)
+    - delta dari discovery (apply_stats) & wallet baru dari event (add) diterapkan
+      SETELAH tulisan DB-nya ter-commit
+    - rescore hanya kalau ada stats yang berubah: plan_rescore() (skor dihitung
+      ulang hanya untuk wallet yang stats-nya berubah, lewat ScoreEngine) →
+      write_scores(db, changes) di job writer → apply_scores(changes)
+    - connector dapat diff (wallet baru / tier berubah, wallet dihapus) lewat
+      pop_diff(), bukan daftar penuh tiap cycle
+    """
+
+    def __init__(self):
+        self._wallets: Dict[str, WalletEntry] = {}
+        self._engine = ScoreEngine()
+        self._ranker = RankTiers()
+        self._order = 0
+        self._stats_dirty = False
+        # diff untuk connector sejak pop_diff() terakhir
+        self._diff_changed: Dict[str, str] = {}
+        self._diff_removed: Set[str] = set()
+
+    # === load & lookup ===
+    def load(self, db: Session) -> None:
+        rows = db.query(
+            Wallet.address, Wallet.smart_score, Wallet.tier,
+            Wallet.account_value_usd, Wallet.pnl_all_usd, Wallet.roi_all,
+        )
+        self._wallets = {r[0]: WalletEntry(*r) for r in rows}
+        self._engine.clear()
+        self._ranker.clear()
+        for w in self._wallets.values():
+            self._order += 1
+            w.order = self._order
+            self._engine.set_stats(w.address, w.account_value_usd, w.pnl_all_usd, w.roi_all)
+        self._diff_changed = {a: w.tier for a, w in self._wallets.items()}
+        self._diff_removed = set()
+        # skor di DB bisa dari versi scoring lama → rescore sekali setelah load
+        self._stats_dirty = True
+        logger.info(f"[Registry] Loaded {len(self._wallets)} wallets")
+
+    def __len__(self) -> int:
+        return len(self._wallets)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._wallets
+
+    def get(self, address: str) -> Optional[WalletEntry]:
+        return self._wallets.get(address)
+
+    def tier(self, address: str, default: str = "ignore") -> str:
+        w = self._wallets.get(address)
+        return w.tier if w is not None else default
+
+    def score(self, address: str, default: float = 0.0) -> float:
+        w = self._wallets.get(address)
+        return w.smart_score if w is not None else default
+
+    def addresses(self) -> List[str]:
+        return list(self._wallets)
+
+    def tiers(self) -> Dict[str, str]:
+        return {a: w.tier for a, w in self._wallets.items()}
+
+    def unknown(self, addresses: Iterable[str]) -> List[str]:
+        """Address (lowercase) yang belum ada di registry."""
+        return sorted({a for a in addresses if a and a not in self._wallets})
+
+    # === delta (panggil setelah commit) ===
+    def add(self, addresses: Iterable[str]) -> int:
+        """Wallet baru dengan nilai default kolom Wallet (skor 0, tier ignore)."""
+        n = 0
+        for a in addresses:
+            if a and a not in self._wallets:
+                w = self._wallets[a] = WalletEntry(a)
+                self._order += 1
+                w.order = self._order
+                self._engine.set_stats(a, 0.0, 0.0, 0.0)
+                self._diff_changed[a] = "ignore"
+                self._diff_removed.discard(a)
+                n += 1
+        if n:
+            self._stats_dirty = True
+        return n
+
+    def remove(self, addresses: Iterable[str]) -> int:
+        n = 0
+        for a in addresses:
+            if self._wallets.pop(a, None) is not None:
+                self._engine.remove(a)
+                self._ranker.remove(a)
+                self._diff_changed.pop(a, None)
+                self._diff_removed.add(a)
+                n += 1
+        if n:
+            self._stats_dirty = True
+        return n
+
+    def apply_stats(self, stats: Dict[str, Tuple[float, float, float]]) -> None:
+        """Stats leaderboard (account_value_usd, pnl_all_usd, roi_all) per address."""
+        self.add(a for a in stats if a not in self._wallets)
+        for a, (acct_val, pnl_all, roi_all) in stats.items():
+            w = self._wallets[a]
+            if (w.account_value_usd, w.pnl_all_usd, w.roi_all) != (acct_val, pnl_all, roi_all):
+                w.account_value_usd, w.pnl_all_usd, w.roi_all = acct_val, pnl_all, roi_all
+                self._engine.set_stats(a, acct_val, pnl_all, roi_all)
+                self._stats_dirty = True
+
+    # === scoring ===
+    @property
+    def needs_rescore(self) -> bool:
+        return self._stats_dirty
+
+    def plan_rescore(
+        self,
+        min_score: float = 0.0,
+        frac_s: float = 0.10,
+        frac_a: float = 0.30,
+        frac_b: float = 0.60,
+    ) -> ScoreChanges:
+        """
+        Skor baru untuk wallet yang stats-nya berubah (ScoreEngine, vectorized),
+        lalu tier rank-based incremental (RankTiers, O(log n) per skor berubah).
+        Return hanya wallet yang skor atau tier-nya berubah.
+        """
+        if not self._stats_dirty:
+            return {}
+        self._ranker.set_params(min_score, frac_s, frac_a, frac_b)
+        scores = self._engine.compute()
+        if not len(self._ranker):
+            # pertama kali setelah load: bangun sekaligus
+            self._ranker.load(
+                (a, self._engine.score(a), w.tier, w.order) for a, w in self._wallets.items()
+            )
+        else:
+            # wallet baru masuk ranker sesuai urutan registry (tie-break = assign_tiers_by_rank)
+            for a in sorted(scores, key=lambda a: self._wallets[a].order):
+                self._ranker.update(a, scores[a], self._wallets[a].tier, self._wallets[a].order)
+        tier_changes = self._ranker.take_changes()
+
+        changes: ScoreChanges = {}
+        for a in scores.keys() | tier_changes.keys():
+            cur = self._wallets[a]
+            score, tier = scores.get(a, cur.smart_score), tier_changes.get(a, cur.tier)
+            if cur.smart_score != score or cur.tier != tier:
+                changes[a] = (score, tier)
+        return changes
+
+    @staticmethod
+    def write_scores(db: Session, changes: ScoreChanges) -> None:
+        """Bulk UPDATE (by primary key) hanya wallet yang berubah. Commit oleh caller."""
+        rows = [{"address": a, "smart_score": s, "tier": t} for a, (s, t) in changes.items()]
+        for i in range(0, len(rows), _DB_CHUNK):
+            db.execute(update(Wallet), rows[i:i + _DB_CHUNK])
+
+    def apply_scores(self, changes: ScoreChanges) -> None:
+        for a, (score, tier) in changes.items():
+            w = self._wallets.get(a)
+            if w is None:
+                continue
+            if w.tier != tier:
+                self._diff_changed[a] = tier
+            w.smart_score, w.tier = score, tier
+        self._stats_dirty = False
+
+    # === diff untuk connector ===
+    def pop_diff(self) -> Tuple[Dict[str, str], Set[str]]:
+        """(address → tier untuk wallet baru / tier berubah, address yang dihapus)."""
+        changed, removed = self._diff_changed, self._diff_removed
+        self._diff_changed, self._diff_removed = {}, set()
+        return changed, removed
@@ -1,7 +1,24 @@
 # smartmoney/scoring.py
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from bisect import bisect_left, insort
 from .models import Wallet
 
+try:
+    import numpy as np
+except ImportError:  # opsional: ScoreEngine fallback ke fungsi skalar per wallet
+    np = None
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # opsional: RankTiers fallback ke list + bisect (insert O(n) memmove)
+    SortedList = None
+
+# batas & nilai step _score_equity / _score_pnl_all (versi array, searchsorted)
+_EQUITY_EDGES = (1_000.0, 10_000.0, 50_000.0, 200_000.0)
+_EQUITY_VALUES = (40.0, 55.0, 70.0, 85.0, 95.0)
+_PNL_EDGES = (0.0, 10_000.0, 100_000.0, 1_000_000.0)
+_PNL_VALUES = (30.0, 60.0, 80.0, 90.0, 98.0)
+
 
 def _score_roi_all(roi_all_frac: float) -> float:
     """
@@ -92,6 +109,186 @@ def compute_smart_score_from_wallet(wallet: Wallet) -> float:
     return float(smart_score)
 
 
+def score_arrays(roi_all, account_value_usd, pnl_all_usd):
+    """
+    Versi vectorized compute_smart_score_from_wallet untuk array float64
+    (NaN / None sudah diganti 0). Operasi per elemen sama persis dengan versi
+    skalar (urutan cabang & aritmetika), jadi hasilnya identik bit-per-bit.
+    """
+    roi_pct = roi_all * 100.0
+    roi_score = np.select(
+        [roi_pct <= -50, roi_pct >= 300, roi_pct < 0, roi_pct < 50],
+        [
+            0.0,
+            100.0,
+            40.0 * (roi_pct + 50.0) / 50.0,
+            40.0 + 40.0 * (roi_pct / 50.0),
+        ],
+        80.0 + 20.0 * ((roi_pct - 50.0) / 250.0),
+    )
+    # side="right": nilai tepat di batas masuk step atas (sama dengan `v < batas`)
+    eq_score = np.asarray(_EQUITY_VALUES)[np.searchsorted(_EQUITY_EDGES, account_value_usd, side="right")]
+    pnl_score = np.asarray(_PNL_VALUES)[np.searchsorted(_PNL_EDGES, pnl_all_usd, side="right")]
+    return (
+        0.6 * roi_score +
+        0.25 * eq_score +
+        0.15 * pnl_score
+    )
+
+
+class _Stats:
+    """Input scoring 1 wallet (bentuk yang diterima compute_smart_score_from_wallet)."""
+
+    __slots__ = ("roi_all", "account_value_usd", "pnl_all_usd")
+
+    def __init__(self, roi_all: float, account_value_usd: float, pnl_all_usd: float):
+        self.roi_all = roi_all
+        self.account_value_usd = account_value_usd
+        self.pnl_all_usd = pnl_all_usd
+
+
+class ScoreEngine:
+    """
+    Skor smart money untuk banyak wallet sekaligus:
+    - stats (roi_all, account_value_usd, pnl_all_usd) & skor disimpan di array
+      NumPy kontigu, 1 baris per wallet (address → index)
+    - set_stats() menandai baris dirty hanya kalau nilainya berubah
+    - compute() menghitung ulang HANYA baris dirty dengan score_arrays()
+      (hasil identik dengan compute_smart_score_from_wallet)
+    - remove() memindah baris terakhir ke slot yang kosong (array tetap rapat)
+    Tanpa NumPy: list Python + fungsi skalar untuk baris dirty.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._index: Dict[str, int] = {}
+        self._addrs: List[str] = []
+        self._dirty: set = set()
+        self._n = 0
+        cap = max(1, int(capacity))
+        if np is not None:
+            self._roi = np.zeros(cap)
+            self._equity = np.zeros(cap)
+            self._pnl = np.zeros(cap)
+            self._score = np.zeros(cap)
+        else:
+            self._roi, self._equity, self._pnl, self._score = [], [], [], []
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._index
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def clear(self) -> None:
+        self._index.clear()
+        self._addrs.clear()
+        self._dirty.clear()
+        self._n = 0
+        if np is None:
+            self._roi, self._equity, self._pnl, self._score = [], [], [], []
+
+    def _grow(self) -> None:
+        cap = len(self._roi) * 2
+        for name in ("_roi", "_equity", "_pnl", "_score"):
+            old = getattr(self, name)
+            new = np.zeros(cap)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def set_stats(
+        self,
+        address: str,
+        account_value_usd: Optional[float],
+        pnl_all_usd: Optional[float],
+        roi_all: Optional[float],
+    ) -> bool:
+        """Tambah / update stats 1 wallet. Return True kalau baris jadi dirty."""
+        roi = float(roi_all or 0.0)
+        eq = float(account_value_usd or 0.0)
+        pnl = float(pnl_all_usd or 0.0)
+        i = self._index.get(address)
+        if i is None:
+            i = self._n
+            if np is not None:
+                if i >= len(self._roi):
+                    self._grow()
+            else:
+                for arr in (self._roi, self._equity, self._pnl, self._score):
+                    arr.append(0.0)
+            self._index[address] = i
+            self._addrs.append(address)
+            self._n += 1
+        elif (self._roi[i], self._equity[i], self._pnl[i]) == (roi, eq, pnl):
+            return False
+        self._roi[i], self._equity[i], self._pnl[i] = roi, eq, pnl
+        self._dirty.add(i)
+        return True
+
+    def remove(self, address: str) -> bool:
+        i = self._index.pop(address, None)
+        if i is None:
+            return False
+        last = self._n - 1
+        self._dirty.discard(i)
+        if i != last:
+            moved = self._addrs[last]
+            self._addrs[i] = moved
+            self._index[moved] = i
+            for arr in (self._roi, self._equity, self._pnl, self._score):
+                arr[i] = arr[last]
+            if last in self._dirty:
+                self._dirty.discard(last)
+                self._dirty.add(i)
+        self._addrs.pop()
+        if np is None:
+            for arr in (self._roi, self._equity, self._pnl, self._score):
+                arr.pop()
+        self._n -= 1
+        return True
+
+    def mark_all_dirty(self) -> None:
+        self._dirty = set(range(self._n))
+
+    def compute(self) -> Dict[str, float]:
+        """Hitung ulang baris dirty. Return {address: skor} untuk baris tersebut."""
+        if not self._dirty:
+            return {}
+        if np is not None and len(self._dirty) == self._n:
+            # semua dirty (setelah load): slice langsung, tanpa fancy indexing
+            n = self._n
+            scores = score_arrays(self._roi[:n], self._equity[:n], self._pnl[:n])
+            self._score[:n] = scores
+            out = dict(zip(self._addrs, scores.tolist()))
+        elif np is not None:
+            idx = np.fromiter(self._dirty, dtype=np.intp, count=len(self._dirty))
+            idx.sort()
+            scores = score_arrays(self._roi[idx], self._equity[idx], self._pnl[idx])
+            self._score[idx] = scores
+            addrs = self._addrs
+            out = dict(zip([addrs[i] for i in idx.tolist()], scores.tolist()))
+        else:
+            out = {}
+            for i in sorted(self._dirty):
+                score = compute_smart_score_from_wallet(_Stats(self._roi[i], self._equity[i], self._pnl[i]))
+                self._score[i] = score
+                out[self._addrs[i]] = score
+        self._dirty.clear()
+        return out
+
+    def score(self, address: str, default: float = 0.0) -> float:
+        i = self._index.get(address)
+        return float(self._score[i]) if i is not None else default
+
+    def scores(self) -> Dict[str, float]:
+        """Skor terakhir semua wallet (baris dirty: skor sebelum compute())."""
+        vals = self._score[:self._n]
+        return dict(zip(self._addrs, vals.tolist() if np is not None else vals))
+
+
 def assign_tiers_by_rank(
     wallets: List[Wallet],
     min_score: float = 0.0,
@@ -141,3 +338,192 @@ def assign_tiers_by_rank(
             w.tier = "B"
         else:
             w.tier = "ignore"
+
+
+def _rank_cutoff(n: int, frac: float) -> int:
+    """Jumlah posisi idx (0-based) dengan (idx + 1) / n <= frac (ekspresi sama dengan assign_tiers_by_rank)."""
+    if n <= 0:
+        return 0
+    k = min(max(int(frac * n), 0), n)
+    while k < n and (k + 1) / n <= frac:
+        k += 1
+    while k > 0 and k / n > frac:
+        k -= 1
+    return k
+
+
+class _SortedKeys:
+    """List terurut minimal (add / remove / index / getitem) di atas list + bisect."""
+
+    def __init__(self):
+        self._keys: list = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getitem__(self, i):
+        return self._keys[i]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def add(self, key) -> None:
+        insort(self._keys, key)
+
+    def remove(self, key) -> None:
+        del self._keys[bisect_left(self._keys, key)]
+
+    def index(self, key) -> int:
+        return bisect_left(self._keys, key)
+
+
+class RankTiers:
+    """
+    Tier rank-based (hasil sama dengan assign_tiers_by_rank) yang di-maintain
+    incremental:
+    - wallet disimpan di sorted list dengan key (-skor, urutan masuk) → urutan
+      sama dengan sort stabil desc di assign_tiers_by_rank; ubah skor = remove +
+      add, O(log n)
+    - tier hanya bisa berubah untuk wallet yang skornya berubah, atau yang
+      posisinya bergeser melewati batas S/A/B. Setelah d perubahan (update /
+      tambah / hapus) posisi wallet lain bergeser maksimal d, jadi cukup cek
+      posisi dalam jarak d dari batas lama & baru
+    - take_changes() hanya mengembalikan wallet yang tier-nya benar-benar berubah
+    Kalau perubahan terlalu banyak (mis. setelah load) atau parameter berubah,
+    dihitung ulang penuh (O(n), tanpa sort).
+    """
+
+    def __init__(
+        self,
+        min_score: float = 0.0,
+        frac_s: float = 0.10,
+        frac_a: float = 0.30,
+        frac_b: float = 0.60,
+    ):
+        self._params = (min_score, frac_s, frac_a, frac_b)
+        self.clear()
+
+    def clear(self) -> None:
+        self._sorted = SortedList() if SortedList is not None else _SortedKeys()
+        # address → (-skor, order, address); order = urutan masuk (tie-break stabil)
+        self._keys: Dict[str, Tuple[float, int, str]] = {}
+        self._tier: Dict[str, str] = {}
+        self._seq = 0
+        self._touched: set = set()
+        self._moves = 0
+        self._full = True
+        self._cutoffs = (0, 0, 0)
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def tier(self, address: str, default: str = "ignore") -> str:
+        return self._tier.get(address, default)
+
+    def set_params(self, min_score: float, frac_s: float, frac_a: float, frac_b: float) -> None:
+        params = (min_score, frac_s, frac_a, frac_b)
+        if params != self._params:
+            self._params = params
+            self._full = True
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._keys
+
+    def load(self, entries) -> None:
+        """Isi ulang sekaligus dari (address, skor, tier, order); 1 sort, bukan n insert."""
+        self.clear()
+        keys = []
+        for address, score, tier, order in entries:
+            key = (-score, order, address)
+            self._keys[address] = key
+            self._tier[address] = tier
+            keys.append(key)
+        keys.sort()
+        self._seq = max((k[1] for k in keys), default=0)
+        if SortedList is not None:
+            self._sorted = SortedList(keys)
+        else:
+            self._sorted._keys = keys
+
+    def update(self, address: str, score: float, tier: str = "ignore", order: Optional[int] = None) -> None:
+        """
+        Tambah wallet atau ubah skornya. Untuk wallet baru: tier = tier saat ini
+        (mis. dari DB), order = urutan tie-break skor sama (default: urutan update).
+        """
+        old = self._keys.get(address)
+        if old is not None:
+            if old[0] == -score:
+                return
+            self._sorted.remove(old)
+            key = (-score, old[1], address)
+        else:
+            self._seq += 1
+            key = (-score, self._seq if order is None else order, address)
+            self._tier[address] = tier
+        self._keys[address] = key
+        self._sorted.add(key)
+        self._touched.add(address)
+        self._moves += 1
+
+    def remove(self, address: str) -> None:
+        key = self._keys.pop(address, None)
+        if key is None:
+            return
+        self._sorted.remove(key)
+        self._tier.pop(address, None)
+        self._touched.discard(address)
+        self._moves += 1
+
+    def _cutoffs_for(self, n: int) -> Tuple[int, int, int]:
+        _, frac_s, frac_a, frac_b = self._params
+        return _rank_cutoff(n, frac_s), _rank_cutoff(n, frac_a), _rank_cutoff(n, frac_b)
+
+    def _tier_at(self, idx: int, key: Tuple[float, int, str], cutoffs: Tuple[int, int, int]) -> str:
+        if -key[0] < self._params[0]:
+            return "ignore"
+        k_s, k_a, k_b = cutoffs
+        if idx < k_s:
+            return "S"
+        if idx < k_a:
+            return "A"
+        if idx < k_b:
+            return "B"
+        return "ignore"
+
+    def take_changes(self) -> Dict[str, str]:
+        """Wallet yang tier-nya berubah sejak take_changes() terakhir → tier baru."""
+        n = len(self._sorted)
+        cutoffs = self._cutoffs_for(n)
+        d = self._moves
+        changes: Dict[str, str] = {}
+
+        def check(idx: int, key: Optional[Tuple[float, int, str]] = None) -> None:
+            if key is None:
+                key = self._sorted[idx]
+            t = self._tier_at(idx, key, cutoffs)
+            if self._tier[key[2]] != t:
+                changes[key[2]] = t
+
+        if self._full or 4 * d >= n:
+            for idx, key in enumerate(self._sorted):
+                check(idx, key)
+        elif d:
+            for a in self._touched:
+                check(self._sorted.index(self._keys[a]))
+            # posisi baru idx dengan tier mungkin berubah: [min(K_lama, K_baru) - d, max(..) + d)
+            checked = set()
+            for k_old, k_new in zip(self._cutoffs, cutoffs):
+                lo = max(min(k_old, k_new) - d, 0)
+                hi = min(max(k_old, k_new) + d, n)
+                for idx in range(lo, hi):
+                    if idx not in checked:
+                        checked.add(idx)
+                        check(idx)
+
+        for a, t in changes.items():
+            self._tier[a] = t
+        self._cutoffs = cutoffs
+        self._touched = set()
+        self._moves = 0
+        self._full = False
+        return changes
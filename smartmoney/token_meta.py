@@ -0,0 +1,103 @@
+# smartmoney/token_meta.py
+from typing import Callable, Dict, Iterable, List, Tuple
+import datetime as dt
+
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+
+from .cache import LRUCache
+from .db import SessionLocal
+from .models import PairMeta, TokenMeta
+
+PairTokens = Tuple[str, str]      # (token0, token1)
+TokenInfo = Tuple[str, int]       # (symbol, decimals)
+
+# batas parameter IN (...) per query
+_DB_CHUNK = 500
+
+
+class TokenMetaStore:
+    """
+    Metadata pair & token per chain, 3 lapis:
+    1. LRU in-memory (dibatasi maxsize)
+    2. tabel pair_meta / token_meta di DB (bertahan lintas restart)
+    3. resolver dari connector (multicall) untuk yang belum ada di mana pun;
+       hasilnya langsung ditulis ke DB
+    Semua lookup per batch: 1 query DB + 1 panggilan resolver per pemanggilan.
+    """
+
+    def __init__(self, chain_id: str, session_factory=SessionLocal, maxsize: int = 50_000):
+        self.chain_id = chain_id
+        self.session_factory = session_factory
+        self._pairs = LRUCache(maxsize)
+        self._tokens = LRUCache(maxsize)
+
+    def get_pairs(
+        self, addrs: Iterable[str], resolve: Callable[[List[str]], Dict[str, PairTokens]]
+    ) -> Dict[str, PairTokens]:
+        return self._lookup(
+            self._pairs, addrs, resolve,
+            PairMeta, PairMeta.pair_address,
+            lambda r: (r.token0, r.token1),
+            lambda a, v: PairMeta(chain_id=self.chain_id, pair_address=a, token0=v[0], token1=v[1]),
+        )
+
+    def get_tokens(
+        self, addrs: Iterable[str], resolve: Callable[[List[str]], Dict[str, TokenInfo]]
+    ) -> Dict[str, TokenInfo]:
+        return self._lookup(
+            self._tokens, addrs, resolve,
+            TokenMeta, TokenMeta.address,
+            lambda r: (r.symbol, int(r.decimals)),
+            lambda a, v: TokenMeta(chain_id=self.chain_id, address=a, symbol=v[0], decimals=v[1]),
+        )
+
+    def _lookup(self, cache, addrs, resolve, model, key_col, from_row, to_row) -> Dict:
+        out: Dict = {}
+        missing: List[str] = []
+        for a in sorted(set(addrs)):
+            v = cache.get(a)
+            if v is None:
+                missing.append(a)
+            else:
+                out[a] = v
+        if not missing:
+            return out
+
+        db = self.session_factory()
+        try:
+            for i in range(0, len(missing), _DB_CHUNK):
+                rows = db.query(model).filter(
+                    model.chain_id == self.chain_id,
+                    key_col.in_(missing[i:i + _DB_CHUNK]),
+                )
+                for r in rows:
+                    v = from_row(r)
+                    a = getattr(r, key_col.key)
+                    cache.put(a, v)
+                    out[a] = v
+
+            unresolved = [a for a in missing if a not in out]
+            if not unresolved:
+                return out
+
+            resolved = resolve(unresolved)
+            now = dt.datetime.utcnow()
+            for a, v in resolved.items():
+                cache.put(a, v)
+                out[a] = v
+                row = to_row(a, v)
+                row.updated_at = now
+                db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                # worker lain sudah menulis baris yang sama → cukup pakai hasil in-memory
+                db.rollback()
+            logger.debug(
+                f"[{self.chain_id}] {model.__tablename__}: {len(missing) - len(unresolved)} from DB, "
+                f"{len(resolved)}/{len(unresolved)} resolved on-chain"
+            )
+        finally:
+            db.close()
+        return out
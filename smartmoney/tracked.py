@@ -21,3 +21,7 @@ def get_tracked_wallet_info(address: str):
     if not address:
         return None
     return _TRACKED.get(address.lower())
+
+def tracked_addresses() -> set:
+    """Set address (lowercase) wallet manual dari config.yaml."""
+    return set(_TRACKED)
@@ -0,0 +1,98 @@
+# tests/test_perp_ws_backfill.py
+"""
+Interleaving reconnect / backfill di HyperliquidStreamConnector tanpa jaringan:
+REST di-fake, WS di-simulasikan lewat _fills_queue + _needs_backfill.
+"""
+from smartmoney.connectors.perp_hyperliquid import HyperliquidConnector, parse_fills
+from smartmoney.connectors.perp_hyperliquid_ws import HyperliquidStreamConnector
+
+W = "0x" + "a" * 40
+X = "0x" + "b" * 40
+
+
+def raw_fill(tid: int, time_ms: int) -> dict:
+    return {
+        "coin": "BTC", "px": "100", "sz": "1", "time": time_ms, "tid": tid,
+        "dir": "Open Long", "side": "B", "startPosition": "0", "closedPnl": "0",
+        "hash": "0x0", "oid": 1,
+    }
+
+
+class FakeRest(HyperliquidConnector):
+    """REST tanpa HTTP: fill per wallet dari dict, hook dipanggil saat backfill."""
+
+    def __init__(self, fills_by_wallet, on_fetch=None):
+        super().__init__(client=object(), request_timeout=1.0, max_concurrency=1, aggregate_by_time=False)
+        self.fills_by_wallet = fills_by_wallet
+        self.on_fetch = on_fetch
+
+    def fetch_fills_batch(self, wallets, since_ts):
+        if self.on_fetch is not None:
+            self.on_fetch(wallets)
+        out = {}
+        for w in wallets:
+            cursor = self._cursors.get(w) or (since_ts * 1000, -1)
+            raw = [f for f in self.fills_by_wallet.get(w, []) if (f["time"], f["tid"]) > cursor]
+            out[w] = parse_fills(raw)
+        return out
+
+
+def make_conn(rest):
+    conn = HyperliquidStreamConnector(rest=rest)
+    # tanpa set_tracked_wallets: thread WS tidak dijalankan
+    conn._tracked_wallets = [W, X]
+    rest.set_tracked_wallets([W, X])
+    return conn
+
+
+def ws_push(conn, wallet, raws):
+    fills, last_key = parse_fills(raws)
+    conn._fills_queue.put((wallet, fills, last_key))
+
+
+def test_reconnect_during_drain_holds_ws_fills_until_backfilled():
+    # fill 2 terjadi saat shard W putus (hanya bisa diambil lewat REST),
+    # fill 3 datang dari WS setelah reconnect
+    gap, after = raw_fill(2, 2_000), raw_fill(3, 3_000)
+    conn = None
+
+    def reconnect_w(wallets):
+        # shard W reconnect SETELAH snapshot backfill diambil (thread WS)
+        if W not in wallets:
+            with conn._backfill_lock:
+                conn._needs_backfill.add(W)
+
+    rest = FakeRest({W: [gap, after], X: []}, on_fetch=reconnect_w)
+    conn = make_conn(rest)
+    rest.load_cursors({W: (1_000, 1), X: (1_000, 1)})
+    conn._needs_backfill.add(X)
+    ws_push(conn, W, [after])
+
+    events = conn.fetch_new_events(since_ts=0)
+
+    # fill WS W ditahan: cursor tidak melompati fill 2 yang belum di-backfill
+    assert [e["source_id"] for e in events] == []
+    assert rest._cursors[W] == (1_000, 1)
+    assert conn._fills_queue.qsize() == 1
+    assert W in conn._needs_backfill
+
+    events = conn.fetch_new_events(since_ts=0)
+
+    # backfill W mengisi gap + fill WS yang sama tidak dobel (cursor)
+    assert [e["source_id"] for e in events] == [f"hyperliquid:{W}:2", f"hyperliquid:{W}:3"]
+    assert rest._cursors[W] == (3_000, 3)
+    assert conn._fills_queue.qsize() == 0
+
+
+def test_failed_backfill_keeps_wallet_pending():
+    rest = FakeRest({W: [raw_fill(2, 2_000)]})
+    conn = make_conn(rest)
+    rest.load_cursors({W: (1_000, 1)})
+    rest.fetch_fills_batch = lambda wallets, since_ts: {}  # timeout / error
+    conn._needs_backfill.add(W)
+    ws_push(conn, W, [raw_fill(3, 3_000)])
+
+    assert conn.fetch_new_events(since_ts=0) == []
+    assert rest._cursors[W] == (1_000, 1)
+    assert W in conn._needs_backfill
+    assert conn._fills_queue.qsize() == 1
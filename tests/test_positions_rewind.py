@@ -0,0 +1,44 @@
+# tests/test_positions_rewind.py
+"""
+Job persist gagal → PositionBook.rewind(): fill yang diambil ulang cycle berikutnya
+tidak boleh diterapkan 2x ke state posisi.
+"""
+from smartmoney.connectors.records import PerpFill
+from smartmoney.engine.positions import PositionBook
+
+W = "0x" + "a" * 40
+
+
+def fill(tid: int, px: float, sz: float, start: float, dir: str) -> PerpFill:
+    return PerpFill("BTC", px, sz, tid * 1000, tid, dir, "B", start)
+
+
+def test_rewind_restores_state_before_refetched_fills():
+    book = PositionBook("hyperliquid")
+    book.apply_fill(W, fill(1, 100.0, 1.0, 0.0, "Open Long"), "s1")
+    book.mark_persisted()
+
+    # cycle gagal: INCREASE diterapkan lalu di-rewind
+    book.apply_fill(W, fill(2, 200.0, 1.0, 1.0, "Open Long"), "s2")
+    dirty = book.take_dirty()
+    book.restore_dirty(dirty)
+    assert book.rewind() == 1
+
+    st = book.get(W, "BTC-PERP")
+    assert (st.szi, st.entry_px) == (1.0, 100.0)
+
+    # cycle berikutnya: fill yang sama diambil ulang → entry rata-rata sekali saja
+    events = book.apply_fill(W, fill(2, 200.0, 1.0, 1.0, "Open Long"), "s2")
+    assert [e.event_type for e in events] == ["INCREASE"]
+    st = book.get(W, "BTC-PERP")
+    assert (st.szi, st.entry_px) == (2.0, 150.0)
+
+
+def test_rewind_drops_positions_opened_in_failed_cycle():
+    book = PositionBook("hyperliquid")
+    book.apply_fill(W, fill(1, 100.0, 1.0, 0.0, "Open Long"), "s1")
+    book.restore_dirty(book.take_dirty())
+
+    assert book.rewind() == 1
+    assert book.get(W, "BTC-PERP") is None
+    assert book.take_dirty() == set()
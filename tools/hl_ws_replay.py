@@ -0,0 +1,109 @@
+# tools/hl_ws_replay.py
+"""
+Stand-in lokal untuk WebSocket Hyperliquid (channel "userFills").
+
+Replay fill hasil rekaman ke HyperliquidStreamConnector tanpa ke mainnet.
+File rekaman: JSON Lines, 1 fill per baris, dengan field tambahan "user":
+  {"user": "0xabc...", "coin": "BTC", "dir": "Open Long", "px": "65000",
+   "sz": "0.1", "time": 1700000000000, "tid": 123, "side": "B", ...}
+
+Pakai:
+  python tools/hl_ws_replay.py --file fills.jsonl --port 8765 --interval 0.5
+  lalu set HYPERLIQUID_WS_URL=ws://127.0.0.1:8765 dan mode: "stream" di config.yaml.
+
+Opsi --drop-after N menutup koneksi setelah N fill terkirim, untuk menguji
+reconnect + backfill REST.
+"""
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+
+import websockets
+
+
+def load_recorded_fills(path: str):
+    by_user = defaultdict(list)
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            fill = json.loads(line)
+            user = (fill.pop("user", "") or "").lower()
+            if user:
+                by_user[user].append(fill)
+    for fills in by_user.values():
+        fills.sort(key=lambda x: (int(x.get("time", 0)), int(x.get("tid", 0))))
+    return by_user
+
+
+def make_handler(by_user, interval: float, drop_after: int):
+    async def handler(ws, *args):
+        sent = 0
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def replay(user: str):
+            for fill in by_user.get(user, []):
+                await asyncio.sleep(interval)
+                await queue.put((user, fill))
+
+        tasks = []
+        try:
+            async def reader():
+                async for raw in ws:
+                    msg = json.loads(raw)
+                    if msg.get("method") == "ping":
+                        await ws.send(json.dumps({"channel": "pong"}))
+                    elif msg.get("method") == "subscribe":
+                        sub = msg.get("subscription") or {}
+                        await ws.send(json.dumps({"channel": "subscriptionResponse", "data": msg}))
+                        if sub.get("type") == "userFills":
+                            user = (sub.get("user") or "").lower()
+                            await ws.send(json.dumps({
+                                "channel": "userFills",
+                                "data": {"isSnapshot": True, "user": user, "fills": []},
+                            }))
+                            tasks.append(asyncio.ensure_future(replay(user)))
+
+            tasks.append(asyncio.ensure_future(reader()))
+            while True:
+                user, fill = await queue.get()
+                await ws.send(json.dumps({
+                    "channel": "userFills",
+                    "data": {"isSnapshot": False, "user": user, "fills": [fill]},
+                }))
+                sent += 1
+                if drop_after and sent >= drop_after:
+                    await ws.close()
+                    return
+        except websockets.ConnectionClosed:
+            return
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return handler
+
+
+async def serve(path: str, host: str, port: int, interval: float, drop_after: int):
+    by_user = load_recorded_fills(path)
+    print(f"Loaded {sum(len(v) for v in by_user.values())} fills for {len(by_user)} users")
+    async with websockets.serve(make_handler(by_user, interval, drop_after), host, port):
+        print(f"Replaying on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--file", required=True, help="JSON Lines berisi fill rekaman")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--interval", type=float, default=0.5, help="jeda antar fill per user (detik)")
+    ap.add_argument("--drop-after", type=int, default=0, help="tutup koneksi setelah N fill (uji reconnect)")
+    args = ap.parse_args()
+    asyncio.run(serve(args.file, args.host, args.port, args.interval, args.drop_after))
+
+
+if __name__ == "__main__":
+    main()